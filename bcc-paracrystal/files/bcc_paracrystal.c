@@ -75,35 +75,51 @@ static double Iq(double q, double dnn,
     double d_factor, double radius,
     double sld, double solvent_sld)
 {
-    // translate a point in [-1,1] to a point in [0, 2 pi]
-    const double phi_m = M_PI;
-    const double phi_b = M_PI;
-    // translate a point in [-1,1] to a point in [0, pi]
-    const double theta_m = M_PI_2;
-    const double theta_b = M_PI_2;
+    // bcc_Zq is unchanged by permuting qa, qb, qc and by q => -q, so the
+    // orientation average only needs the 1/12 of the sphere between the mirror
+    // planes qa=qb and qb=qc, on one side of the plane normal to (1,1,1).
+    // With u = cos(theta) measured from (1,1,1) the surface element is du dphi,
+    // and the wedge is u in [0, 1], phi in [pi/6, pi/2] about that axis, with
+    // phi measured from (1,-1,0) towards (1,1,-2).
+    //
+    // The peaks of Z(q) get sharper as q dnn d_factor^2 gets smaller, so the
+    // number of points (at most 150 in phi, 500 in u) is chosen from that.
+    // Unlike fcc, the bcc peaks need more than 76 points in phi once they are
+    // sharp enough to need 500 in u.
+    const double qr = 20.0/(q*dnn*square(d_factor));
+    constant double *w_phi, *z_phi, *w_u, *z_u;
+    int n_phi;
+    if (qr < 200.0) {
+        n_phi = gauss_weights(qr, ADAPTIVE_MAX_76, &w_phi, &z_phi);
+    } else {
+        n_phi = 150; w_phi = Gauss150Wt; z_phi = Gauss150Z;
+    }
+    const int n_u = gauss_weights(qr, n_phi, &w_u, &z_u);
 
     double outer_sum = 0.0;
-    for(int i=0; i<GAUSS_N; i++) {
+    for(int i=0; i<n_phi; i++) {
+        // translate a point in [-1,1] to a point in [pi/6, pi/2]
+        const double phi = z_phi[i]*M_PI/6.0 + M_PI/3.0;
+        double sin_phi, cos_phi;
+        SINCOS(phi, sin_phi, cos_phi);
+        // unit vector in the plane normal to (1,1,1)
+        const double ea = cos_phi*M_SQRT1_2 + sin_phi/sqrt(6.0);
+        const double eb = -cos_phi*M_SQRT1_2 + sin_phi/sqrt(6.0);
+        const double ec = -2.0*sin_phi/sqrt(6.0);
         double inner_sum = 0.0;
-        const double theta = GAUSS_Z[i]*theta_m + theta_b;
-        double sin_theta, cos_theta;
-        SINCOS(theta, sin_theta, cos_theta);
-        const double qc = q*cos_theta;
-        const double qab = q*sin_theta;
-        for(int j=0;j<GAUSS_N;j++) {
-            const double phi = GAUSS_Z[j]*phi_m + phi_b;
-            double sin_phi, cos_phi;
-            SINCOS(phi, sin_phi, cos_phi);
-            const double qa = qab*cos_phi;
-            const double qb = qab*sin_phi;
-            const double form = bcc_Zq(qa, qb, qc, dnn, d_factor);
-            inner_sum += GAUSS_W[j] * form;
+        for(int j=0; j<n_u; j++) {
+            // translate a point in [-1,1] to a point in [0, 1]
+            const double u = 0.5*z_u[j] + 0.5;
+            const double q_perp = q*sqrt(1.0 - u*u);
+            const double q_par = q*u/sqrt(3.0);
+            const double form = bcc_Zq(q_perp*ea + q_par, q_perp*eb + q_par,
+                q_perp*ec + q_par, dnn, d_factor);
+            inner_sum += w_u[j] * form;
         }
-        inner_sum *= phi_m;  // sum(f(x)dx) = sum(f(x)) dx
-        outer_sum += GAUSS_W[i] * inner_sum * sin_theta;
+        outer_sum += w_phi[i] * inner_sum;
     }
-    outer_sum *= theta_m;
-    const double Zq = outer_sum/(4.0*M_PI);
+    // sum(w dphi du) = (pi/6)(1/2) sum(w w), divided by the wedge area pi/3
+    const double Zq = 0.25*outer_sum;
     const double Pq = sphere_form(q, radius, sld, solvent_sld);
     return bcc_volume_fraction(radius, dnn) * Pq * Zq;
     // note that until we can return non fitable values to the GUI this
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Time the kernels of the mirrored models on standard q grids.
+
+Usage:
+    python bench_models.py --models cylinder superball morp_ellipsoid pringle_schmidt_helices
+    python bench_models.py --repeat 5 --budget 2 --history bench_models
+
+What it does:
+- Loads each plugin through sasmodels the same way run_model_tests.py does, and
+  evaluates it at its default parameters on 1D grids of 100, 1,000 and 10,000
+  log-spaced q points and on a 128x128 2D detector.
+- Each grid is timed monodisperse and with 10% polydispersity (35 points) on the
+  first polydisperse volume parameter, in double precision and, for C models that
+  allow it, in single precision.
+- Every case is called once untimed (kernel compilation and first-call setup),
+  then timed --repeat times; the best time is reported. If the warmup of a grid
+  takes longer than --budget seconds, it is not repeated, and grids needing more
+  work (q points x dispersion points) are skipped for that precision.
+- Appends the run to <history>.json and <history>.csv, and prints the change
+  against the previous run of each case so regressions and speedups stand out.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from run_model_tests import DEFAULT_CACHE, HERE, find_models, init_worker, load_plugin
+
+GRIDS_1D = (100, 1000, 10000)
+DETECTOR = 128
+PD_WIDTH, PD_POINTS = 0.1, 35
+CSV_FIELDS = ("run", "commit", "path", "name", "case", "points", "pd", "dtype", "seconds", "points_per_s", "status")
+
+# --- Cases ----------------------------------------------------------------------
+
+def q_grids() -> list[tuple[str, int, list]]:
+    """
+    (case, points, q vectors) in increasing size.
+    """
+    import numpy as np
+
+    grids = [("1d", n, [np.logspace(-3, 0, n)]) for n in GRIDS_1D]
+    qx, qy = np.meshgrid(np.linspace(-0.3, 0.3, DETECTOR), np.linspace(-0.3, 0.3, DETECTOR))
+    grids.append(("2d", DETECTOR * DETECTOR, [qx.flatten(), qy.flatten()]))
+    return grids
+
+def pd_pars(info) -> dict | None:
+    """
+    Polydispersity settings for the first polydisperse volume parameter, if any.
+    """
+    for p in info.parameters.kernel_parameters:
+        if p.polydisperse and p.type == "volume":
+            return {f"{p.id}_pd": PD_WIDTH, f"{p.id}_pd_n": PD_POINTS, f"{p.id}_pd_nsigma": 3.0}
+    return None
+
+def dtypes_for(info) -> list[str]:
+    # Pure Python kernels always run in double precision
+    if callable(info.Iq) or not info.single:
+        return ["double"]
+    return ["double", "single"]
+
+def time_kernel(kernel, pars: dict, repeat: int, budget: float) -> tuple[float, float]:
+    """
+    (warmup seconds, best of repeat seconds) for one kernel call.
+
+    A warmup slower than budget is not repeated; its own time is reported.
+    """
+    from sasmodels.direct_model import call_kernel
+
+    start = time.perf_counter()
+    call_kernel(kernel, pars)
+    warmup = time.perf_counter() - start
+    if warmup > budget:
+        return warmup, warmup
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call_kernel(kernel, pars)
+        best = min(best, time.perf_counter() - start)
+    return warmup, best
+
+def bench_model(path: Path, rel: str, repeat: int, budget: float) -> list[dict]:
+    from sasmodels.core import build_model
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="model-bench-") as scratch:
+        info = load_plugin(path, Path(scratch))
+        polydisperse = pd_pars(info)
+        for dtype in dtypes_for(info):
+            model = build_model(info, dtype=dtype, platform="dll")
+            # Work (q points x dispersion points) at which a warmup first went over budget
+            too_big = float("inf")
+            for pars in ({}, polydisperse) if polydisperse else ({},):
+                for case, points, q in q_grids():
+                    row = {"path": rel, "name": info.name, "case": case, "points": points,
+                           "pd": bool(pars), "dtype": dtype, "seconds": None, "points_per_s": None}
+                    work = points * (PD_POINTS if pars else 1)
+                    if work > too_big:
+                        row["status"] = "over budget"
+                    else:
+                        kernel = model.make_kernel(q)
+                        try:
+                            warmup, best = time_kernel(kernel, pars, repeat, budget)
+                        finally:
+                            kernel.release()
+                        if warmup > budget:
+                            too_big = min(too_big, work)
+                        row.update(seconds=best, points_per_s=points / best if best else None, status="ok")
+                    rows.append(row)
+    return rows
+
+# --- History --------------------------------------------------------------------
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+def case_key(row: dict) -> tuple:
+    return row["path"], row["case"], row["points"], row["pd"], row["dtype"]
+
+def previous_times(history: Path) -> dict[tuple, float]:
+    try:
+        runs = json.loads(history.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    last = {}
+    for run in runs:
+        for row in run["results"]:
+            if row["seconds"]:
+                last[case_key(row)] = row["seconds"]
+    return last
+
+def save_history(prefix: Path, run: dict):
+    json_path, csv_path = prefix.with_suffix(".json"), prefix.with_suffix(".csv")
+    try:
+        runs = json.loads(json_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        runs = []
+    runs.append(run)
+    tmp = json_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(runs, indent=2), encoding="utf-8")
+    tmp.replace(json_path)
+
+    new_file = not csv_path.exists()
+    with csv_path.open("a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        for row in run["results"]:
+            writer.writerow({"run": run["created"], "commit": run["commit"], **row})
+
+# --- Main -----------------------------------------------------------------------
+
+def run_isolated(path: Path, rel: str, args) -> list[dict]:
+    """
+    Benchmark one model in a fresh process, killed after args.timeout seconds.
+
+    A process of its own keeps one model's compilation and memory out of the next
+    model's timings, and can be stopped even while it is inside a C kernel.
+    """
+    pool = multiprocessing.Pool(1, initializer=init_worker, initargs=(args.cache,))
+    try:
+        pending = pool.apply_async(bench_model, (path, rel, args.repeat, args.budget))
+        rows = pending.get(args.timeout or None)
+    except multiprocessing.TimeoutError:
+        pool.terminate()
+        raise TimeoutError(f"no result after {args.timeout:g} s") from None
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the kernels of the mirrored models.")
+    parser.add_argument("--root", default=str(HERE), help="Mirror tree (default: this repository)")
+    parser.add_argument("--models", nargs="+", help="Only these models (file stem, directory or model name)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per case (best is kept)")
+    parser.add_argument("--budget", type=float, default=5.0, help="Skip larger grids once a warmup call takes this long (seconds)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-model time limit in seconds (0 = none)")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE), help=f"Compiled kernel cache (default: {DEFAULT_CACHE})")
+    parser.add_argument("--history", default="bench_models", help="History file prefix (.json and .csv are appended)")
+    args = parser.parse_args()
+
+    import numpy as np
+    import sasmodels
+
+    root = Path(args.root).resolve()
+    history = Path(args.history)
+    previous = previous_times(history.with_suffix(".json"))
+    models = [path for path, reason in find_models(root, args.models) if not reason]
+    if not models:
+        print("[!] No models found.", file=sys.stderr)
+        sys.exit(2)
+    print(f"[*] Benchmarking {len(models)} model(s), best of {args.repeat}")
+
+    results = []
+    for path in models:
+        rel = path.relative_to(root).as_posix()
+        try:
+            rows = run_isolated(path, rel, args)
+        except Exception as e:
+            print(f"[WARN] {rel}: {type(e).__name__}: {e}".splitlines()[0])
+            results.append({"path": rel, "name": None, "case": None, "points": None, "pd": None,
+                            "dtype": None, "seconds": None, "points_per_s": None, "status": f"error: {e}"})
+            continue
+        for row in rows:
+            results.append(row)
+            label = f"{row['case']} {row['points']:>5d} {'pd' if row['pd'] else 'mono'} {row['dtype']}"
+            if row["status"] != "ok":
+                print(f"[--] {rel} {label}: {row['status']}")
+                continue
+            before = previous.get(case_key(row))
+            change = f"  ({before / row['seconds']:.2f}x vs last run)" if before else ""
+            print(f"[OK] {rel} {label}: {row['seconds'] * 1000:9.3f} ms"
+                  f"  {row['points_per_s']:12.0f} pts/s{change}")
+
+    run = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+        "host": platform.node(), "python": platform.python_version(),
+        "numpy": np.__version__, "sasmodels": sasmodels.__version__,
+        "repeat": args.repeat, "results": results,
+    }
+    save_history(history, run)
+    print(f"[i] {sum(r['status'] == 'ok' for r in results)} case(s) timed; history: "
+          f"{history.with_suffix('.json')}, {history.with_suffix('.csv')}")
+
+if __name__ == "__main__":
+    main()
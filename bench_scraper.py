@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Benchmark scrape_sasview_marketplace.py against a local stand-in for the
+marketplace, served from a mirror tree such as this repository.
+
+Usage:
+    python bench_scraper.py --mirror . --workers 1 4 16 --latency 0.05
+    python bench_scraper.py --mirror . --parse
+
+What it does:
+- Serves the mirrored pages over HTTP on 127.0.0.1: each <model>/model.html at the
+  path in its model.url.txt, every viewfile_<id>.html at /uploads/<id>, and the
+  raw files under /uploads/uploaded_models/. The "All Models" index is generated,
+  paginated like the live site ("Page X of Y").
+- Every response is delayed by --latency seconds to stand in for network round trips,
+  and carries an ETag so that conditional requests can be answered with 304.
+- Runs the scraper once per --workers value into a scratch directory, reports the
+  wall time, and checks that every run produced byte-identical output.
+- With --parse, makes no requests at all: re-parses the mirrored model.html and
+  viewfile_*.html pages with every installed tree builder and reports pages per
+  second for a full parse, and for the scraper's single link-extraction pass.
+"""
+
+import argparse
+import hashlib
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+import scrape_sasview_marketplace as scraper
+
+HERE = Path(__file__).resolve().parent
+SCRAPER = HERE / "scrape_sasview_marketplace.py"
+PAGE_SIZE = 20
+
+# --- Stand-in site ------------------------------------------------------------
+
+def build_site(mirror: Path) -> dict[str, Path | bytes]:
+    """
+    Map URL paths to the mirrored file that answers them (or to generated bytes).
+    """
+    routes: dict[str, Path | bytes] = {}
+    model_paths = []
+    for url_txt in sorted(mirror.glob("*/model.url.txt")):
+        model_dir = url_txt.parent
+        path = urlparse(url_txt.read_text(encoding="utf-8").strip()).path
+        routes[path] = model_dir / "model.html"
+        model_paths.append(path)
+        for vf in sorted(model_dir.glob("viewfile_*.html")):
+            vf_id = vf.stem.split("_", 1)[1]
+            routes[f"/uploads/{vf_id}"] = vf
+            m = re.search(r'href="(/uploads/uploaded_models/[^"]+)"', vf.read_text(encoding="utf-8"))
+            if m:
+                raw = model_dir / "files" / Path(urlparse(m.group(1)).path).name
+                if raw.exists():
+                    routes[m.group(1)] = raw
+
+    pages = max(1, -(-len(model_paths) // PAGE_SIZE))
+    for k in range(pages):
+        links = "\n".join(
+            f'<tr><td><a href="{escape(p)}">{escape(p)}</a></td></tr>'
+            for p in model_paths[k * PAGE_SIZE:(k + 1) * PAGE_SIZE]
+        )
+        html = (
+            "<html><body><h1>All Models</h1>\n"
+            f"<table>\n{links}\n</table>\n"
+            f'<div class="pagination-container"><div><span>Page {k + 1} of {pages}</span></div></div>\n'
+            "</body></html>\n"
+        )
+        routes[f"/models/?page={k + 1}"] = html.encode("utf-8")
+    routes["/models/"] = routes["/models/?page=1"]
+    # Like Django's Paginator.get_page(), out-of-range page numbers get the last page
+    routes["/models/?page="] = routes[f"/models/?page={pages}"]
+    return routes
+
+def serve(routes: dict[str, Path | bytes], latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = routes.get(self.path)
+            if body is None and self.path.startswith("/models/?page="):
+                body = routes["/models/?page="]
+            if body is None:
+                self.send_error(404)
+                return
+            if isinstance(body, Path):
+                body = body.read_bytes()
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- Benchmark ----------------------------------------------------------------
+
+def tree_digest(root: Path) -> str:
+    h = hashlib.sha256()
+    for p in sorted(root.rglob("*")):
+        if p.is_file():
+            h.update(str(p.relative_to(root)).encode("utf-8") + b"\0")
+            h.update(p.read_bytes())
+    return h.hexdigest()
+
+def run_scraper(base: str, out: Path, workers: int, delay: float) -> float:
+    cmd = [
+        sys.executable, str(SCRAPER), "--out", str(out), "--base", base,
+        "--workers", str(workers), "--delay", str(delay),
+    ]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def parse_rate(pages: list[str], fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in pages:
+            fn(text)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+def bench_parse(mirror: Path, repeat: int):
+    paths = sorted(mirror.glob("*/model.html")) + sorted(mirror.glob("*/viewfile_*.html"))
+    pages = [p.read_text(encoding="utf-8") for p in paths]
+    print(f"[*] Parsing {len(pages)} page(s), {sum(map(len, pages)) / 1e6:.1f} MB, {repeat} time(s) each")
+
+    def links(text):
+        return scraper.extract_links(scraper.parse_html(text, scraper.MODEL_TAGS))
+
+    rate = parse_rate(pages, lambda text: str(BeautifulSoup(text, scraper.SAVE_PARSER)), repeat)
+    print(f"[OK] {'save path (' + scraper.SAVE_PARSER + ' + str)':<32s} {rate:8.1f} pages/s")
+    for backend in ("html.parser", "lxml", "html5lib"):
+        if not builder_registry.lookup(backend):
+            print(f"[--] {backend:<32s} not installed")
+            continue
+        scraper.PARSER = backend
+        full = parse_rate(pages, lambda text: BeautifulSoup(text, backend), repeat)
+        print(f"[OK] {backend + ' full tree':<32s} {full:8.1f} pages/s")
+        if backend != "html5lib":  # html5lib cannot parse a subset of tags
+            rate = parse_rate(pages, links, repeat)
+            print(f"[OK] {backend + ' link pass':<32s} {rate:8.1f} pages/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the marketplace scraper against a local HTTP server.")
+    parser.add_argument("--mirror", default=str(HERE), help="Mirror tree to serve (default: this repository)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Worker counts to time")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated per-request latency (seconds)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Scraper --delay (host rate limit, seconds)")
+    parser.add_argument("--parse", action="store_true", help="Benchmark offline HTML parsing instead of fetching")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the pages for --parse")
+    args = parser.parse_args()
+
+    if args.parse:
+        bench_parse(Path(args.mirror), args.repeat)
+        return
+
+    routes = build_site(Path(args.mirror))
+    server = serve(routes, args.latency)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"[*] Serving {len(routes)} route(s) at {base} with {args.latency * 1000:.0f} ms latency")
+
+    digests = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.workers:
+            out = Path(tmp) / f"workers-{n}"
+            elapsed = run_scraper(base, out, n, args.delay)
+            digests[n] = tree_digest(out)
+            print(f"[OK] workers={n:<3d} wall={elapsed:8.2f} s  tree={digests[n][:12]}")
+    server.shutdown()
+
+    if len(set(digests.values())) != 1:
+        print("[!] Output differs between worker counts.", file=sys.stderr)
+        sys.exit(1)
+    print("[✓] Output identical across all runs.")
+
+if __name__ == "__main__":
+    main()
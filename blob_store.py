@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for mirror trees, and a duplicate report.
+
+Usage:
+    python blob_store.py snapshot --root ./sasview_marketplace_dump --store ./backup
+    python blob_store.py restore --store ./backup --dest ./restored [--snapshot NAME]
+    python blob_store.py dedup --root ./sasview_marketplace_dump
+    python blob_store.py report --root . --threshold 0.6 --json duplicates.json
+
+What it does:
+- A store keeps each distinct file body once, as <store>/blobs/<sha[:2]>/<sha256>.
+  Blobs are read-only and never rewritten, so adding a file whose content is
+  already stored costs nothing.
+- snapshot records every file of a mirror as path -> SHA-256 in
+  <store>/snapshots/<time>.json and adds only the blobs the store lacks. Files whose
+  size and mtime match the previous snapshot are not even re-hashed.
+- restore rebuilds a tree from a snapshot (copies by default, hardlinks with --link).
+- dedup moves a mirror's files into <root>/.blobs and replaces them with hardlinks,
+  so identical files share one inode (the scraper does this as it writes with --blobs).
+- report lists clusters of identical files, and of near-identical ones: each file is
+  reduced to winnowed Rabin-Karp fingerprints of its whitespace-normalized text, and
+  files whose fingerprint sets overlap (Jaccard) by at least --threshold are grouped.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+BLOB_DIR = ".blobs"
+SKIP_SUFFIXES = (".part", ".tmp")
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def mirror_files(root: Path, exclude: Path | None = None) -> list[Path]:
+    """
+    Every regular file of a mirror tree, skipping hidden directories (.git, .blobs),
+    __pycache__, partial downloads and anything under `exclude`.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        here = Path(dirpath)
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if not d.startswith(".") and d != "__pycache__" and (exclude is None or here / d != exclude)
+        )
+        files += [here / name for name in sorted(filenames) if not name.endswith(SKIP_SUFFIXES)]
+    return files
+
+# --- Store ----------------------------------------------------------------------
+
+class BlobStore:
+    """
+    Files keyed by the SHA-256 of their content, plus named snapshots of trees.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.blobs = root / "blobs"
+        self.snapshots = root / "snapshots"
+
+    def path_for(self, sha: str) -> Path:
+        return self.blobs / sha[:2] / sha
+
+    def has(self, sha: str) -> bool:
+        return self.path_for(sha).exists()
+
+    def put(self, src: Path, sha: str | None = None, link: bool = False) -> tuple[str, bool]:
+        """
+        Store the content of src; return (sha, True if a new blob was written).
+
+        With link, the blob is a hardlink to src rather than a copy (when both are
+        on the same filesystem), so src becomes read-only too.
+        """
+        sha = sha or file_sha256(src)
+        blob = self.path_for(sha)
+        if blob.exists():
+            return sha, False
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = blob.with_name(f"{sha}.{os.getpid()}.tmp")
+        try:
+            if not link:
+                raise OSError("copy requested")
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, blob)
+        return sha, True
+
+    def link(self, sha: str, dest: Path, copy: bool = False):
+        """
+        Make dest hold blob sha, as a hardlink when possible (else a copy).
+        """
+        blob = self.path_for(sha)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+        try:
+            if copy:
+                raise OSError("copy requested")
+            os.link(blob, tmp)
+        except OSError:
+            shutil.copyfile(blob, tmp)
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, dest)
+
+    def adopt(self, path: Path, sha: str | None = None) -> tuple[str, bool]:
+        """
+        Store path and make it a hardlink to its blob; return (sha, True if new).
+        """
+        sha, new = self.put(path, sha, link=True)
+        if not new and not os.path.samefile(path, self.path_for(sha)):
+            self.link(sha, path)
+        return sha, new
+
+    # Snapshots
+
+    def snapshot_names(self) -> list[str]:
+        return sorted(p.stem for p in self.snapshots.glob("*.json"))
+
+    def load_snapshot(self, name: str = "latest") -> dict:
+        names = self.snapshot_names()
+        if name == "latest":
+            if not names:
+                return {}
+            name = names[-1]
+        return json.loads((self.snapshots / f"{name}.json").read_text(encoding="utf-8"))
+
+    def snapshot(self, root: Path) -> tuple[str, dict]:
+        """
+        Store every file of root and record the tree; return (name, stats).
+        """
+        previous = self.load_snapshot().get("files", {})
+        files = {}
+        stats = {"files": 0, "hashed": 0, "new_blobs": 0, "new_bytes": 0, "total_bytes": 0}
+        for path in mirror_files(root, exclude=self.root):
+            rel = path.relative_to(root).as_posix()
+            st = path.stat()
+            old = previous.get(rel)
+            if old and (old["size"], old["mtime_ns"]) == (st.st_size, st.st_mtime_ns) and self.has(old["sha256"]):
+                sha, new = old["sha256"], False
+            else:
+                sha, new = self.put(path)
+                stats["hashed"] += 1
+            files[rel] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            stats["files"] += 1
+            stats["total_bytes"] += st.st_size
+            if new:
+                stats["new_blobs"] += 1
+                stats["new_bytes"] += st.st_size
+
+        self.snapshots.mkdir(parents=True, exist_ok=True)
+        name = time.strftime("%Y%m%dT%H%M%S")
+        while (self.snapshots / f"{name}.json").exists():
+            name += "+"
+        tmp = self.snapshots / f"{name}.json.tmp"
+        tmp.write_text(json.dumps({"root": str(root), "files": files}, indent=1), encoding="utf-8")
+        os.replace(tmp, self.snapshots / f"{name}.json")
+        return name, stats
+
+    def restore(self, name: str, dest: Path, link: bool = False) -> int:
+        files = self.load_snapshot(name).get("files", {})
+        for rel, entry in files.items():
+            self.link(entry["sha256"], dest / rel, copy=not link)
+        return len(files)
+
+# --- Duplicate report -----------------------------------------------------------
+
+KGRAM = 24      # characters per rolling-hash window
+WINNOW = 16     # hashes per winnowing window
+_BASE, _MOD = 257, (1 << 61) - 1
+_WS_RE = re.compile(rb"\s+")
+
+def fingerprints(data: bytes, k: int = KGRAM, w: int = WINNOW) -> set[int]:
+    """
+    Winnowed fingerprints of the whitespace-normalized data.
+
+    A Rabin-Karp hash rolls over every k-byte substring; from each window of w
+    consecutive hashes the minimum is kept. Any shared substring of at least
+    k + w - 1 bytes is guaranteed to contribute a shared fingerprint.
+    """
+    data = _WS_RE.sub(b" ", data).strip()
+    if len(data) < k:
+        return {hash(data)} if data else set()
+    top = pow(_BASE, k - 1, _MOD)
+    h = 0
+    for byte in data[:k]:
+        h = (h * _BASE + byte) % _MOD
+    picked = set()
+    window = deque()  # (index, hash) with increasing hashes: the front is the window minimum
+    for i in range(len(data) - k + 1):
+        if i:
+            h = ((h - data[i - 1] * top) * _BASE + data[i + k - 1]) % _MOD
+        while window and window[-1][1] >= h:
+            window.pop()
+        window.append((i, h))
+        if window[0][0] <= i - w:
+            window.popleft()
+        if i >= w - 1:
+            picked.add(window[0][1])
+    return picked
+
+class DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+def duplicate_report(paths: list[Path], root: Path, threshold: float, max_postings: int = 50) -> dict:
+    """
+    Exact clusters (same SHA-256) and near-duplicate clusters (fingerprint Jaccard
+    >= threshold, compared once per distinct content) of the given files.
+    """
+    by_sha = defaultdict(list)
+    for path in paths:
+        by_sha[file_sha256(path)].append(path)
+    exact = [
+        {"sha256": sha, "size": group[0].stat().st_size, "paths": [p.relative_to(root).as_posix() for p in group]}
+        for sha, group in sorted(by_sha.items()) if len(group) > 1
+    ]
+
+    prints = {sha: fingerprints(group[0].read_bytes()) for sha, group in by_sha.items()}
+    index = defaultdict(list)
+    for sha, fps in prints.items():
+        for fp in fps:
+            index[fp].append(sha)
+    pairs = set()
+    for postings in index.values():
+        # Fingerprints shared by very many files are boilerplate (licenses, headers)
+        if 1 < len(postings) <= max_postings:
+            pairs.update((a, b) for i, a in enumerate(postings) for b in postings[i + 1:])
+
+    similar = {}
+    clusters = DisjointSet()
+    for a, b in pairs:
+        fa, fb = prints[a], prints[b]
+        score = len(fa & fb) / len(fa | fb)
+        if score >= threshold:
+            similar[(a, b)] = score
+            clusters.union(a, b)
+    groups = defaultdict(set)
+    for a, b in similar:
+        groups[clusters.find(a)].update((a, b))
+    near = []
+    for members in groups.values():
+        members = sorted(members, key=lambda sha: by_sha[sha][0])
+        near.append({
+            "paths": [p.relative_to(root).as_posix() for sha in members for p in by_sha[sha]],
+            "similarity": {
+                f"{by_sha[a][0].relative_to(root).as_posix()} ~ {by_sha[b][0].relative_to(root).as_posix()}": round(s, 3)
+                for (a, b), s in sorted(similar.items(), key=lambda item: -item[1])
+                if a in members
+            },
+        })
+    near.sort(key=lambda c: c["paths"])
+    redundant = sum(c["size"] * (len(c["paths"]) - 1) for c in exact)
+    return {"files": len(paths), "distinct": len(by_sha), "redundant_bytes": redundant,
+            "exact": exact, "near": near}
+
+# --- CLI ------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed storage and duplicate report for mirror trees.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    snap = sub.add_parser("snapshot", help="Record a mirror tree in a store, adding only new blobs")
+    snap.add_argument("--root", required=True, help="Mirror tree")
+    snap.add_argument("--store", required=True, help="Store directory")
+
+    rest = sub.add_parser("restore", help="Rebuild a tree from a snapshot")
+    rest.add_argument("--store", required=True, help="Store directory")
+    rest.add_argument("--dest", required=True, help="Directory to restore into")
+    rest.add_argument("--snapshot", default="latest", help="Snapshot name (default: latest)")
+    rest.add_argument("--link", action="store_true", help="Hardlink blobs instead of copying them")
+
+    dedup = sub.add_parser("dedup", help="Hardlink the files of a mirror to blobs in <root>/.blobs")
+    dedup.add_argument("--root", required=True, help="Mirror tree")
+
+    report = sub.add_parser("report", help="List exact and near-duplicate files")
+    report.add_argument("--root", required=True, help="Mirror tree")
+    report.add_argument("--all", action="store_true", help="All files, not only the downloaded model files (*/files/*)")
+    report.add_argument("--threshold", type=float, default=0.6, help="Minimum fingerprint Jaccard similarity (0-1)")
+    report.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        root, store = Path(args.root).resolve(), BlobStore(Path(args.store).resolve())
+        start = time.perf_counter()
+        name, stats = store.snapshot(root)
+        print(f"[OK] Snapshot {name}: {stats['files']} file(s), {stats['total_bytes'] / 1e6:.1f} MB; "
+              f"{stats['hashed']} hashed, {stats['new_blobs']} new blob(s) ({stats['new_bytes'] / 1e6:.2f} MB) "
+              f"in {time.perf_counter() - start:.2f} s")
+    elif args.command == "restore":
+        store = BlobStore(Path(args.store).resolve())
+        n = store.restore(args.snapshot, Path(args.dest), link=args.link)
+        print(f"[OK] Restored {n} file(s) into {args.dest}")
+    elif args.command == "dedup":
+        root = Path(args.root).resolve()
+        store = BlobStore(root / BLOB_DIR)
+        files = mirror_files(root)
+        blobs = {store.adopt(path)[0] for path in files}
+        print(f"[OK] {len(files)} file(s) linked to {len(blobs)} blob(s) in {store.root}")
+    else:
+        root = Path(args.root).resolve()
+        files = mirror_files(root) if args.all else sorted(p for p in root.glob("*/files/*") if p.is_file())
+        start = time.perf_counter()
+        result = duplicate_report(files, root, args.threshold)
+        for cluster in result["exact"]:
+            print(f"[=] identical ({cluster['size']} bytes): " + ", ".join(cluster["paths"]))
+        for cluster in result["near"]:
+            print("[~] similar:")
+            for pair, score in cluster["similarity"].items():
+                print(f"      {score:.2f}  {pair}")
+        print(f"[i] {result['files']} file(s), {result['distinct']} distinct, "
+              f"{len(result['exact'])} identical cluster(s) ({result['redundant_bytes']} redundant bytes), "
+              f"{len(result['near'])} similar cluster(s) in {time.perf_counter() - start:.2f} s")
+        if args.json:
+            Path(args.json).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -41,16 +41,28 @@ Fq(double q, double *F1, double *F2, double core_sld, double core_radius,
    double solvent_sld, double fp_n, double sld[], double thickness[])
 {
   const int n = (int)(fp_n+0.5);
-  double f, r, last_sld;
-  r = core_radius;
-  last_sld = core_sld;
-  f = 0.;
+  double key[SHELL_KEY_SIZE];
+  int n_key = 0;
+  key[n_key++] = n;
+  key[n_key++] = core_sld;
+  key[n_key++] = core_radius;
+  key[n_key++] = solvent_sld;
   for (int i=0; i<n; i++) {
-    f += M_4PI_3 * cube(r) * (sld[i] - last_sld) * sas_3j1x_x(q*r);
-    last_sld = sld[i];
-    r += thickness[i];
+    key[n_key++] = sld[i];
+    key[n_key++] = thickness[i];
+  }
+
+  double buffer[SHELL_TABLE_SIZE];
+  int fill;
+  double *table = shell_table(key, n_key, buffer, &fill);
+  if (fill) {
+    shell_set_radii(table, core_radius, n, thickness);
+    shell_set_steps(table, 0, core_sld, n, sld, solvent_sld);
   }
-  f += M_4PI_3 * cube(r) * (solvent_sld - last_sld) * sas_3j1x_x(q*r);
+
+  double bes[SHELL_N];
+  shell_bessel(q, table, bes);
+  const double f = shell_sum(table, 0, bes);
   *F1 = 1e-2 * f;
   *F2 = 1e-4 * f * f;
 }
@@ -99,7 +99,7 @@ parameters = [["sld_core", "1e-6/Ang^2", 1.0, [-inf, inf], "sld",
                "Thickness of shell k"],
              ]
 
-source = ["lib/sas_3j1x_x.c", "core_multi_shell.c"]
+source = ["lib/sas_3j1x_x.c", "multi_shell.c", "core_multi_shell.c"]
 have_Fq = True
 radius_effective_modes = ["outer radius", "core radius"]
 
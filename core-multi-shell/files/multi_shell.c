@@ -0,0 +1,149 @@
+/*  Amplitude of a sphere of concentric shells, shared by the multi-shell
+    sphere models (keep the copies in each model directory identical)
+
+    A profile that is constant between the boundaries r_0 < r_1 < ... < r_n
+    and equal to the solvent beyond r_n has the amplitude
+
+        f(q) = sum_k V(r_k) (rho_in - rho_out) 3 j1(q r_k)/(q r_k)
+
+    with V(r) = 4/3 pi r^3 and rho_in, rho_out the values either side of r_k.
+    A shell table keeps the radii and volumes of the boundaries, and
+    SHELL_CHANNELS values for each boundary, as contiguous arrays. A model
+    with several contrasts (nuclear and magnetic, say) finds the Bessel
+    factor V(r_k) 3 j1(q r_k)/(q r_k) once per boundary and sums every channel
+    against it, rather than walking the shells once per contrast.
+
+    The table depends only on the parameters. On the CPU it is kept between
+    calls and rebuilt only when they change; GPU kernels have no writable
+    static storage and fill the caller's buffer at every q.
+*/
+
+#define SHELL_N 11              // boundaries: a core and up to 10 shells
+#define SHELL_CHANNELS 5        // values kept for each boundary
+#define SHELL_KEY_SIZE 64       // parameters that identify a table
+#define SHELL_RADIUS 0          // offsets of the arrays in a shell table
+#define SHELL_VOLUME SHELL_N
+#define SHELL_VALUE(c) ((2 + (c))*SHELL_N)
+#define SHELL_COUNT ((2 + SHELL_CHANNELS)*SHELL_N)
+#define SHELL_TABLE_SIZE (SHELL_COUNT + 1)
+
+#if !defined(USE_GPU)
+static double shell_cache[SHELL_TABLE_SIZE];
+static double shell_cache_key[SHELL_KEY_SIZE];
+static int shell_cache_key_n = 0;   // 0 until the first table is built
+#if defined(USE_OPENMP)
+#pragma omp threadprivate(shell_cache, shell_cache_key, shell_cache_key_n)
+#endif
+#endif
+
+// The table for the parameters key[0..n_key-1], with *fill set if the caller
+// has to build it: on the CPU the table of the previous call, which is still
+// valid if the parameters are the same, and on the GPU the caller's buffer.
+static double *
+shell_table(double key[], int n_key, double *buffer, int *fill)
+{
+#if !defined(USE_GPU)
+    int same = (n_key == shell_cache_key_n);
+    for (int i=0; same && i<n_key; i++) {
+        same = (key[i] == shell_cache_key[i]);
+    }
+    if (!same) {
+        for (int i=0; i<n_key; i++) {
+            shell_cache_key[i] = key[i];
+        }
+        shell_cache_key_n = n_key;
+    }
+    *fill = !same;
+    return shell_cache;
+#else
+    *fill = 1;
+    return buffer;
+#endif
+}
+
+// Boundaries at core_radius and at the outer radius of each of n shells.
+static void
+shell_set_radii(double *table, double core_radius, int n, double thickness[])
+{
+    double r = core_radius;
+    for (int k=0; k<=n; k++) {
+        table[SHELL_RADIUS + k] = r;
+        table[SHELL_VOLUME + k] = M_4PI_3*cube(r);
+        if (k < n) r += thickness[k];
+    }
+    table[SHELL_COUNT] = n + 1;
+}
+
+// Channel c holds the steps rho_in - rho_out of a profile equal to inside in
+// the core, values[k] in shell k and outside beyond the last shell.
+static void
+shell_set_steps(double *table, int c, double inside, int n, double values[], double outside)
+{
+    double last = inside;
+    for (int k=0; k<n; k++) {
+        table[SHELL_VALUE(c) + k] = last - values[k];
+        last = values[k];
+    }
+    table[SHELL_VALUE(c) + n] = last - outside;
+}
+
+// bes[k] = V(r_k) 3 j1(q r_k)/(q r_k) for each boundary of the table.
+static void
+shell_bessel(double q, double *table, double bes[])
+{
+    const int count = (int)table[SHELL_COUNT];
+    for (int k=0; k<count; k++) {
+        bes[k] = table[SHELL_VOLUME + k]*sas_3j1x_x(q*table[SHELL_RADIUS + k]);
+    }
+}
+
+// sum_k value_c[k] bes[k], the amplitude of channel c.
+static double
+shell_sum(double *table, int c, double bes[])
+{
+    const int count = (int)table[SHELL_COUNT];
+    double f = 0.0;
+    for (int k=0; k<count; k++) {
+        f += table[SHELL_VALUE(c) + k]*bes[k];
+    }
+    return f;
+}
+
+// sum_k (value_c[k] bes[k])^2, for terms that add incoherently.
+static double
+shell_sum_squares(double *table, int c, double bes[])
+{
+    const int count = (int)table[SHELL_COUNT];
+    double f2 = 0.0;
+    for (int k=0; k<count; k++) {
+        f2 += square(table[SHELL_VALUE(c) + k]*bes[k]);
+    }
+    return f2;
+}
+
+// sum_{i<n} [V(a_i) 3 j1(q a_i)/(q a_i) - V(b_i) 3 j1(q b_i)/(q b_i)] for n
+// layers from a_i = r0 + i period to b_i = a_i + width, which need no table.
+// Away from low q, V(r) 3 j1(qr)/(qr) = 4 pi (sin qr - qr cos qr)/q^3 and the
+// sine and cosine at b_i come from those at a_i by a rotation through q width.
+static double
+shell_layers(double q, double r0, double width, double period, int n)
+{
+    double sin_w, cos_w;
+    SINCOS(q*width, sin_w, cos_w);
+    const double scale = 4.0*M_PI/cube(q);
+    double f = 0.0;
+    for (int i=0; i<n; i++) {
+        const double a = r0 + i*period;
+        const double b = a + width;
+        if (q*a < SPH_J1C_CUTOFF) {
+            f += M_4PI_3*cube(a)*sas_3j1x_x(q*a) - M_4PI_3*cube(b)*sas_3j1x_x(q*b);
+        } else {
+            double sin_a, cos_a;
+            SINCOS(q*a, sin_a, cos_a);
+            const double sin_b = sin_a*cos_w + cos_a*sin_w;
+            const double cos_b = cos_a*cos_w - sin_a*sin_w;
+            f += scale*((sin_a - q*a*cos_a) - (sin_b - q*b*cos_b));
+        }
+    }
+    return f;
+}
@@ -291,7 +291,10 @@ parameters = [
     ["cumulant3", "", 0.0, [-inf, inf], "", "3rd cumulant"],
 ]
 
-def Iq(q, angle, temperature, viscosity, ref_index, wavelength, radius, pdi, cumulant3):
+def decay_rate(angle, temperature, viscosity, ref_index, wavelength, radius):
+    """
+    First cumulant (/s) of spheres of *radius* (nm) by Stokes-Einstein.
+    """
     pi = 3.141592654
     kB = 1.38064852e-23
     Tabs = 273.16+temperature
@@ -300,7 +303,16 @@ def Iq(q, angle, temperature, viscosity, ref_index, wavelength, radius, pdi, cum
     radius_in_m = radius/1.0e+09
     QQ = np.power((4.0*pi*ref_index/wavelength_in_m)*np.sin(angle/2.0),2.0)
     
-    cumulant1 = (kB*Tabs*QQ)/(6.0*pi*viscosity_in_si*radius_in_m)
+    return (kB*Tabs*QQ)/(6.0*pi*viscosity_in_si*radius_in_m)
+
+def z_average_radius(angle, temperature, viscosity, ref_index, wavelength, cumulant1):
+    """
+    Radius (nm) whose Stokes-Einstein decay rate is *cumulant1* (/s).
+    """
+    return decay_rate(angle, temperature, viscosity, ref_index, wavelength, 1.0)/cumulant1
+
+def Iq(q, angle, temperature, viscosity, ref_index, wavelength, radius, pdi, cumulant3):
+    cumulant1 = decay_rate(angle, temperature, viscosity, ref_index, wavelength, radius)
     cumulant2 = pdi*np.power(cumulant1,2.0)
 
 #    FORMULA 1    
@@ -309,9 +321,9 @@ def Iq(q, angle, temperature, viscosity, ref_index, wavelength, radius, pdi, cum
 #    ((1.0/3.0)*cumulant3*np.power(q,3.0)))
 
 #   FORMULA 2
-    result = 
+    result = (
     np.exp(-2.0*cumulant1*q)*np.power((1.0+(cumulant2*np.power(q,2.0)/2.0)- 
-    (cumulant3*np.power(q,3.0)/6.0)),2.0)
+    (cumulant3*np.power(q,3.0)/6.0)),2.0))
     
     return result
 	
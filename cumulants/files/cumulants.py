@@ -251,9 +251,9 @@ def Iq(q, cumulant1, cumulant2, cumulant3):
 #    ((1.0/3.0)*cumulant3*np.power(q,3.0)))
 
 #   FORMULA 2
-    result = 
+    result = (
     np.exp(-2.0*cumulant1*q)*np.power((1.0+(cumulant2*np.power(q,2.0)/2.0)- 
-    (cumulant3*np.power(q,3.0)/6.0)),2.0)
+    (cumulant3*np.power(q,3.0)/6.0)),2.0))
     
     return result
 	
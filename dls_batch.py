@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Batch cumulant fits of DLS correlograms exported by an LSi/ALV-style correlator.
+
+Usage:
+    python dls_batch.py fit ./correlograms --out results.csv
+    python dls_batch.py fit ./correlograms --pattern "*.dat" --cumulants 3
+    python dls_batch.py synth ./synthetic --count 10000
+    python dls_batch.py bench --count 10000
+
+What it does:
+- read_correlogram() takes the measurement conditions from the header block
+  ("Scattering angle:", "Temperature (K):", ...) and the rows after the
+  "Lag time (s)  g2-1" line, and stops at the "Count Rate History" section,
+  which is never parsed. Files of MMAP_BYTES or more are memory-mapped, so only
+  the pages holding the header and the correlation function are read.
+- fit_cumulants() fits FORMULA 2 of the cumulants model,
+      g2 - 1 = A exp(-2 G1 tau) (1 + G2 tau^2/2 - G3 tau^3/6)^2 + B,
+  to a whole batch of correlograms at once. A weighted least-squares line through
+  log(g2 - 1) against tau and tau^2 gives the starting A, G1 and G2; batched
+  Levenberg-Marquardt steps then solve the normal equations of every correlogram
+  still improving as one stack (numpy.linalg.solve). Correlograms of different
+  lengths are padded and masked.
+- As the model docs advise, the whole tail is not fitted: points with
+  tau <= --tau-min, and those after g2 - 1 last exceeds --cutoff times the
+  intercept, are left out.
+- The z-average radius comes from the Stokes-Einstein relation of the
+  cumulants_dls model (decay_rate), with the file's measurement conditions, and
+  PDI = G2/G1^2. Conditions missing from a header take the model defaults.
+- The header and the results give the scattering angle in degrees. The
+  model's decay_rate takes sin(angle/2) of its angle as given, i.e. in radians,
+  although its parameter is labelled degrees, so the angle is converted before
+  it is passed on (model_conditions). Radii from this tool are therefore
+  smaller than those of a SasView fit of the same file: at 110 degrees the
+  model's radius is sin^2(55)/sin^2(55 deg) = 1.49 times the true one.
+- bench writes --count synthetic files from cumulants_dls.Iq (random radius,
+  PDI and intercept, with noise) to a temporary directory, reads and fits them,
+  and reports correlograms per second and how well radius and PDI come back.
+"""
+
+import argparse
+import csv
+import importlib.util
+import itertools
+import mmap
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+MODEL = Path(__file__).resolve().parent / "cumulants-dls" / "files" / "cumulants_dls.py"
+MMAP_BYTES = 1 << 20
+DATA_START = b"Lag time"
+DATA_END = b"Count Rate History"
+# Header labels (lower case) of the conditions used by cumulants_dls
+HEADER_KEYS = {
+    "scattering angle": "angle",
+    "temperature (k)": "temperature",
+    "viscosity (mpas)": "viscosity",
+    "refractive index": "ref_index",
+    "wavelength (nm)": "wavelength",
+}
+CONDITIONS = ("angle", "temperature", "viscosity", "ref_index", "wavelength")
+KELVIN = 273.16  # the zero of cumulants_dls' temperature in degC
+RESULT_FIELDS = ("path",) + CONDITIONS + (
+    "intercept", "background", "cumulant1", "cumulant2", "cumulant3",
+    "radius", "pdi", "chi2", "points", "iterations", "converged")
+
+def load_model():
+    """
+    The mirrored cumulants_dls model, imported as a plain module.
+    """
+    spec = importlib.util.spec_from_file_location("cumulants_dls", MODEL)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+cumulants_dls = load_model()
+DEFAULTS = {p[0]: p[2] for p in cumulants_dls.parameters if p[0] in CONDITIONS}
+
+def model_conditions(conditions: dict) -> tuple:
+    """
+    The CONDITIONS arguments of cumulants_dls.decay_rate, with the angle in
+    degrees converted to the radians its sin(angle/2) expects.
+    """
+    return tuple(np.radians(conditions[key]) if key == "angle" else conditions[key]
+                 for key in CONDITIONS)
+
+# --- Reading --------------------------------------------------------------------
+
+def parse_correlogram(buf, name: str = "<data>") -> dict:
+    """
+    {"tau", "g2", "conditions"} from the bytes (or mmap) of a correlator export.
+
+    Raises ValueError if there is no "Lag time" block or it is not two columns.
+    """
+    start = buf.find(DATA_START)
+    if start < 0:
+        raise ValueError(f"{name}: no '{DATA_START.decode()}' block")
+    conditions = dict(DEFAULTS)
+    for line in bytes(buf[:start]).decode("latin-1").splitlines():
+        label, _, value = line.partition(":")
+        key = HEADER_KEYS.get(label.strip().lower())
+        if key is not None and value.strip():
+            conditions[key] = float(value) - (KELVIN if key == "temperature" else 0.0)
+
+    body = buf.find(b"\n", start) + 1
+    end = buf.find(DATA_END, body)
+    values = np.array(bytes(buf[body:end if end >= 0 else len(buf)]).split(), dtype=float)
+    if values.size == 0 or values.size % 2:
+        raise ValueError(f"{name}: the '{DATA_START.decode()}' block is not two columns")
+    values = values.reshape(-1, 2)
+    return {"tau": values[:, 0], "g2": values[:, 1], "conditions": conditions}
+
+def read_correlogram(path: Path) -> dict:
+    """
+    parse_correlogram() of a file, memory-mapped if it is MMAP_BYTES or larger.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return parse_correlogram(buf, str(path))
+        return parse_correlogram(f.read(), str(path))
+
+def iter_correlograms(paths):
+    """
+    (path, correlogram) for each readable file, warning about the others.
+    """
+    for path in paths:
+        try:
+            yield path, read_correlogram(path)
+        except (OSError, ValueError) as exc:
+            print(f"[!] {exc}", file=sys.stderr)
+
+# --- Fitting --------------------------------------------------------------------
+
+def pad(correlograms: list[dict]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    tau, g2 and a mask of real points, padded to the longest correlogram.
+    """
+    n = max(len(c["tau"]) for c in correlograms)
+    tau = np.zeros((len(correlograms), n))
+    g2 = np.zeros((len(correlograms), n))
+    valid = np.zeros((len(correlograms), n), dtype=bool)
+    for row, c in enumerate(correlograms):
+        tau[row, :len(c["tau"])] = c["tau"]
+        g2[row, :len(c["g2"])] = c["g2"]
+        valid[row, :len(c["tau"])] = True
+    return tau, g2, valid
+
+def fit_window(tau, g2, valid, tau_min: float, cutoff: float) -> np.ndarray:
+    """
+    Points after tau_min up to the last one above cutoff times the intercept,
+    estimated as the median of the first five points after tau_min.
+    """
+    after = valid & (tau > tau_min)
+    first = after & (np.cumsum(after, axis=1) <= 5)
+    with np.errstate(all="ignore"):
+        amplitude = np.nanmedian(np.where(first, g2, np.nan), axis=1)
+    above = after & (g2 > cutoff*amplitude[:, None])
+    # everything before the last point above the cutoff
+    before_last = np.logical_or.accumulate(above[:, ::-1], axis=1)[:, ::-1]
+    return after & before_last
+
+def initial_estimate(tau, g2, mask) -> np.ndarray:
+    """
+    (A, G1, G2) from log(g2 - 1) = log A - 2 G1 tau + G2 tau^2, weighted by
+    (g2 - 1)^2, with tau scaled by the longest lag fitted.
+    """
+    use = mask & (g2 > 0)
+    tau_ref = np.where(use, tau, 0.0).max(axis=1)
+    tau_ref[tau_ref == 0] = 1.0
+    t = tau/tau_ref[:, None]
+    weight = np.where(use, g2*g2, 0.0)
+    log_g2 = np.log(np.where(use, g2, 1.0))
+    basis = np.stack([np.ones_like(t), t, t*t], axis=-1)
+    normal = np.einsum("mn,mni,mnj->mij", weight, basis, basis) + 1e-12*np.eye(3)
+    coef = np.linalg.solve(normal, np.einsum("mn,mni,mn->mi", weight, basis, log_g2)[..., None])[..., 0]
+    return np.stack([np.exp(coef[:, 0]), -0.5*coef[:, 1]/tau_ref, coef[:, 2]/tau_ref**2], axis=-1)
+
+def cumulant_model(p, t, order: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    FORMULA 2 and its Jacobian in the parameters (A, B, g1, g2[, g3]) at the
+    scaled lag times t.
+    """
+    A, B, g1, g2 = (p[:, k, None] for k in range(4))
+    g3 = p[:, 4, None] if order == 3 else 0.0
+    with np.errstate(over="ignore", invalid="ignore"):
+        decay = np.exp(-2.0*g1*t)
+        poly = 1.0 + 0.5*g2*t*t - g3*t**3/6.0
+        AEP = A*decay*poly
+        columns = [decay*poly*poly, np.ones_like(t), -2.0*t*AEP*poly, AEP*t*t]
+        if order == 3:
+            columns.append(-AEP*t**3/3.0)
+        return AEP*poly + B, np.stack(columns, axis=-1)
+
+def levenberg_marquardt(t, g2, mask, p, order: int, max_iter: int, rtol: float) -> tuple:
+    """
+    Refine the rows of p, fitting cumulant_model() to g2 at the points in mask.
+
+    Returns (p, cost, iterations, converged). Rows stop once the residual is
+    orthogonal to the Jacobian to within rtol, or a step lowers the cost by less
+    than rtol; only the rows still running are evaluated.
+    """
+    k = order + 2
+
+    def evaluate(rows, params):
+        f, J = cumulant_model(params, t[rows], order)
+        r = np.where(mask[rows], g2[rows] - f, 0.0)
+        J = np.where(mask[rows, :, None], J, 0.0)
+        cost = np.einsum("mn,mn->m", r, r)
+        cost[~np.isfinite(cost)] = np.inf
+        return cost, J, r
+
+    def normal(J, r):
+        JT = J.transpose(0, 2, 1)
+        return JT @ J, (JT @ r[..., None])[..., 0]
+
+    p = p.copy()
+    cost, J, r = evaluate(slice(None), p)
+    JTJ, JTr = normal(J, r)
+    lam = np.full(len(p), 1e-3)
+    nu = np.full(len(p), 2.0)
+    iterations = np.zeros(len(p), dtype=int)
+    done = mask.sum(axis=1) <= k
+    eye = np.eye(k)
+    for _ in range(max_iter):
+        rows = np.flatnonzero(~done)
+        if not rows.size:
+            break
+        iterations[rows] += 1
+        damping = lam[rows, None, None]*(JTJ[rows]*eye + 1e-12*eye)
+        step = np.linalg.solve(JTJ[rows] + damping, JTr[rows][..., None])[..., 0]
+        trial = p[rows] + step
+        trial_cost, trial_J, trial_r = evaluate(rows, trial)
+        # gain ratio of the actual to the linearized decrease (Nielsen's update)
+        predicted = np.einsum("mi,mi->m", step, JTr[rows] + np.einsum("mij,mj->mi", damping, step))
+        gain = (cost[rows] - trial_cost)/np.where(predicted > 0, predicted, np.inf)
+        better = gain > 0
+        small = cost[rows] - trial_cost <= rtol*trial_cost
+
+        accept = rows[better]
+        p[accept] = trial[better]
+        cost[accept] = trial_cost[better]
+        JTJ[accept], JTr[accept] = normal(trial_J[better], trial_r[better])
+        lam[rows] *= np.where(better, np.maximum(1.0/3.0, 1.0 - (2.0*gain - 1.0)**3), nu[rows])
+        nu[rows] = np.where(better, 2.0, 2.0*nu[rows])
+        diag = np.einsum("mii->mi", JTJ[rows])
+        cosine = np.abs(JTr[rows])/np.sqrt(diag*cost[rows][:, None] + 1e-300)
+        done[rows] = (cosine.max(axis=1) <= rtol) | (better & small) | (lam[rows] > 1e16)
+    return p, cost, iterations, done
+
+def fit_cumulants(tau, g2, mask, order: int = 2, max_iter: int = 300, rtol: float = 1e-10) -> dict:
+    """
+    Levenberg-Marquardt fits of FORMULA 2 to each row of g2 at the points in
+    mask, with (order - 1) cumulants beyond the first (G2, or G2 and G3).
+
+    The lag times of each row are scaled by its starting G1, so the parameters
+    are of order one and the normal equations of every row can be solved together.
+    As the model docs recommend, G3 is only added once G2 has been fitted.
+    """
+    # only the lags some row fits
+    used = np.flatnonzero(mask.any(axis=0))
+    if used.size:
+        window = slice(used[0], used[-1] + 1)
+        tau, g2, mask = tau[:, window], g2[:, window], mask[:, window]
+    start = initial_estimate(tau, g2, mask)
+    npts = mask.sum(axis=1)
+    fallback = np.where(mask, tau, 0.0).max(axis=1)
+    rate = np.where(np.isfinite(start[:, 1]) & (start[:, 1] > 0), start[:, 1],
+                    1.0/np.where(fallback > 0, fallback, 1.0))
+    t = tau*rate[:, None]
+    p = np.zeros((len(tau), 4))
+    p[:, 0] = np.where(np.isfinite(start[:, 0]), start[:, 0], 1.0)
+    p[:, 2] = 1.0
+    p[:, 3] = np.where(np.isfinite(start[:, 2]), start[:, 2]/rate**2, 0.0)
+    p, cost, iterations, done = levenberg_marquardt(t, g2, mask, p, 2, max_iter, rtol)
+    if order == 3:
+        p = np.column_stack([p, np.zeros(len(p))])
+        p, cost, more, done = levenberg_marquardt(t, g2, mask, p, 3, max_iter, rtol)
+        iterations += more
+
+    k = order + 2
+    gamma1, gamma2 = p[:, 2]*rate, p[:, 3]*rate**2
+    gamma3 = p[:, 4]*rate**3 if order == 3 else np.zeros(len(tau))
+    failed = npts <= k
+    result = {
+        "intercept": p[:, 0], "background": p[:, 1],
+        "cumulant1": gamma1, "cumulant2": gamma2, "cumulant3": gamma3,
+        "chi2": cost/np.maximum(npts - k, 1), "points": npts,
+        "iterations": iterations, "converged": done & ~failed,
+    }
+    for key in ("intercept", "background", "cumulant1", "cumulant2", "cumulant3", "chi2"):
+        result[key] = np.where(failed, np.nan, result[key])
+    return result
+
+def analyse(correlograms: list[dict], order: int = 2, tau_min: float = 1e-7, cutoff: float = 0.1) -> dict:
+    """
+    fit_cumulants() of a batch, with the z-average radius and PDI of each.
+    """
+    tau, g2, valid = pad(correlograms)
+    result = fit_cumulants(tau, g2, fit_window(tau, g2, valid, tau_min, cutoff), order=order)
+    conditions = {key: np.array([c["conditions"][key] for c in correlograms]) for key in CONDITIONS}
+    result.update(conditions)
+    result["radius"] = cumulants_dls.z_average_radius(*model_conditions(conditions), result["cumulant1"])
+    result["pdi"] = result["cumulant2"]/result["cumulant1"]**2
+    return result
+
+def fit_files(paths, order: int = 2, tau_min: float = 1e-7, cutoff: float = 0.1, batch: int = 4096):
+    """
+    Result rows (dicts keyed by RESULT_FIELDS) for the readable files, fitted
+    batch files at a time, plus the seconds spent reading and fitting.
+    """
+    rows, read_time, fit_time = [], 0.0, 0.0
+    stream = iter_correlograms(paths)
+    while True:
+        start = time.perf_counter()
+        chunk = list(itertools.islice(stream, batch))
+        read_time += time.perf_counter() - start
+        if not chunk:
+            break
+        start = time.perf_counter()
+        result = analyse([c for _, c in chunk], order=order, tau_min=tau_min, cutoff=cutoff)
+        fit_time += time.perf_counter() - start
+        for i, (path, _) in enumerate(chunk):
+            row = {key: result[key][i].item() for key in RESULT_FIELDS if key != "path"}
+            rows.append({"path": str(path), **row})
+    return rows, read_time, fit_time
+
+# --- Synthetic data -------------------------------------------------------------
+
+def lag_times(linear: int = 16, per_octave: int = 8, first: float = 1.25e-8, longest: float = 50.0) -> np.ndarray:
+    """
+    Multi-tau lag times: linear channels, then blocks whose spacing doubles.
+    """
+    tau = list(first*np.arange(linear))
+    step = first
+    while tau[-1] < longest:
+        step *= 2.0
+        tau += list(tau[-1] + step*np.arange(1, per_octave + 1))
+    return np.array(tau)
+
+def synthetic_file(path: Path, rng, tau: np.ndarray, noise: float = 2e-3) -> dict:
+    """
+    Write one correlogram in the LSi export format and return its true values.
+    """
+    truth = {
+        "radius": float(np.exp(rng.uniform(np.log(5.0), np.log(500.0)))),
+        "pdi": float(rng.uniform(0.0, 0.3)),
+        "intercept": float(rng.uniform(0.6, 0.95)),
+        "angle": 110.0, "ref_index": 1.33, "wavelength": 642.0,
+        "temperature": float(rng.uniform(293.0, 313.0)) - KELVIN,
+        "viscosity": float(rng.uniform(0.6, 1.0)),
+    }
+    g2 = truth["intercept"]*cumulants_dls.Iq(
+        tau, *model_conditions(truth), truth["radius"], truth["pdi"], 0.0)
+    g2 = g2 + rng.normal(0.0, noise, len(tau))
+    g2[:3] = (215.3, -1.0, 0.019)  # detector artefacts at the shortest lags
+    history = np.linspace(0.0, 60.0, 600)
+    rate = rng.normal(19000.0, 500.0, len(history))
+
+    lines = [
+        "03/08/2020\t17:30 PM", "Pseudo Cross Correlation",
+        f"Scattering angle:\t{truth['angle']:.1f}", "Duration (s):\t60",
+        f"Wavelength (nm):\t{truth['wavelength']:.1f}", f"Refractive index:\t{truth['ref_index']:.3f}",
+        f"Viscosity (mPas):\t{truth['viscosity']:.4f}",
+        f"Temperature (K):\t{truth['temperature'] + KELVIN:.4f}",
+        "Laser intensity (mW):\t0.0", "Intercept:\t1.0000", "",
+        "Lag time (s)         g2-1",
+    ]
+    lines += [f"{x:.6e}\t{y:.6e}" for x, y in zip(tau, g2)]
+    lines += ["", "Count Rate History (KHz)  CR CHA / CR CHB"]
+    lines += [f"{x:.6f}\t{y:.6f}\t{y:.6f}" for x, y in zip(history, rate)]
+    path.write_text("\n".join(lines) + "\n")
+    return truth
+
+def write_synthetic(directory: Path, count: int, seed: int = 0) -> dict:
+    """
+    count synthetic files in directory; the true values keyed by path.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tau = lag_times()
+    return {str(directory / f"dls_{i:05d}.dat"): synthetic_file(directory / f"dls_{i:05d}.dat", rng, tau)
+            for i in range(count)}
+
+# --- CLI ------------------------------------------------------------------------
+
+def input_files(directory: Path, pattern: str) -> list[Path]:
+    return sorted(p for p in directory.glob(pattern) if p.is_file())
+
+def write_results(rows: list[dict], out: Path | None):
+    handle = open(out, "w", newline="") if out else sys.stdout
+    try:
+        writer = csv.DictWriter(handle, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if out:
+            handle.close()
+
+def report_throughput(n: int, read_time: float, fit_time: float):
+    total = read_time + fit_time
+    print(f"[i] {n} correlogram(s): read {read_time:.2f} s, fit {fit_time:.2f} s, "
+          f"{n / total if total else 0.0:.0f} correlograms/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch cumulant fits of DLS correlogram files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def fit_options(p):
+        p.add_argument("--cumulants", type=int, choices=(2, 3), default=2, help="Cumulants fitted (default 2)")
+        p.add_argument("--tau-min", type=float, default=1e-7, help="Shortest lag time fitted, s (default 1e-7)")
+        p.add_argument("--cutoff", type=float, default=0.1,
+                       help="Fit up to where g2-1 last exceeds this fraction of the intercept (default 0.1)")
+        p.add_argument("--batch", type=int, default=4096, help="Correlograms fitted together (default 4096)")
+
+    fit = sub.add_parser("fit", help="Fit every correlogram file in a directory")
+    fit.add_argument("directory", type=Path)
+    fit.add_argument("--pattern", default="*", help="Glob for the files (default *)")
+    fit.add_argument("--out", type=Path, help="CSV of results (default stdout)")
+    fit_options(fit)
+    synth = sub.add_parser("synth", help="Write synthetic correlogram files")
+    synth.add_argument("directory", type=Path)
+    synth.add_argument("--count", type=int, default=10000)
+    synth.add_argument("--seed", type=int, default=0)
+    bench = sub.add_parser("bench", help="Time reading and fitting synthetic correlograms")
+    bench.add_argument("--count", type=int, default=10000)
+    bench.add_argument("--seed", type=int, default=0)
+    fit_options(bench)
+    args = parser.parse_args()
+
+    if args.command == "synth":
+        write_synthetic(args.directory, args.count, args.seed)
+        print(f"[OK] Wrote {args.count} correlogram(s) to {args.directory}")
+    elif args.command == "fit":
+        paths = input_files(args.directory, args.pattern)
+        rows, read_time, fit_time = fit_files(paths, args.cumulants, args.tau_min, args.cutoff, args.batch)
+        write_results(rows, args.out)
+        report_throughput(len(rows), read_time, fit_time)
+        failed = sum(not row["converged"] for row in rows)
+        if failed:
+            print(f"[!] {failed} fit(s) did not converge", file=sys.stderr)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            truth = write_synthetic(Path(tmp), args.count, args.seed)
+            print(f"[*] Wrote {args.count} synthetic correlogram(s) in {time.perf_counter() - start:.1f} s")
+            rows, read_time, fit_time = fit_files(input_files(Path(tmp), "*.dat"), args.cumulants,
+                                                  args.tau_min, args.cutoff, args.batch)
+        report_throughput(len(rows), read_time, fit_time)
+        radius_error = np.array([row["radius"]/truth[row["path"]]["radius"] - 1.0 for row in rows])
+        pdi_error = np.array([row["pdi"] - truth[row["path"]]["pdi"] for row in rows])
+        converged = sum(row["converged"] for row in rows)
+        print(f"[OK] {converged}/{len(rows)} converged; radius error median {np.median(np.abs(radius_error)):.2%}, "
+              f"95th percentile {np.percentile(np.abs(radius_error), 95):.2%}; "
+              f"PDI error median {np.median(np.abs(pdi_error)):.3f}")
+
+if __name__ == "__main__":
+    main()
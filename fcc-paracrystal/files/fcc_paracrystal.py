@@ -129,9 +129,12 @@ Thus the peak positions correspond to (just the first 5)
 
   The calculation of $Z(q)$ is a double numerical integral that must be
   carried out with a high density of points to properly capture the sharp
-  peaks of the paracrystalline scattering. So be warned that the calculation
-  is slow. Fitting of any experimental data must be resolution smeared for
-  any meaningful fit. This makes a triple integral which may be very slow.
+  peaks of the paracrystalline scattering. Only the 1/12 of the orientations
+  that is unique under the lattice symmetry is integrated, with more points
+  where the peaks are sharpest (low $q$, small $d_{factor}$). Even so, be
+  warned that the calculation is slow. Fitting of any experimental data must
+  be resolution smeared for any meaningful fit. This makes a triple integral
+  which may be very slow.
   If a double-precision GPU with OpenCL support is available this may improve
   the speed of the calculation.
 
@@ -192,7 +195,7 @@ parameters = [["dnn", "Ang", 220, [-inf, inf], "", "Nearest neighbour distance"]
              ]
 # pylint: enable=bad-whitespace, line-too-long
 
-source = ["lib/sas_3j1x_x.c", "lib/gauss150.c", "lib/sphere_form.c", "fcc_paracrystal.c"]
+source = ["lib/sas_3j1x_x.c", "lib/adaptive.c", "lib/sphere_form.c", "fcc_paracrystal.c"]
 
 def random():
     """Return a random parameter set for the model."""
@@ -213,9 +216,14 @@ def random():
 #
 # October 26, 2022, PDB fixed unit tests to conform to new maths
 # TODO: fix the 2d tests
+# October 18, 2026 the 1D values are an independent orientation average of Z(q) over
+# the full sphere (composite Gauss-Legendre, converged to 1e-10), not model output;
+# Iq agrees to 1e-10 (the old 150x150 grid was off by 3.4% at q=4*pi/220). The point
+# at q=0.001 was dropped: its peaks are so narrow that even 4000x4000 points do not
+# converge, so no test value there can be trusted.
 q = 4.*pi/220.
 tests = [
-    [{}, [0.001, q, 0.25], [1.9839734995338474, 0.3352457353010224, 0.005804136688760973]],
+    [{}, [q, 0.25], [0.34705621316358276, 0.005804463055014912]],
     #[{}, (-0.047, -0.007), 238.103096286],
     #[{}, (0.053, 0.063), 0.863609587796],
 ]
@@ -2,7 +2,10 @@
 //
 // C99 needs declarations of routines here
 double Iq(double QQ,
-      double radius_effective, double zz, double VolFrac, double Temp, double csalt, double dialec);
+      double radius_effective, double VolFrac, double zz, double Temp, double csalt, double dialec);
+int
+msa_coefficients(double radius_effective, double VolFrac, double zz, double Temp, double csalt, double dialec,
+      double gMSAWave[]);
 int
 sqcoef(int ir, double gMSAWave[]);
 
@@ -11,20 +14,97 @@ sqfun(int ix, int ir, double gMSAWave[]);
 
 double
 sqhcal(double qq, double gMSAWave[]);
-  
+
+// The MSA coefficients depend on the parameters but not on q, while sasmodels
+// calls Iq once per q point. On the CPU the coefficients of the most recent
+// parameter sets are kept, so a q sweep solves once per dispersity point and
+// repeated evaluations at the same S(q) parameters (a fit moving only P(q)
+// parameters) do not solve at all. GPU kernels have no writable static storage
+// and solve at every q as before.
+#if !defined(USE_GPU)
+#define MSA_CACHE_SIZE 64
+static double msa_cache_pars[MSA_CACHE_SIZE][6];
+static double msa_cache_wave[MSA_CACHE_SIZE][17];
+static int msa_cache_ierr[MSA_CACHE_SIZE];
+static int msa_cache_used = 0;     // filled entries
+static int msa_cache_last = -1;    // entry of the previous call
+static int msa_cache_next = 0;     // entry to overwrite next
+#if defined(USE_OPENMP)
+#pragma omp threadprivate(msa_cache_pars, msa_cache_wave, msa_cache_ierr, msa_cache_used, msa_cache_last, msa_cache_next)
+#endif
+
+static int
+msa_cache_match(int k, const double pars[])
+{
+    for (int i=0; i<6; i++) {
+        if (msa_cache_pars[k][i] != pars[i]) return 0;
+    }
+    return 1;
+}
+#endif
+
 double Iq(double QQ,
       double radius_effective, double VolFrac, double zz, double Temp, double csalt, double dialec)
 {
-    double gMSAWave[17]={1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17};
+	double SofQ;
+	int ierr;
+#if !defined(USE_GPU)
+	const double pars[6] = {radius_effective, VolFrac, zz, Temp, csalt, dialec};
+	int k = msa_cache_last;
+	if (k < 0 || !msa_cache_match(k, pars)) {
+		for (k=0; k<msa_cache_used; k++) {
+			if (msa_cache_match(k, pars)) break;
+		}
+		if (k == msa_cache_used) {
+			k = msa_cache_next;
+			msa_cache_next = (msa_cache_next + 1) % MSA_CACHE_SIZE;
+			if (msa_cache_used < MSA_CACHE_SIZE) msa_cache_used++;
+			for (int i=0; i<6; i++) msa_cache_pars[k][i] = pars[i];
+			msa_cache_ierr[k] = msa_coefficients(radius_effective, VolFrac, zz, Temp, csalt, dialec,
+				msa_cache_wave[k]);
+		}
+		msa_cache_last = k;
+	}
+	double *gMSAWave = msa_cache_wave[k];
+	ierr = msa_cache_ierr[k];
+#else
+	double gMSAWave[17];
+	ierr = msa_coefficients(radius_effective, VolFrac, zz, Temp, csalt, dialec, gMSAWave);
+#endif
+
+	//        IF ALL IS WELL CALCULATE S(Q*SIG)
+	if (ierr>=0) {
+		SofQ=sqhcal(QQ*2*radius_effective, gMSAWave);
+	}else{
+       	SofQ=NAN;
+		//	print "Error Level = ",ierr
+		//      print "Please report HPMSA problem with above error code"
+	}
+	
+	return(SofQ);
+}
+
+//
+//      SETS UP gMSAWave FROM THE PHYSICAL PARAMETERS AND SOLVES FOR THE
+//      MSA COEFFICIENTS; RETURNS THE ERROR LEVEL FROM SQCOEF
+//
+int
+msa_coefficients(double radius_effective, double VolFrac, double zz, double Temp, double csalt, double dialec,
+      double gMSAWave[])
+{
 	double Elcharge=1.602189e-19;		// electron charge in Coulombs (C)
 	double kB=1.380662e-23;				// Boltzman constant in J/K
 	double FrSpPerm=8.85418782E-12;	//Permittivity of free space in C^2/(N m^2)
-	double SofQ, Qdiam, Vp, ss;
+	double Vp, ss;
 	double SIdiam, diam, Kappa, cs, IonSt;
 	double  Perm, Beta;
 	double charge;
 	int ierr;
 	
+	// sqcoef starts from some of these slots, as it did with the original {1,...,17} wave
+	for (int i=0; i<17; i++) {
+		gMSAWave[i] = i+1;
+	}
 	diam=2*radius_effective;		//in A
 
 						////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
@@ -50,7 +130,6 @@ double Iq(double QQ,
 	gMSAWave[5]=Beta*charge*charge/(M_PI*Perm*SIdiam*square(2.0+Kappa*SIdiam));
 	
 	//         Finally set up dimensionless parameters 
-	Qdiam=QQ*diam;
 	gMSAWave[6] = Kappa*SIdiam;
 	gMSAWave[4] = VolFrac;
 	
@@ -62,19 +141,10 @@ double Iq(double QQ,
 	gMSAWave[9] = 2.0*ss*gMSAWave[5]*exp(gMSAWave[6]-gMSAWave[6]/ss);
 	
 	//        CALCULATE COEFFICIENTS, CHECK ALL IS WELL
-	//        AND IF SO CALCULATE S(Q*SIG)
 	
 	ierr=0;
 	ierr=sqcoef(ierr, gMSAWave);
-	if (ierr>=0) {
-		SofQ=sqhcal(Qdiam, gMSAWave);
-	}else{
-       	SofQ=NAN;
-		//	print "Error Level = ",ierr
-		//      print "Please report HPMSA problem with above error code"
-	}
-	
-	return(SofQ);
+	return ierr;
 }
 
 
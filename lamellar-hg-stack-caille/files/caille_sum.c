@@ -0,0 +1,143 @@
+/*	Caille structure factor of a stack of N layers, shared by the lamellar
+    Caille models (keep the copies in each model directory identical)
+
+        S(q) = 1 + 2 sum_{n=1}^{N-1} (1 - n/N) cos(n q d) exp(-q^2 d^2 alpha(n))
+        alpha(n) = Cp/(4 pi^2) (log(pi n) + Euler)
+
+    The damping is a power of n, exp(-q^2 d^2 alpha(n)) = exp(-x (log(pi n) + Euler))
+    with x = (q d)^2 Cp/(4 pi^2), so the log(pi n) + Euler terms do not depend on
+    the parameters and are tabulated once, and cos(n q d) comes from the powers
+    of z = exp(i q d) by complex multiplication.
+
+    Away from the Bragg peaks the terms from n = a on are summed in closed form
+    with the Euler-Boole formula
+
+        sum_{n=a}^{N-1} f(n) z^n = sum_k g_k [z^a f^(k)(a) - z^N f^(k)(N)]
+
+    for f(t) = (1 - t/N) t^-x, whose derivatives are exact, where the g_k are the
+    Taylor coefficients of 1/(1 - z e^t), from G' = G^2 - G. The series is
+    asymptotic, with terms falling like k!/(a delta)^k for delta the distance of
+    q d from the nearest multiple of 2 pi, so it starts at a = CAILLE_TAIL_START/delta
+    where CAILLE_TAIL_TERMS terms are enough for double precision. Close to a peak,
+    or when the tail would replace fewer than CAILLE_TAIL_MIN layers, all N terms
+    are summed directly.
+*/
+
+#define CAILLE_EULER 0.577215664901533   // Euler's constant
+#define CAILLE_TABLE_N 1024   // layers with a tabulated log(pi n) + Euler
+#define CAILLE_TAIL_START 40.0
+#define CAILLE_TAIL_TERMS 24
+#define CAILLE_TAIL_MIN 32   // layers the tail must replace to be worth its setup
+
+// On the CPU the table is filled on first use and kept; GPU kernels have no
+// writable static storage and take the log for each layer.
+#if !defined(USE_GPU)
+static double caille_log_cache[CAILLE_TABLE_N];
+static int caille_log_ready = 0;
+#if defined(USE_OPENMP)
+#pragma omp threadprivate(caille_log_cache, caille_log_ready)
+#endif
+#endif
+
+static void
+caille_init(void)
+{
+#if !defined(USE_GPU)
+    if (!caille_log_ready) {
+        caille_log_cache[0] = 0.0;
+        for (int n=1; n < CAILLE_TABLE_N; n++) {
+            caille_log_cache[n] = log(M_PI*n) + CAILLE_EULER;
+        }
+        caille_log_ready = 1;
+    }
+#endif
+}
+
+static double
+caille_log(int n)
+{
+#if !defined(USE_GPU)
+    if (n < CAILLE_TABLE_N) {
+        return caille_log_cache[n];
+    }
+#endif
+    return log(M_PI*n) + CAILLE_EULER;
+}
+
+static double
+caille_structure_factor(double q, double d_spacing, double Cp, int Nlayers)
+{
+    caille_init();
+
+    const double qd = q*d_spacing;
+    const double x = square(qd)*Cp/(4.0*M_PI*M_PI);
+    double sin_qd, cos_qd;
+    SINCOS(qd, sin_qd, cos_qd);
+    const double delta = fabs(qd - 2.0*M_PI*round(qd/(2.0*M_PI)));
+    const int start = (delta*(Nlayers - CAILLE_TAIL_MIN) > CAILLE_TAIL_START
+        ? (int)ceil(CAILLE_TAIL_START/delta) : Nlayers);
+
+    // direct sum for n < start; real_n + i imag_n = z^n
+    double real_n = 1.0, imag_n = 0.0;
+    double Sq = 0.0;
+    for (int n=1; n < start; n++) {
+        const double real_next = real_n*cos_qd - imag_n*sin_qd;
+        imag_n = real_n*sin_qd + imag_n*cos_qd;
+        real_n = real_next;
+        Sq += (1.0 - (double)n/(double)Nlayers)*exp(-x*caille_log(n))*real_n;
+    }
+
+    if (start < Nlayers) {
+        // z^a continues the recurrence; z^N is taken directly
+        const double real_a = real_n*cos_qd - imag_n*sin_qd;
+        const double imag_a = real_n*sin_qd + imag_n*cos_qd;
+        double sin_N, cos_N;
+        SINCOS(Nlayers*qd, sin_N, cos_N);
+
+        // f^(k)(t) = (-1)^k [(x)_k t^(-x-k) - (x-1)_k t^(1-x-k)/N], as p_t - r_t
+        double p_a = exp(-x*log((double)start));
+        double r_a = p_a*start/Nlayers;
+        double p_N = exp(-x*log((double)Nlayers));
+        double r_N = p_N;
+
+        double g_real[CAILLE_TAIL_TERMS+1], g_imag[CAILLE_TAIL_TERMS+1];
+        const double norm = square(1.0 - cos_qd) + square(sin_qd);
+        g_real[0] = (1.0 - cos_qd)/norm;
+        g_imag[0] = sin_qd/norm;
+
+        double tail_real = 0.0, tail_imag = 0.0, previous = 0.0;
+        double sign = 1.0;
+        for (int k=0; k <= CAILLE_TAIL_TERMS; k++) {
+            if (k > 0) {
+                double conv_real = -g_real[k-1], conv_imag = -g_imag[k-1];
+                for (int j=0; j < k; j++) {
+                    conv_real += g_real[j]*g_real[k-1-j] - g_imag[j]*g_imag[k-1-j];
+                    conv_imag += g_real[j]*g_imag[k-1-j] + g_imag[j]*g_real[k-1-j];
+                }
+                g_real[k] = conv_real/k;
+                g_imag[k] = conv_imag/k;
+                p_a *= (x + k - 1)/start;
+                r_a *= (x + k - 2)/start;
+                p_N *= (x + k - 1)/Nlayers;
+                r_N *= (x + k - 2)/Nlayers;
+                sign = -sign;
+            }
+            const double f_a = sign*(p_a - r_a);
+            const double f_N = sign*(p_N - r_N);
+            const double w_real = real_a*f_a - cos_N*f_N;
+            const double w_imag = imag_a*f_a - sin_N*f_N;
+            const double term_real = g_real[k]*w_real - g_imag[k]*w_imag;
+            const double term_imag = g_real[k]*w_imag + g_imag[k]*w_real;
+            const double size = fabs(term_real) + fabs(term_imag);
+            tail_real += term_real;
+            tail_imag += term_imag;
+            if (k > 0 && size + previous < 1.0e-17*(fabs(tail_real) + fabs(tail_imag))) {
+                break;
+            }
+            previous = size;
+        }
+        Sq += exp(-x*caille_log(1))*tail_real;
+    }
+
+    return 1.0 + 2.0*Sq;
+}
@@ -105,7 +105,7 @@ parameters = [
     ]
 # pylint: enable=bad-whitespace, line-too-long
 
-source = ["lamellar_stack_caille.c"]
+source = ["caille_sum.c", "lamellar_stack_caille.c"]
 
 def random():
     """Return a random parameter set for the model."""
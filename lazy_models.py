@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+List the mirrored model plugins without importing them.
+
+Usage:
+    python lazy_models.py --root .
+    python lazy_models.py --root . --eager
+    python lazy_models.py --root . --no-index
+    python lazy_models.py --root . --compare
+
+What it does:
+- Reads name, title, category, parameters, source and have_Fq from each
+  <model>/files/*.py as module-level literals (model_catalog.read_model_metadata),
+  so listing models never imports numpy, scipy or sasmodels and never runs the
+  plugin's own import-time code (load_model_info calls, generated gauss tables).
+- Wraps each plugin in a LazyModel: the module is only imported, its model_info
+  built and its kernel compiled when the model is first evaluated, or when a field
+  is asked for that could not be read statically (e.g. long_cylinder, which builds
+  its model_info at import time).
+- Metadata is read through the model_catalog.py index, so a listing only stats
+  the files and re-parses the ones that changed; --no-index parses every file.
+- --eager lists the same models the old way (import every plugin through
+  sasmodels) and --compare times each way in fresh interpreters.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from model_catalog import Catalog, read_model_metadata
+
+HERE = Path(__file__).resolve().parent
+LISTING_NAMES = ("name", "title", "category", "parameters", "source", "have_Fq")
+
+class LazyModel:
+    """
+    A model plugin whose metadata is known and whose code is loaded on demand.
+    """
+
+    def __init__(self, path: Path, meta: dict):
+        self.path = path
+        self.meta = meta
+        self._info = None
+        self._models = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "LazyModel":
+        return cls(path, read_model_metadata(path.read_text(encoding="utf-8", errors="replace"), str(path)))
+
+    @property
+    def static(self) -> bool:
+        """
+        True if every listing field was read without importing the module.
+        """
+        return "error" not in self.meta and "parameters" in self.meta and not (
+            set(LISTING_NAMES) & set(self.meta["unevaluated"]))
+
+    @property
+    def loaded(self) -> bool:
+        return self._info is not None
+
+    def _field(self, name: str, info_attr: str | None = None):
+        if name in self.meta and name not in self.meta["unevaluated"]:
+            return self.meta[name]
+        return getattr(self.model_info, info_attr or name)
+
+    @property
+    def name(self) -> str:
+        attrs = self.meta["attributes"]
+        if isinstance(self.meta.get("name"), str):
+            return self.meta["name"]
+        if isinstance(attrs.get("model_info.name"), str):
+            return attrs["model_info.name"]
+        return self.path.stem
+
+    @property
+    def title(self) -> str:
+        return self._field("title")
+
+    @property
+    def category(self) -> str | None:
+        return self._field("category")
+
+    @property
+    def have_Fq(self) -> bool:
+        if "have_Fq" in self.meta or self.static:
+            return bool(self.meta.get("have_Fq", False))
+        return self.model_info.have_Fq
+
+    @property
+    def source(self) -> list[str]:
+        if "source" in self.meta or self.static:
+            return list(self.meta.get("source", []))
+        return list(self.model_info.source)
+
+    @property
+    def parameters(self) -> list:
+        """
+        The parameters table: [name, units, default, [lower, upper], type, description] rows.
+        """
+        if self.static:
+            return self.meta["parameters"]
+        return [[p.name, p.units, p.default, list(p.limits), p.type, p.description]
+                for p in self.model_info.parameters.kernel_parameters]
+
+    @property
+    def model_info(self):
+        """
+        The sasmodels ModelInfo; importing the plugin the first time it is needed.
+        """
+        if self._info is None:
+            from sasmodels.custom import load_custom_kernel_module
+            from sasmodels.modelinfo import make_model_info
+
+            self._info = make_model_info(load_custom_kernel_module(str(self.path)))
+        return self._info
+
+    def build(self, dtype: str = "double", platform: str = "dll"):
+        """
+        The compiled kernel model, built once per precision and platform.
+        """
+        key = (dtype, platform)
+        if key not in self._models:
+            from sasmodels.core import build_model
+
+            self._models[key] = build_model(self.model_info, dtype=dtype, platform=platform)
+        return self._models[key]
+
+    def evaluate(self, q, dtype: str = "double", **pars):
+        """
+        I(q) at the given parameter values (defaults for the others).
+        """
+        import numpy as np
+        from sasmodels.direct_model import call_kernel
+
+        kernel = self.build(dtype).make_kernel([np.asarray(q, dtype=float)])
+        try:
+            return call_kernel(kernel, pars)
+        finally:
+            kernel.release()
+
+    def __repr__(self):
+        return f"<LazyModel {self.name} ({'loaded' if self.loaded else 'not loaded'})>"
+
+def is_model(meta: dict) -> bool:
+    return "error" in meta or "parameters" in meta or "model_info.name" in meta["attributes"]
+
+def scan_models(root: Path, use_index: bool = True) -> list[LazyModel]:
+    """
+    A LazyModel for every plugin under root/*/files/, without importing any of them.
+
+    With use_index, metadata comes from the model_catalog index, which only
+    re-parses files whose mtime and hash changed since the last scan.
+    """
+    if use_index:
+        catalog = Catalog(root)
+        try:
+            catalog.refresh()
+            rows = catalog.db.execute("SELECT path, meta FROM models ORDER BY path").fetchall()
+        finally:
+            catalog.close()
+        metas = ((root / path, json.loads(meta)) for path, meta in rows)
+    else:
+        metas = ((path, read_model_metadata(path.read_text(encoding="utf-8", errors="replace"), str(path)))
+                 for path in sorted(root.glob("*/files/*.py")))
+    return sorted((LazyModel(path, meta) for path, meta in metas if is_model(meta)), key=lambda m: m.path)
+
+# --- Listing --------------------------------------------------------------------
+
+def list_lazy(root: Path, use_index: bool = True) -> list[tuple]:
+    # Models whose table only exists after import report None rather than loading
+    return [(m.name, m.meta.get("category"), len(m.parameters) if m.static else None)
+            for m in scan_models(root, use_index) if "error" not in m.meta]
+
+def list_eager(root: Path) -> list[tuple]:
+    """
+    The same listing, importing every plugin through sasmodels as a loader would.
+    """
+    from sasmodels.custom import load_custom_kernel_module
+    from sasmodels.modelinfo import make_model_info
+
+    rows = []
+    for model in scan_models(root, use_index=False):
+        if "error" in model.meta:
+            continue
+        try:
+            info = make_model_info(load_custom_kernel_module(str(model.path)))
+        except Exception as e:
+            print(f"[WARN] {model.path.relative_to(root)}: {type(e).__name__}: {e}".splitlines()[0], file=sys.stderr)
+            continue
+        rows.append((info.name, info.category, len(info.parameters.kernel_parameters)))
+    return rows
+
+def time_listing(root: Path, flags: list[str]) -> float:
+    """
+    Wall time of listing all models in a fresh interpreter, as at application startup.
+    """
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--root", str(root), "--quiet", *flags]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="List the mirrored models without importing them.")
+    parser.add_argument("--root", default=str(HERE), help="Mirror tree (default: this repository)")
+    parser.add_argument("--eager", action="store_true", help="Import every plugin through sasmodels instead")
+    parser.add_argument("--no-index", action="store_true", help="Parse every file instead of using the catalog index")
+    parser.add_argument("--compare", action="store_true", help="Time eager and lazy listing in fresh interpreters")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode for --compare (best is kept)")
+    parser.add_argument("--quiet", action="store_true", help="Print only the number of models")
+    args = parser.parse_args()
+    root = Path(args.root).resolve()
+
+    if args.compare:
+        modes = (("eager (import every plugin)", ["--eager"]),
+                 ("lazy, parsing every file", ["--no-index"]),
+                 ("lazy, from the catalog index", []))
+        time_listing(root, [])  # bring the index up to date first
+        eager = None
+        for label, flags in modes:
+            best = min(time_listing(root, flags) for _ in range(args.repeat))
+            eager = eager or best
+            speedup = f"  ({eager / best:.1f}x faster)" if best != eager else ""
+            print(f"[OK] {label:<30s} {best * 1000:8.1f} ms{speedup}")
+        return
+
+    start = time.perf_counter()
+    rows = list_eager(root) if args.eager else list_lazy(root, use_index=not args.no_index)
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        for name, category, n_pars in rows:
+            count = "deferred" if n_pars is None else f"{n_pars:3d} parameter(s)"
+            print(f"{name:<40s} {category or '-':<32s} {count}")
+    print(f"[i] {len(rows)} model(s) listed in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
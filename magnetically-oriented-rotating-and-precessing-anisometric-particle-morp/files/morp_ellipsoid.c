@@ -46,108 +46,175 @@ radius_effective(int mode, double radius_polar, double radius_equatorial)
     }
 }
 
-void SET_VECTOR(double *vector, double v0, double v1, double v2) {
-    vector[0] = v0;
-    vector[1] = v1;
-    vector[2] = v2;
-}
+// Orientation average
+// -------------------
+// The easy axis makes the angle psi with the field along (1,0,0), Boltzmann
+// distributed, and precesses about it (gamma_1); the long axis spins about the
+// easy axis (gamma_2). Integrating psi and gamma_2 analytically leaves a long
+// axis n that is axially symmetric about the field, with w = cos(theta) = n.B
+// distributed as
+//
+//     P(w) = xi I0(xi sqrt(1 - w^2)) / (2 sinh xi)
+//
+// and gamma_1 becoming its uniform azimuth beta about the field. For q at the
+// angle phi to the field
+//
+//     cos(alpha) = cos(phi) cos(theta) + sin(phi) sin(theta) cos(beta)
+//
+// and alpha only enters through cos^2(alpha), which is unchanged by
+// (theta, beta) -> (pi - theta, pi - beta), so theta runs over [0, pi/2] and
+// beta over [0, pi]. The amplitude oscillates over orientations with a phase
+// range of q |R_p - R_e|, which sets the number of points on each axis:
+// Gauss-Legendre panels in theta, and the midpoint rule in beta and in the
+// detector angle phi, which for these periodic integrands converges like a
+// Fourier series. Define MORP_THETA_PANELS, MORP_BETA_N or MORP_PHI_N to
+// fix the order of an axis instead.
+#define MORP_QR_PER_THETA_PANEL 12.0
+#define MORP_BETA_PER_QR 1.6
+#define MORP_BETA_MIN 8
+#define MORP_BETA_MAX 2048
+#define MORP_PHI_PER_SQRT_XI 1.4
+#define MORP_PHI_MAX 64
 
-void SCALE_VECTOR(double *vector, double a) {
-    vector[0] = a*vector[0];
-    vector[1] = a*vector[1];
-    vector[2] = a*vector[2];
+static double
+scaled_bessel_i0(double x)
+{
+    // exp(-x) I0(x) for x >= 0: power series up to 25, asymptotic series above
+    double term = 1.0;
+    double sum = 1.0;
+    if (x < 25.0) {
+        const double y = 0.25*x*x;
+        for (int k=1; term > 1e-17*sum; k++) {
+            term *= y/(k*k);
+            sum += term;
+        }
+        return exp(-x)*sum;
+    } else {
+        const double y = 0.125/x;
+        for (int k=1; k < 40 && term > 1e-17*sum; k++) {
+            term *= square(2*k - 1)*y/k;
+            sum += term;
+        }
+        return sum/sqrt(2.0*M_PI*x);
+    }
 }
 
-void ADD_VECTOR(double *result_vec, double *vec1, double *vec2) {
-    result_vec[0] = vec1[0] + vec2[0];
-    result_vec[1] = vec1[1] + vec2[1];
-    result_vec[2] = vec1[2] + vec2[2];
+static double
+long_axis_density(double xi, double sin_theta)
+{
+    // P(cos theta) for the long axis at the angle theta to the field
+    if (xi < 0.0001) {
+        // xi I0(xi sin_theta) / (2 sinh xi) = (1 + O(xi^2))/2
+        return 0.5;
+    } else {
+        return xi * exp(xi*(sin_theta - 1.0)) * scaled_bessel_i0(xi*sin_theta)
+            / (1.0 - exp(-2.0*xi));
+    }
 }
 
-static void rotated_long_axis(
-    double gamma_1, double gamma_2,
-    double psi, 
-    double *result_rotated_axis) {
-    double cos_psi, sin_psi;
-    double cos_gamma_1, sin_gamma_1;
-    double cos_gamma_2, sin_gamma_2;
-
-    SINCOS(psi, sin_psi, cos_psi);
-    SINCOS(gamma_1, sin_gamma_1, cos_gamma_1);
-    SINCOS(gamma_2, sin_gamma_2, cos_gamma_2);
-
-    double vector_long[3];
-    double easy_cross_long[3];
-    //double vector_long_rotated[3];
-    // B field is along (1,0,0), orientation of easy axis
-    //                           is precessing in a cone around B
-    // vector_long: long axis direction,
-    //               vector lies in plane perpendicular to easy axis
-    SET_VECTOR(vector_long, -sin_psi, cos_psi*sin_gamma_1, cos_psi*cos_gamma_1);
-
-    // to obtain all possible vectors of vector_long, integrate gamma_2
-    // use for this purpose Rodrigues rotation formula, need cross product:
-    SET_VECTOR(easy_cross_long, 0.0, cos_gamma_1, -sin_gamma_1);
-    // rotation formula:
-    // vector_long_rotated = vector_long*cos_gamma_2 + easy_cross_long*sin_gamma_2
-    SCALE_VECTOR(vector_long, cos_gamma_2);
-    SCALE_VECTOR(easy_cross_long, sin_gamma_2);
-    ADD_VECTOR(
-        result_rotated_axis,
-        vector_long,
-        easy_cross_long
-    );
-    // last part rotation formula not necessary as r_easy, r_long
-    // are perpendicular by definition
-    // see: r_easy*dot_product(r_easy, r_long)*(1d0-cos(gamma_2))
-
-    // rotate coordinate frame in case the magnetic field is not
-    // pointing along (1,0,0)
-//    SET_VEC(result_rotated_axis,
-//        cos_beta*vector_long_rotated[0] - sin_beta*vector_long_rotated[2],
-//        vector_long_rotated[1],
-//        sin_beta*vector_long_rotated[0] + cos_beta*vector_long_rotated[2]
-//    );
+static int
+theta_panels(double qr)
+{
+#if defined(MORP_THETA_PANELS)
+    return MORP_THETA_PANELS;
+#else
+    return 1 + (int)(qr/MORP_QR_PER_THETA_PANEL);
+#endif
 }
 
-static double oriented_spindle_amplitude(
-    double qx, double qy, double radius_polar, double radius_equatorial,
-    double gamma_1, double gamma_2, double psi) {
+static int
+beta_points(double qr)
+{
+    // an even number of points, so beta and pi - beta come in pairs
+#if defined(MORP_BETA_N)
+    const int n = MORP_BETA_N;
+#else
+    const int n = MORP_BETA_MIN + (int)(MORP_BETA_PER_QR*qr);
+#endif
+    return 2*(n < MORP_BETA_MAX/2 ? (n + 1)/2 : MORP_BETA_MAX/2);
+}
 
-    // get orientation of long axis for given gamma_1, psi, gamma_2 angles:
-    double vec_long_rotated[3];
-    rotated_long_axis(gamma_1, gamma_2, psi, vec_long_rotated);
+static int
+phi_points(double xi)
+{
+#if defined(MORP_PHI_N)
+    const int n = MORP_PHI_N;
+#else
+    const int n = 2 + (int)(MORP_PHI_PER_SQRT_XI*sqrt(xi));
+#endif
+    return n < MORP_PHI_MAX ? n : MORP_PHI_MAX;
+}
 
-    // what is angle between q vector and long axis?
-    // acos results in NaN if argument is numerically slightly larger than 1
-    const double q = sqrt(square(qx) + square(qy));
-    double cos_alpha = 1.0;
-    if (q > 0) {
-        cos_alpha = (qx*vec_long_rotated[0] + qy*vec_long_rotated[1])/q;
+static void
+azimuthal_average(
+    double qr2_eq, double qr2_diff,
+    double u, double v,
+    int n_half, const double *cos_beta,
+    double *F1, double *F2)
+{
+    // sum of f and f^2 over beta in [0, pi] for cos(alpha) = u + v cos(beta),
+    // taking beta and pi - beta together
+    double sum_F1 = 0.0;
+    double sum_F2 = 0.0;
+    for (int k=0; k < n_half; k++) {
+        const double cos_plus = u + v*cos_beta[k];
+        const double cos_minus = u - v*cos_beta[k];
+        const double f_plus = sas_3j1x_x(sqrt(qr2_eq + qr2_diff*square(cos_plus)));
+        const double f_minus = sas_3j1x_x(sqrt(qr2_eq + qr2_diff*square(cos_minus)));
+        sum_F1 += f_plus + f_minus;
+        sum_F2 += f_plus*f_plus + f_minus*f_minus;
     }
-
-    // calculate the effective radius
-    const double req2 = square(radius_equatorial);
-    const double r_eff = sqrt( req2 + (square(radius_polar) - req2)*square(cos_alpha) );
-
-    // effective radius for ellipsoidal model:
-    // http://gisaxs.com/index.php/Form_Factor:Ellipsoid_of_revolution
-    return sas_3j1x_x(q*r_eff);
+    *F1 = sum_F1;
+    *F2 = sum_F2;
 }
 
-static double boltzmann_statistics(
-    double xi, double psi) {
-    // xi * exp(xi * (cos(psi) - 1) ) / ( 1 - exp(-2xi) )
+static void
+orientation_average(
+    double q, int n_phi, const double *cos_phi, const double *sin_phi,
+    double radius_polar, double radius_equatorial, double xi,
+    double *F1, double *F2)
+{
+    // <f> and <f^2> over the long axis orientations, averaged over the n_phi
+    // directions of q in the detector plane
+    const double qr2_eq = square(q*radius_equatorial);
+    const double qr2_diff = square(q*radius_polar) - qr2_eq;
+    const double qr = q*fabs(radius_polar - radius_equatorial);
 
-    if (xi < 0.0001) {
-        // avoid dividing by zero
-        // use first order taylor approximation of exp(x) in this case
-        // which is accurate to 2e-8
-        return 0.5*(1.0 + xi * (cos(psi) - 1.0));
-    } else {
-        return xi * exp(xi*(cos(psi) - 1.0)) / (1.0 - exp(-2*xi));
+    double cos_beta[MORP_BETA_MAX/2];
+    const int n_beta = beta_points(qr);
+    for (int k=0; k < n_beta/2; k++) {
+        cos_beta[k] = cos(M_PI*(k + 0.5)/n_beta);
     }
 
+    const int n_panels = theta_panels(qr);
+    const double panel_width = M_PI_2/n_panels;
+    double total_F1 = 0.0;
+    double total_F2 = 0.0;
+    for (int panel=0; panel < n_panels; panel++) {
+        for (int i=0; i < GAUSS_N; i++) {
+            const double theta = panel_width*(panel + 0.5*(GAUSS_Z[i] + 1.0));
+            double sin_theta, cos_theta;
+            SINCOS(theta, sin_theta, cos_theta);
+            const double weight = GAUSS_W[i]*sin_theta*long_axis_density(xi, sin_theta);
+            double sum_F1 = 0.0;
+            double sum_F2 = 0.0;
+            for (int j=0; j < n_phi; j++) {
+                double F1_beta, F2_beta;
+                azimuthal_average(qr2_eq, qr2_diff,
+                    cos_phi[j]*cos_theta, sin_phi[j]*sin_theta,
+                    n_beta/2, cos_beta, &F1_beta, &F2_beta);
+                sum_F1 += F1_beta;
+                sum_F2 += F2_beta;
+            }
+            total_F1 += weight*sum_F1;
+            total_F2 += weight*sum_F2;
+        }
+    }
+    // P(w) dw on [-1, 1] is twice P(cos theta) sin theta dtheta on [0, pi/2],
+    // and each Gauss panel maps [-1, 1] onto a width of panel_width
+    const double scale = panel_width/(n_phi*n_beta);
+    *F1 = scale*total_F1;
+    *F2 = scale*total_F2;
 }
 
 static void
@@ -160,57 +227,21 @@ Fq(double q,
     double radius_equatorial,
     double xi)
 {
-    // perform integration over gamma_1=0..2pi and gamma_2=0..2pi
-    // to account for the precession motion of the easy axis around B with
-    // cone angle psi
-    // as well as the motion of the long axis of the spindle 
-    // translate a point in [-1,1] to a point in [0, 1]
-    // const double u = GAUSS_Z[i]*(upper-lower)/2 + (upper+lower)/2;
-    
-    
-    double total_F1 = 0.0;
-    double total_F2 = 0.0;
-    for (int i_detangle=0; i_detangle < GAUSS_N; i_detangle++) {
-        double detangle = M_PI_2 * (GAUSS_Z[i_detangle] + 1.0); // 0 .. pi
-        double const qx = q*cos(detangle);
-        double const qy = q*sin(detangle);
-
-        double integral_psi_F1 = 0.0;
-        double integral_psi_F2 = 0.0;
-        for (int i_psi=0; i_psi < GAUSS_N; i_psi++) {
-            const double psi = M_PI_2 * (GAUSS_Z[i_psi] + 1.0); // 0 .. pi
-            double integral_g1_F1 = 0.0;
-            double integral_g1_F2 = 0.0;
-            for (int i_g1=0; i_g1 < GAUSS_N; i_g1++) {
-                const double gamma_1 = M_PI * (GAUSS_Z[i_g1] + 1.0); // 0 .. 2 pi
-                double integral_g2_F1 = 0.0;
-                double integral_g2_F2 = 0.0;
-                for (int i_g2=0; i_g2 < GAUSS_N; i_g2++) {
-                    const double gamma_2 = M_PI * (GAUSS_Z[i_g2] + 1.0); // 0 .. 2 pi
-                    const double f = oriented_spindle_amplitude(
-                        qx, qy, radius_polar, radius_equatorial,
-                        gamma_1, gamma_2, psi);
-                    integral_g2_F1 += GAUSS_W[i_g2] * f;
-                    integral_g2_F2 += GAUSS_W[i_g2] * f * f;
-                }
-                integral_g1_F1 += GAUSS_W[i_g1] * integral_g2_F1;
-                integral_g1_F2 += GAUSS_W[i_g1] * integral_g2_F2;
-            }
-            const double sin_psi = sin(psi);
-            const double boltzmann_weight = boltzmann_statistics(xi, psi);
-            integral_psi_F1 += GAUSS_W[i_psi] * sin_psi * boltzmann_weight * integral_g1_F1;
-            integral_psi_F2 += GAUSS_W[i_psi] * sin_psi * boltzmann_weight * integral_g1_F2;
-        }
-        total_F1 += GAUSS_W[i_detangle] * integral_psi_F1;
-        total_F2 += GAUSS_W[i_detangle] * integral_psi_F2;
+    // average over the detector angle phi = 0 .. pi/2 between q and the
+    // field; the other quadrants follow by symmetry
+    double cos_phi[MORP_PHI_MAX], sin_phi[MORP_PHI_MAX];
+    const int n_phi = phi_points(xi);
+    for (int j=0; j < n_phi; j++) {
+        SINCOS(M_PI_2*(j + 0.5)/n_phi, sin_phi[j], cos_phi[j]);
     }
-    // factors for the translation of the [-1,1] range to
-    // 0 .. 2pi, 0 .. 2pi, 0 .. pi -> pi^3 / 2
-    // divide by 4 pi^2 for the integration over the whole space
-    // divide by pi for integration over detector
-    // -> factor of 1/8
-    total_F1 *= 0.125;
-    total_F2 *= 0.125;
+    double total_F1, total_F2;
+    orientation_average(q, n_phi, cos_phi, sin_phi,
+        radius_polar, radius_equatorial, xi, &total_F1, &total_F2);
+
+    // The 1D curve keeps the normalisation of the original four-fold Gauss
+    // sum, which is 2/pi times the orientation average.
+    total_F1 *= 2.0/M_PI;
+    total_F2 *= 2.0/M_PI;
     const double s = (sld - sld_solvent) * form_volume(radius_polar, radius_equatorial);
     *F1 = 1e-2 * s * total_F1;
     *F2 = 1e-4 * s * s * total_F2;
@@ -226,33 +257,13 @@ Iqxy(double qx, double qy,
 {
     // mu_bohr / k_Boltzmann = 0.6717140430498562
 //    const double xi = 0.6717140430498562 * magnetic_moment * magnetic_field / temperature;
-    double integral_psi_F2 = 0.0;
-    for (int i_psi=0; i_psi < GAUSS_N; i_psi++) {
-        const double psi = M_PI_2 * (GAUSS_Z[i_psi] + 1.0); // 0 .. pi
-        double integral_g1_F2 = 0.0;
-        for (int i_g1=0; i_g1 < GAUSS_N; i_g1++) {
-            const double gamma_1 = M_PI * (GAUSS_Z[i_g1] + 1.0); // 0 .. 2 pi
-            double integral_g2_F2 = 0.0;
-            for (int i_g2=0; i_g2 < GAUSS_N; i_g2++) {
-                const double gamma_2 = M_PI * (GAUSS_Z[i_g2] + 1.0); // 0 .. 2 pi
-                const double f = oriented_spindle_amplitude(
-                    qx, qy, radius_polar, radius_equatorial,
-                    gamma_1, gamma_2, psi);
-                integral_g2_F2 += GAUSS_W[i_g2] * f * f;
-            }
-            integral_g1_F2 += GAUSS_W[i_g1] * integral_g2_F2;
-        }
-        const double sin_psi = sin(psi);
-        const double boltzmann_weight = boltzmann_statistics(xi, psi);
-        integral_psi_F2 += GAUSS_W[i_psi] * sin_psi * boltzmann_weight * integral_g1_F2;
-    }
-    // factors for the translation of the [-1,1] range to
-    // 0 .. 2pi, 0 .. 2pi, 0 .. pi -> pi^3 / 2
-    // divide by 4 pi^2 for the integration over the whole space
-    // -> factor of pi/8
-    integral_psi_F2 *= 0.125 * M_PI;
+    const double q = sqrt(square(qx) + square(qy));
+    const double cos_phi = (q > 0.0 ? qx/q : 1.0);
+    const double sin_phi = (q > 0.0 ? qy/q : 0.0);
+    double total_F1, total_F2;
+    orientation_average(q, 1, &cos_phi, &sin_phi,
+        radius_polar, radius_equatorial, xi, &total_F1, &total_F2);
     const double s = (sld - sld_solvent) * form_volume(radius_polar, radius_equatorial);
 
-    return 1.0e-4 * square(s) * integral_psi_F2;
+    return 1.0e-4 * square(s) * total_F2;
 }
-
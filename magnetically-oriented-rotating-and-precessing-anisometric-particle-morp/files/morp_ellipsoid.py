@@ -78,7 +78,23 @@ and the Langevin parameter $xi=mu mu_0 H/ k_B T$ with $mu_0$ the permeability of
 The angle $eta$ allows to choose the direction of the applied magnetic field, with $eta=90$ Degrees the field aligned along the horizontal axis, and for $eta=0$ Degrees the field directed along the beam direction.
 
 
-The model is computationally demanding with 3 averages over orientational distributions, make sure to have a performant system with GPU and patience.
+Integrating $\psi$ and $\gamma_2$ analytically leaves the polar axis axially symmetric
+about the field, with $w = \mathbf{n} \cdot \mathbf{B}/B$ distributed as
+
+.. math::
+
+    P(w) = \frac{\xi I_0\left(\xi \sqrt{1 - w^2}\right)}{2 \sinh \xi}
+
+and $\gamma_1$ becoming its uniform azimuth about the field. The remaining average
+uses Gauss-Legendre panels in the angle between the polar axis and the field, and
+the midpoint rule in the azimuth and, for the 1D curve, in the detector angle. The
+number of points grows with $q|R_p - R_e|$ and $\xi$ so that the relative error
+stays below $10^{-6}$. Lower fixed orders can be compiled in for speed by defining
+MORP_BETA_N (azimuth points), MORP_THETA_PANELS (20 point panels in the polar
+angle) or MORP_PHI_N (detector angles) in the C source. The relative error then
+stays below $10^{-5}$ while $q|R_p - R_e|$ is less than about MORP_BETA_N and
+20 MORP_THETA_PANELS, and for MORP_PHI_N of at least $2 + 1.4\sqrt{\xi}$; past
+these limits it grows to $10^{-3}$ to $10^{-2}$.
 
 
 
@@ -137,7 +153,7 @@ parameters = [["sld", "1e-6/Ang^2", 40, [-inf, inf], "",
 	               "Langevin parameter"]]             
 
 
-source = ["lib/sas_3j1x_x.c", "lib/gauss76.c", "morp_ellipsoid.c"]
+source = ["lib/sas_3j1x_x.c", "lib/gauss20.c", "morp_ellipsoid.c"]
 have_Fq = True
 effective_radius_type = [
     "average curvature", "equivalent volume sphere", "min radius", "max radius",
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Build and query an offline catalog of the model plugins in a mirrored tree.
+
+Usage:
+    python model_catalog.py build --root .
+    python model_catalog.py query --uses lib/gauss76.c --have-fq
+    python model_catalog.py query --category shape:cylinder --defines Iqxy
+    python model_catalog.py query --param radius_bell --json
+
+What it does:
+- Parses every <model>/files/*.py with ast (nothing is imported, sasmodels is not
+  needed) and reads the module-level metadata: name, title, category, parameters,
+  source, have_Fq, radius_effective_modes, tests, Iq.vectorized and friends.
+  Values that are not plain literals (inf, np.pi, earlier constants, np.cos(...))
+  are folded statically; anything else is kept as its source text.
+- Lists the kernel functions each model defines, both Python defs and C functions
+  in its local .c sources or c_code string, and the .c files it links.
+- Stores everything in a SQLite file (default <root>/model_index.sqlite). Rebuilds
+  are incremental: a file is only re-read when its mtime or size changed, and only
+  re-parsed when its SHA-256 changed too.
+- Queries refresh the index first (cheap when nothing changed) and combine all
+  given filters with AND.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+INDEX_NAME = "model_index.sqlite"
+
+# Metadata names read from module level, in the order they are reported
+META_NAMES = (
+    "name", "title", "description", "category", "parameters", "source", "tests",
+    "have_Fq", "radius_effective_modes", "single", "opencl", "structure_factor",
+)
+
+# --- Static evaluation ----------------------------------------------------------
+
+class Unevaluable(Exception):
+    pass
+
+_CONSTANTS = {"inf": math.inf, "pi": math.pi, "nan": math.nan, "e": math.e}
+_MODULES = ("np", "numpy", "math")
+_FUNCTIONS = {
+    "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "log10": math.log10,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan, "arctan": math.atan,
+    "atan": math.atan, "radians": math.radians, "degrees": math.degrees,
+    "abs": abs, "float": float, "int": int,
+}
+_BINOPS = {
+    ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b, ast.Mod: lambda a, b: a % b,
+    ast.Pow: lambda a, b: a ** b,
+}
+
+def _callee(node: ast.expr) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in _MODULES:
+        return node.attr
+    return None
+
+def static_eval(node: ast.expr, env: dict):
+    """
+    Evaluate a constant expression without running the module.
+
+    Understands literals, arithmetic, inf/pi/nan (bare or as np./numpy./math.
+    attributes), a few math functions, and names bound earlier in env. Raises
+    Unevaluable for anything else.
+    """
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        items = [static_eval(elt, env) for elt in node.elts]
+        return tuple(items) if isinstance(node, ast.Tuple) else items
+    if isinstance(node, ast.Dict):
+        if None in node.keys:
+            raise Unevaluable("dict unpacking")
+        return {static_eval(k, env): static_eval(v, env) for k, v in zip(node.keys, node.values)}
+    if isinstance(node, ast.UnaryOp):
+        value = static_eval(node.operand, env)
+        if isinstance(node.op, ast.USub):
+            return -value
+        if isinstance(node.op, ast.UAdd):
+            return +value
+        if isinstance(node.op, ast.Not):
+            return not value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        try:
+            return _BINOPS[type(node.op)](static_eval(node.left, env), static_eval(node.right, env))
+        except (TypeError, ValueError, ArithmeticError) as e:
+            raise Unevaluable(str(e)) from None
+    if isinstance(node, ast.Name):
+        if node.id in env:
+            return env[node.id]
+        if node.id in _CONSTANTS:
+            return _CONSTANTS[node.id]
+        if node.id in ("True", "False", "None"):
+            return {"True": True, "False": False, "None": None}[node.id]
+    if isinstance(node, ast.Attribute) and _callee(node) in _CONSTANTS:
+        return _CONSTANTS[node.attr]
+    if isinstance(node, ast.Call) and not node.keywords and _callee(node.func) in _FUNCTIONS:
+        args = [static_eval(arg, env) for arg in node.args]
+        try:
+            return _FUNCTIONS[_callee(node.func)](*args)
+        except (TypeError, ValueError, ArithmeticError) as e:
+            raise Unevaluable(str(e)) from None
+    raise Unevaluable(type(node).__name__)
+
+def eval_or_source(node: ast.expr, env: dict, text: str):
+    """
+    Return (value, True) if node folds to a constant, else (source text, False).
+    """
+    try:
+        return static_eval(node, env), True
+    except Unevaluable:
+        return ast.get_source_segment(text, node), False
+
+# --- Metadata extraction --------------------------------------------------------
+
+C_FUNC_RE = re.compile(
+    r"^[ \t]*(?:static[ \t]+)?(?:inline[ \t]+)?(?:const[ \t]+)?"
+    r"(?:double|float|int|void|bool)[ \t\r\n*]+(\w+)[ \t]*\([^;{}]*\)[ \t\r\n]*\{",
+    re.MULTILINE,
+)
+SIMPLE_ASSIGN_RE = re.compile(r"""^(\w+)\s*=\s*(?:r?(['"])(.*?)\2|(True|False))\s*$""", re.MULTILINE)
+
+def c_functions(code: str) -> list[str]:
+    """
+    Names of the functions defined in a chunk of C.
+    """
+    return list(dict.fromkeys(C_FUNC_RE.findall(code)))
+
+def _parameter_rows(node: ast.expr, env: dict, text: str) -> list:
+    """
+    Fold a parameters table row by row, so one unusual row does not lose the rest.
+    """
+    rows = []
+    for elt in getattr(node, "elts", []):
+        row, ok = eval_or_source(elt, env, text)
+        if not ok and isinstance(elt, (ast.List, ast.Tuple)):
+            row = [eval_or_source(cell, env, text)[0] for cell in elt.elts]
+        rows.append(row)
+    return rows
+
+def read_model_metadata(text: str, filename: str = "<model>") -> dict:
+    """
+    Extract the module-level metadata of a sasmodels plugin from its source.
+
+    Returns a dict with the names in META_NAMES that the module assigns, plus
+    "attributes" (e.g. {"Iq.vectorized": True}), "functions" (kernel defs) and
+    "unevaluated" (names whose value is kept as source text). If the file does
+    not parse, "error" is set and only simple one-line string assignments are read.
+    """
+    meta: dict = {"attributes": {}, "functions": [], "unevaluated": []}
+    try:
+        tree = ast.parse(text, filename=filename)
+    except SyntaxError as e:
+        meta["error"] = f"SyntaxError: {e.msg} (line {e.lineno})"
+        for m in SIMPLE_ASSIGN_RE.finditer(text):
+            if m.group(1) in META_NAMES:
+                meta[m.group(1)] = m.group(3) if m.group(4) is None else m.group(4) == "True"
+        return meta
+
+    env: dict = {}
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            meta["functions"].append(stmt.name)
+            continue
+        if isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            targets, value = [stmt.target], stmt.value
+        elif isinstance(stmt, ast.Assign):
+            targets, value = stmt.targets, stmt.value
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name):
+                key = f"{target.value.id}.{target.attr}"
+                meta["attributes"][key] = eval_or_source(value, env, text)[0]
+            elif isinstance(target, ast.Tuple) and isinstance(value, ast.Tuple) and len(target.elts) == len(value.elts):
+                for t, v in zip(target.elts, value.elts):
+                    if isinstance(t, ast.Name):
+                        try:
+                            env[t.id] = static_eval(v, env)
+                        except Unevaluable:
+                            env.pop(t.id, None)
+            elif isinstance(target, ast.Name):
+                result, ok = eval_or_source(value, env, text)
+                if ok:
+                    env[target.id] = result
+                else:
+                    env.pop(target.id, None)
+                if target.id not in META_NAMES:
+                    continue
+                if target.id == "parameters" and not ok:
+                    result = _parameter_rows(value, env, text)
+                elif target.id == "tests" and not ok and isinstance(value, ast.List):
+                    result = [eval_or_source(elt, env, text)[0] for elt in value.elts]
+                meta[target.id] = result
+                if not ok and target.id not in meta["unevaluated"]:
+                    meta["unevaluated"].append(target.id)
+    if isinstance(env.get("c_code"), str):
+        meta["functions"] += c_functions(env["c_code"])
+    return meta
+
+def parameter_fields(row) -> tuple:
+    """
+    (name, units, default, lower, upper, type, description) of a parameters row.
+    """
+    if not isinstance(row, (list, tuple)):
+        return (None,) * 7
+    cells = list(row) + [None] * (6 - len(row))
+    name, units, default, limits, ptype, description = cells[:6]
+    lower = upper = None
+    if isinstance(limits, (list, tuple)) and len(limits) == 2:
+        lower, upper = limits
+    return tuple(
+        v if v is None or isinstance(v, (str, int, float)) else json.dumps(v, default=str)
+        for v in (name, units, default, lower, upper, ptype, description)
+    )
+
+def resolve_source(entry: str, files_dir: Path) -> Path | None:
+    """
+    The local file a source entry refers to, or None for sasmodels' own lib/ files.
+    """
+    for candidate in (files_dir / entry, files_dir / Path(entry).name):
+        if candidate.is_file():
+            return candidate
+    return None
+
+# --- Index ----------------------------------------------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS models (
+    path TEXT PRIMARY KEY, dir TEXT, name TEXT, title TEXT, category TEXT,
+    have_fq INTEGER, iq_vectorized INTEGER, iqxy_vectorized INTEGER,
+    n_parameters INTEGER, n_tests INTEGER, meta TEXT, error TEXT
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    model TEXT, position INTEGER, name TEXT, units TEXT, default_value,
+    lower, upper, type TEXT, description TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    model TEXT, position INTEGER, source TEXT, path TEXT
+);
+CREATE TABLE IF NOT EXISTS functions (
+    path TEXT, name TEXT, lang TEXT
+);
+CREATE INDEX IF NOT EXISTS parameters_name ON parameters(name);
+CREATE INDEX IF NOT EXISTS sources_source ON sources(source);
+CREATE INDEX IF NOT EXISTS functions_name ON functions(name);
+"""
+
+def sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def _flag(value) -> int | None:
+    return None if value is None else int(bool(value))
+
+class Catalog:
+    def __init__(self, root: Path, db_path: Path | None = None):
+        self.root = root
+        self.db = sqlite3.connect(db_path or root / INDEX_NAME)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _rel(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def _forget(self, rel: str):
+        for table, column in (("models", "path"), ("parameters", "model"), ("sources", "model"),
+                              ("functions", "path"), ("files", "path")):
+            self.db.execute(f"DELETE FROM {table} WHERE {column} = ?", (rel,))
+
+    def _index_model(self, path: Path, rel: str):
+        text = path.read_text(encoding="utf-8", errors="replace")
+        meta = read_model_metadata(text, rel)
+        attrs = meta["attributes"]
+        parameters = meta.get("parameters") if isinstance(meta.get("parameters"), list) else []
+        tests = meta.get("tests") if isinstance(meta.get("tests"), list) else []
+        self.db.execute(
+            "INSERT INTO models VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (rel, rel.split("/", 1)[0], meta.get("name"), meta.get("title"), meta.get("category"),
+             _flag(meta.get("have_Fq")), _flag(attrs.get("Iq.vectorized")), _flag(attrs.get("Iqxy.vectorized")),
+             len(parameters), len(tests), json.dumps(meta, default=str), meta.get("error")),
+        )
+        self.db.executemany(
+            "INSERT INTO parameters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(rel, i) + parameter_fields(row) for i, row in enumerate(parameters)],
+        )
+        source = meta.get("source") if isinstance(meta.get("source"), list) else []
+        rows = []
+        for i, entry in enumerate(s for s in source if isinstance(s, str)):
+            local = resolve_source(entry, path.parent)
+            rows.append((rel, i, entry, self._rel(local) if local else None))
+        self.db.executemany("INSERT INTO sources VALUES (?, ?, ?, ?)", rows)
+        self.db.executemany(
+            "INSERT INTO functions VALUES (?, ?, 'py')",
+            [(rel, name) for name in dict.fromkeys(meta["functions"])],
+        )
+
+    def _index_c(self, path: Path, rel: str):
+        code = path.read_text(encoding="utf-8", errors="replace")
+        self.db.executemany(
+            "INSERT INTO functions VALUES (?, ?, 'c')",
+            [(rel, name) for name in c_functions(code)],
+        )
+
+    def refresh(self, full: bool = False) -> dict[str, int]:
+        """
+        Bring the index up to date with the tree and return what was done.
+        """
+        stats = {"unchanged": 0, "touched": 0, "parsed": 0, "removed": 0}
+        known = {row[0]: row[1:] for row in self.db.execute("SELECT path, mtime_ns, size, sha256 FROM files")}
+        seen = set()
+        with self.db:
+            for path in sorted(self.root.glob("*/files/*")):
+                if path.suffix not in (".py", ".c") or not path.is_file():
+                    continue
+                rel = self._rel(path)
+                seen.add(rel)
+                st = path.stat()
+                old = known.get(rel)
+                if not full and old and old[:2] == (st.st_mtime_ns, st.st_size):
+                    stats["unchanged"] += 1
+                    continue
+                digest = sha256_file(path)
+                if not full and old and old[2] == digest:
+                    self.db.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                                    (st.st_mtime_ns, st.st_size, rel))
+                    stats["touched"] += 1
+                    continue
+                self._forget(rel)
+                if path.suffix == ".py":
+                    self._index_model(path, rel)
+                else:
+                    self._index_c(path, rel)
+                self.db.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (rel, st.st_mtime_ns, st.st_size, digest))
+                stats["parsed"] += 1
+            for rel in set(known) - seen:
+                self._forget(rel)
+                stats["removed"] += 1
+        return stats
+
+    def query(self, uses=None, have_fq=None, category=None, defines=None, param=None,
+              name=None, vectorized=None) -> list[dict]:
+        """
+        Models matching every given filter, ordered by path.
+        """
+        clauses, args = [], []
+        if uses:
+            clauses.append("path IN (SELECT model FROM sources WHERE source = ? OR source LIKE ?)")
+            args += [uses, "%/" + uses]
+        if have_fq is not None:
+            clauses.append("COALESCE(have_fq, 0) = ?")
+            args.append(int(have_fq))
+        if category:
+            clauses.append("(category = ? OR category LIKE ?)")
+            args += [category, category + ":%"]
+        if defines:
+            # Defined in the module itself or in one of the local .c files it links
+            clauses.append(
+                "(path IN (SELECT path FROM functions WHERE name = ?)"
+                " OR path IN (SELECT s.model FROM sources s JOIN functions f ON f.path = s.path WHERE f.name = ?))"
+            )
+            args += [defines, defines]
+        if param:
+            clauses.append("path IN (SELECT model FROM parameters WHERE name = ?)")
+            args.append(param)
+        if name:
+            clauses.append("(name LIKE ? OR dir LIKE ?)")
+            args += [f"%{name}%", f"%{name}%"]
+        if vectorized is not None:
+            clauses.append("COALESCE(iq_vectorized, 0) = ?")
+            args.append(int(vectorized))
+        sql = "SELECT path, name, category, meta FROM models"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return [
+            {"path": path, "name": name, "category": category, **json.loads(meta)}
+            for path, name, category, meta in self.db.execute(sql + " ORDER BY path", args)
+        ]
+
+# --- CLI ------------------------------------------------------------------------
+
+def _tristate(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes", "y")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline catalog of the mirrored model plugins.")
+    parser.add_argument("--root", default=str(Path(__file__).resolve().parent), help="Mirror tree (default: this repository)")
+    parser.add_argument("--db", default=None, help=f"Index file (default: <root>/{INDEX_NAME})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Create or update the index")
+    build.add_argument("--full", action="store_true", help="Re-parse every file, ignoring mtimes and hashes")
+
+    query = sub.add_parser("query", help="List models matching all given filters")
+    query.add_argument("--uses", help="Links this source file (e.g. lib/gauss76.c)")
+    query.add_argument("--have-fq", type=_tristate, nargs="?", const=True, help="have_Fq is set (or 'false')")
+    query.add_argument("--category", help="Category, or category prefix (e.g. shape:cylinder, shape)")
+    query.add_argument("--defines", help="Defines this kernel function (e.g. Iqxy)")
+    query.add_argument("--param", help="Has a parameter with this name")
+    query.add_argument("--name", help="Substring of the model name or directory")
+    query.add_argument("--vectorized", type=_tristate, nargs="?", const=True, help="Iq.vectorized is set (or 'false')")
+    query.add_argument("--json", action="store_true", help="Print the full metadata as JSON")
+    query.add_argument("--no-refresh", action="store_true", help="Query the index as is, without checking the tree")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    catalog = Catalog(root, Path(args.db) if args.db else None)
+    try:
+        if args.command == "build":
+            start = time.perf_counter()
+            stats = catalog.refresh(full=args.full)
+            print(f"[OK] Index updated in {(time.perf_counter() - start) * 1000:.1f} ms: "
+                  + ", ".join(f"{n} {k}" for k, n in stats.items()))
+            errors = catalog.db.execute("SELECT path, error FROM models WHERE error IS NOT NULL ORDER BY path").fetchall()
+            for path, error in errors:
+                print(f"[WARN] {path}: {error}")
+            return
+
+        if not args.no_refresh:
+            catalog.refresh()
+        start = time.perf_counter()
+        rows = catalog.query(uses=args.uses, have_fq=args.have_fq, category=args.category,
+                             defines=args.defines, param=args.param, name=args.name,
+                             vectorized=args.vectorized)
+        elapsed = (time.perf_counter() - start) * 1000
+        if args.json:
+            json.dump(rows, sys.stdout, indent=2, default=str)
+            print()
+        else:
+            for row in rows:
+                print(f"{row['path']:<60s} {row['name'] or '-':<32s} {row['category'] or '-'}")
+        print(f"[i] {len(rows)} model(s) in {elapsed:.2f} ms", file=sys.stderr)
+    finally:
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -18,30 +18,12 @@ multilayer_vesicle_kernel(double q,
           double sld,
           int n_shells)
 {
-    //calculate with a loop, two shells at a time
-    int ii = 0;
-    double fval = 0.0;
-    double voli = 0.0;
+    // shells from radius + ii*(thick_shell + thick_solvent) for ii < n_shells;
+    // 0 < n_shells < 2 corresponds to unilamellar vesicles (C. Glinka, 11/24/03)
     const double sldi = sld_solvent-sld;
-
-    do {
-        double ri = radius + (double)ii*(thick_shell + thick_solvent);
-
-        // layer 1
-        voli = M_4PI_3*ri*ri*ri;
-        fval += voli*sldi*sas_3j1x_x(ri*q);
-
-        ri += thick_shell;
-
-        // layer 2
-        voli = M_4PI_3*ri*ri*ri;
-        fval -= voli*sldi*sas_3j1x_x(ri*q);
-
-        //do 2 layers at a time
-        ii++;
-
-    } while(ii <= n_shells-1);  //change to make 0 < n_shells < 2 correspond to
-                               //unilamellar vesicles (C. Glinka, 11/24/03)
+    const int n_layers = (n_shells > 1 ? n_shells : 1);
+    const double fval = sldi*shell_layers(q, radius, thick_shell,
+                                          thick_shell + thick_solvent, n_layers);
 
     return fval;  // Volume normalization happens in caller
 }
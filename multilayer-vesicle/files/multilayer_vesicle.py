@@ -143,7 +143,7 @@ parameters = [
 # TODO: proposed syntax for specifying which parameters can be polydisperse
 #polydispersity = ["radius", "thick_shell"]
 
-source = ["lib/sas_3j1x_x.c", "multilayer_vesicle.c"]
+source = ["lib/sas_3j1x_x.c", "multi_shell.c", "multilayer_vesicle.c"]
 have_Fq = True
 radius_effective_modes = ["outer radius"]
 
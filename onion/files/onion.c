@@ -1,31 +1,45 @@
-
+// Bessel-like factor of the exponential part of a shell at one of its radii,
+// with x = qr, sinc = sin(x)/x and alpha = A r/thickness.
 static double
-f_exp(double q, double r, double sld_in, double sld_out,
-    double thickness, double A, double side)
+f_exp_shape(double x, double sinc, double cosx, double alpha)
+{
+  const double qrsq = x * x;
+  const double alphasq = alpha * alpha;
+  const double sumsq = alphasq + qrsq;
+  const double t1 = (alphasq - qrsq)*sinc - 2.0*alpha*cosx;
+  const double t2 = alpha*sinc - cosx;
+  return -3.0*(t1/sumsq - t2)/sumsq;
+}
+
+// Shell table of the profile, with the flat parts as steps in channel 0 and
+// the exponential parts of shell i as alpha and weight at its inner radius
+// (channels 1 and 2) and at its outer radius (channels 3 and 4).
+static void
+onion_table(double *table, double sld_core, double radius_core, double sld_solvent,
+    int n, double sld_in[], double sld_out[], double thickness[], double A[])
 {
-  const double vol = M_4PI_3 * cube(r);
-  const double qr = q * r;
-  const double bes = sas_3j1x_x(qr);
-  const double alpha = A * r/thickness;
-  double result;
-  if (qr == 0.0) {
-    result = 1.0;
-  } else if (fabs(A) > 0.0) {
-    const double qrsq = qr * qr;
-    const double alphasq = alpha * alpha;
-    const double sumsq = alphasq + qrsq;
-    double sinqr, cosqr;
-    SINCOS(qr, sinqr, cosqr);
-    const double t1 = (alphasq - qrsq)*sinqr/qr - 2.0*alpha*cosqr;
-    const double t2 = alpha*sinqr/qr - cosqr;
-    const double fun = -3.0*(t1/sumsq - t2)/sumsq;
-    const double slope = (sld_out - sld_in)/expm1(A);
-    const double contrast = slope*exp(A*side);
-    result = contrast*fun + (sld_in-slope)*bes;
-  } else {
-    result = sld_in*bes;
+  double flat[SHELL_N];
+  shell_set_radii(table, radius_core, n, thickness);
+  for (int k=0; k<=n; k++) {
+    for (int c=1; c<SHELL_CHANNELS; c++) {
+      table[SHELL_VALUE(c) + k] = 0.0;
+    }
+  }
+  for (int i=0; i < n; i++) {
+    if (fabs(A[i]) > 0.0) {
+      const double r_in = table[SHELL_RADIUS + i];
+      const double r_out = table[SHELL_RADIUS + i + 1];
+      const double slope = (sld_out[i] - sld_in[i])/expm1(A[i]);
+      flat[i] = sld_in[i] - slope;
+      table[SHELL_VALUE(1) + i] = A[i] * r_in/thickness[i];
+      table[SHELL_VALUE(2) + i] = -table[SHELL_VOLUME + i] * slope;
+      table[SHELL_VALUE(3) + i + 1] = A[i] * r_out/thickness[i];
+      table[SHELL_VALUE(4) + i + 1] = table[SHELL_VOLUME + i + 1] * slope*exp(A[i]);
+    } else {
+      flat[i] = sld_in[i];
+    }
   }
-  return vol * result;
+  shell_set_steps(table, 0, sld_core, n, flat, sld_solvent);
 }
 
 static double
@@ -58,15 +72,41 @@ Fq(double q, double *F1, double *F2, double sld_core, double radius_core, double
     double A[])
 {
   int n = (int)(n_shells+0.5);
-  double r_out = radius_core;
-  double f = f_exp(q, r_out, sld_core, 0.0, 0.0, 0.0, 0.0);
-  for (int i=0; i < n; i++){
-    const double r_in = r_out;
-    r_out += thickness[i];
-    f -= f_exp(q, r_in, sld_in[i], sld_out[i], thickness[i], A[i], 0.0);
-    f += f_exp(q, r_out, sld_in[i], sld_out[i], thickness[i], A[i], 1.0);
+  double key[SHELL_KEY_SIZE];
+  int n_key = 0;
+  key[n_key++] = n;
+  key[n_key++] = sld_core;
+  key[n_key++] = radius_core;
+  key[n_key++] = sld_solvent;
+  for (int i=0; i < n; i++) {
+    key[n_key++] = sld_in[i];
+    key[n_key++] = sld_out[i];
+    key[n_key++] = thickness[i];
+    key[n_key++] = A[i];
+  }
+
+  double buffer[SHELL_TABLE_SIZE];
+  int fill;
+  double *table = shell_table(key, n_key, buffer, &fill);
+  if (fill) {
+    onion_table(table, sld_core, radius_core, sld_solvent, n, sld_in, sld_out, thickness, A);
+  }
+
+  double bes[SHELL_N];
+  shell_bessel(q, table, bes);
+  double f = shell_sum(table, 0, bes);
+  for (int k=0; k <= n; k++) {
+    const double w_in = table[SHELL_VALUE(2) + k];
+    const double w_out = table[SHELL_VALUE(4) + k];
+    if (w_in != 0.0 || w_out != 0.0) {
+      const double qr = q * table[SHELL_RADIUS + k];
+      double sinqr, cosqr;
+      SINCOS(qr, sinqr, cosqr);
+      const double sinc = (qr == 0.0 ? 1.0 : sinqr/qr);
+      if (w_in != 0.0) f += w_in * f_exp_shape(qr, sinc, cosqr, table[SHELL_VALUE(1) + k]);
+      if (w_out != 0.0) f += w_out * f_exp_shape(qr, sinc, cosqr, table[SHELL_VALUE(3) + k]);
+    }
   }
-  f -= f_exp(q, r_out, sld_solvent, 0.0, 0.0, 0.0, 0.0);
 
   *F1 = 1e-2 * f;
   *F2 = 1e-4 * f * f;
@@ -4,260 +4,161 @@ form_volume(double radius, double thickness)
     return M_4PI_3 * cube(radius + thickness);
 }
 
-static double Iq(double q, double NormalizationRadius, double sld_core, double sld_magcore, double sld_shell, double sld_magshell, double sld_solvent, double radius_core, 
-double thickness_shell, int MVar, double Length, double ViewingAngle, double sigma, double Singlets, double Doubles, double Trimers, double Quadramers, double Pentamers)
+// Chain orientations: theta = 1, 3, ..., 89 degrees from the x axis with a
+// Gaussian weight of standard deviation sigma (degrees), normalised over the
+// grid, and phi = 0, 45, 90 degrees about the x axis. The table holds the
+// weight of each (theta, phi) pair and cos/sin theta; it only depends on sigma.
+#define CHAIN_N_THETA 45
+#define CHAIN_N_PHI 3
+#define CHAIN_N_SIZES 5 // singlets to pentamers
+#define CHAIN_WEIGHT 0
+#define CHAIN_COS_THETA CHAIN_N_THETA
+#define CHAIN_SIN_THETA (2*CHAIN_N_THETA)
+#define CHAIN_TABLE_SIZE (3*CHAIN_N_THETA)
+
+static void
+chain_table(double sigma, double *table)
 {
-    const double bes = sas_3j1x_x(q*radius_core);
-    double volume_core = M_4PI_3 * cube(radius_core);
-    double total_radius = radius_core + thickness_shell;
-    double volume_total = M_4PI_3 * cube(total_radius);
-    double volume_shell = volume_total - volume_core;
-    
-    double AmpR1 = sas_3j1x_x(q*radius_core)*(volume_core)/3.0;
-    double AmpR2 = sas_3j1x_x(q*(total_radius))*(volume_shell)/3.0;
-    double Amp = ((sld_core - sld_solvent)*AmpR1 + (sld_shell - sld_solvent)*(AmpR2-AmpR1));
-    double MAmp = (sld_magcore)*AmpR1 + (sld_magshell)*(AmpR2-AmpR1);
-
-    double VolumeFraction = 1.0;
-    double SingletFraction = Singlets;
-    double DimerFraction = Doubles;
-    double TrimerFraction = Trimers;
-    double QuadramerFraction = Quadramers;
-    double PentamerFraction = Pentamers;
-
-    double PiNum = 2.0*acos(0);
-    double radius_total = radius_core + thickness_shell;
-    double Vol = (4.0*PiNum/3.0)*pow(NormalizationRadius,3);
-    if(Vol == 0){Vol = 1E-10;}
-
-    double Norm = 0.0;
-    double angle, variable1, variable2;
-    for(int a=0; a<45; a++){
-        for(int b=0; b<3; b++){
-            angle = (a*2.0+1.0)*PiNum/180.0;
-            variable1 = (a*2.0+1.0 - 0.0)/sigma;
-            variable2 = sqrt(4.0*acos(0))*sigma;
-            Norm = Norm + exp( -0.5*pow( variable1,2) ) / variable2;
-        }
+    double norm = 0.0;
+    for (int a=0; a<CHAIN_N_THETA; a++) {
+        const double angle = 2.0*a + 1.0;
+        const double weight = exp(-0.5*square(angle/sigma));
+        table[CHAIN_WEIGHT + a] = weight;
+        norm += CHAIN_N_PHI*weight;
+        SINCOS(angle*M_PI_180, table[CHAIN_SIN_THETA + a], table[CHAIN_COS_THETA + a]);
     }
-
-    double SingletIntensity = 0;
-    double MSingletIntensity = 0;
-    double DimerIntensity = 0;
-    double MDimerIntensity = 0;
-    double TrimerIntensity = 0;
-    double MTrimerIntensity = 0;
-    double QuadramerIntensity = 0;
-    double MQuadramerIntensity = 0;
-    double PentamerIntensity = 0;
-    double MPentamerIntensity = 0;
-    double Q_X = q*cos(ViewingAngle*PiNum/180.0);
-    double Q_Y = q*sin(ViewingAngle*PiNum/180.0);
-
-    double anglewt;
-    for(int a=0; a<45; a++){
-        for(int b=0; b<3; b++){
-            angle = (a*2.0+1.0)*PiNum/180.0;
-            double phi = (b*45.0)*PiNum/180.0;
-            variable1 = (a*2.0+1.0 - 0.0)/sigma;
-            variable2 = sqrt(4.0*acos(0))*sigma;
-            anglewt = (exp( -0.5*pow( variable1,2) ) / variable2)/Norm;
-
-            double ChainProjX = cos(angle);
-            double ChainProjY = sin(angle)*cos(phi);
-            double ChainProjZ = sin(angle)*sin(phi);
-
-            SingletIntensity  += anglewt*pow(Amp,2)/Vol;
-            if(MVar <= 1){
-                MSingletIntensity  += (2.0/3.0)*anglewt*pow(MAmp,2)/Vol;}
-            if(MVar < 3 && MVar > 1){
-                MSingletIntensity  +=  pow(sin(angle - ViewingAngle*PiNum/180.0),2)*anglewt*pow(MAmp,2)/Vol;}
-            if(MVar >= 3){
-                MSingletIntensity  +=  pow(sin(ViewingAngle*PiNum/180.0),2)*anglewt*pow(MAmp,2)/Vol;}
-
-            double real_phase = 1.0;
-            double img_phase = 0.0;
-            double mreal_phase = 1.0;
-            double mimg_phase = 0.0;
-
-            if(MVar < 3 && MVar > 1){mreal_phase = sin(angle - ViewingAngle*PiNum/180.0);}
-            if(MVar >= 3){mreal_phase = sin(ViewingAngle*PiNum/180.0);}
-
-            for(int k=1; k<5; k++){
-                real_phase += cos(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                img_phase += sin(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                if(MVar < 3 && MVar > 1){
-                    mreal_phase += sin(angle - ViewingAngle*PiNum/180.0)*cos(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                    mimg_phase += sin(angle - ViewingAngle*PiNum/180.0)*sin(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                }
-                if(MVar >= 3){
-                    mreal_phase += sin(ViewingAngle*PiNum/180.0)*cos(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                    mimg_phase += sin(ViewingAngle*PiNum/180.0)*sin(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                }
-            if(k==1){
-            DimerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(2.0*Vol);
-            MDimerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(2.0*Vol);
-            }
-            if(k==2){
-            TrimerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(3.0*Vol);
-            MTrimerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(3.0*Vol);
-            }
-            if(k==3){
-            QuadramerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(4.0*Vol);
-            MQuadramerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(4.0*Vol);
-            }
-            if(k==4){
-            PentamerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(5.0*Vol);
-            MPentamerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(5.0*Vol);
-            }
-            }//end k loop for dimers
-       }
+    for (int a=0; a<CHAIN_N_THETA; a++) {
+        table[CHAIN_WEIGHT + a] /= norm;
     }
+}
 
-    double FractionScale = SingletFraction + DimerFraction + TrimerFraction + QuadramerFraction + PentamerFraction;
-    if(FractionScale == 0){FractionScale = 1.0;}
-
-    double SIntensity = SingletFraction*SingletIntensity + DimerFraction*DimerIntensity + TrimerFraction*TrimerIntensity + QuadramerFraction*QuadramerIntensity + PentamerFraction*PentamerIntensity;
-    double MIntensity = 0.0;
-    if(MVar <= 1){
-        MIntensity = MSingletIntensity*(SingletFraction + DimerFraction + TrimerFraction + QuadramerFraction + PentamerFraction);
-    }
-    else{
-        MIntensity = SingletFraction*MSingletIntensity + DimerFraction*MDimerIntensity + TrimerFraction*MTrimerIntensity + QuadramerFraction*MQuadramerIntensity + PentamerFraction*MPentamerIntensity;
+// The table for the current sigma. On the CPU it is kept between calls, so it
+// is built once per parameter set rather than for every q; GPU kernels have no
+// writable static storage and fill the caller's buffer.
+#if !defined(USE_GPU)
+static double chain_cache[CHAIN_TABLE_SIZE];
+static double chain_cache_sigma = -1.0;
+#if defined(USE_OPENMP)
+#pragma omp threadprivate(chain_cache, chain_cache_sigma)
+#endif
+#endif
+
+static const double *
+chain_orientations(double sigma, double *buffer)
+{
+#if !defined(USE_GPU)
+    if (sigma != chain_cache_sigma) {
+        chain_table(sigma, chain_cache);
+        chain_cache_sigma = sigma;
     }
-
-    double Intensity = (SIntensity+MIntensity)*(1E4)/FractionScale;
-
-    return Intensity;
+    return chain_cache;
+#else
+    chain_table(sigma, buffer);
+    return buffer;
+#endif
 }
 
-static double Iqxy(double x, double y, double NormalizationRadius, double sld_core, double sld_magcore, double sld_shell, double sld_magshell, double sld_solvent, double radius_core, 
-double thickness_shell, int MVar, double Length, double ViewingAngle, double sigma, double Singlets, double Doubles, double Trimers, double Quadramers, double Pentamers)
+// Intensity of the chain mixture at (Q_X, Q_Y), viewed at the angle with sine
+// sin_view and cosine cos_view to the x axis. A chain of n+1 particles along u has
+// the structure factor |sum_{k=0..n} exp(i k Length Q.u)|^2/(n+1); the phase
+// factors of the dimer to pentamer are built up by complex multiplication.
+static double
+oriented_chains(double q, double Q_X, double Q_Y, double sin_view, double cos_view, double NormalizationRadius,
+    double sld_core, double sld_magcore, double sld_shell, double sld_magshell, double sld_solvent,
+    double radius_core, double thickness_shell, int MVar, double Length, double sigma, const double *Fraction)
 {
-
-    double PiNum = 2.0*acos(0);
-    double Q_X = x;
-    double Q_Y = y;
-    double q = sqrt(x*x + y*y);
-    double ViewingAngle = atan(y/x)*180.0/PiNum;
-
-    const double bes = sas_3j1x_x(q*radius_core);
     double volume_core = M_4PI_3 * cube(radius_core);
     double total_radius = radius_core + thickness_shell;
     double volume_total = M_4PI_3 * cube(total_radius);
     double volume_shell = volume_total - volume_core;
-    
+
     double AmpR1 = sas_3j1x_x(q*radius_core)*(volume_core)/3.0;
     double AmpR2 = sas_3j1x_x(q*(total_radius))*(volume_shell)/3.0;
     double Amp = ((sld_core - sld_solvent)*AmpR1 + (sld_shell - sld_solvent)*(AmpR2-AmpR1));
     double MAmp = (sld_magcore)*AmpR1 + (sld_magshell)*(AmpR2-AmpR1);
 
-    double VolumeFraction = 1.0;
-    double SingletFraction = Singlets;
-    double DimerFraction = Doubles;
-    double TrimerFraction = Trimers;
-    double QuadramerFraction = Quadramers;
-    double PentamerFraction = Pentamers;
-
-    double radius_total = radius_core + thickness_shell;
-    double Vol = (4.0*PiNum/3.0)*pow(NormalizationRadius,3);
+    double Vol = M_4PI_3*cube(NormalizationRadius);
     if(Vol == 0){Vol = 1E-10;}
 
-    double Norm = 0.0;
-    double angle, variable1, variable2;
-    for(int a=0; a<45; a++){
-        for(int b=0; b<3; b++){
-            angle = (a*2.0+1.0)*PiNum/180.0;
-            variable1 = (a*2.0+1.0 - 0.0)/sigma;
-            variable2 = sqrt(4.0*acos(0))*sigma;
-            Norm = Norm + exp( -0.5*pow( variable1,2) ) / variable2;
+    double buffer[CHAIN_TABLE_SIZE];
+    const double *table = chain_orientations(sigma, buffer);
+    const double cos_phi[CHAIN_N_PHI] = {1.0, M_SQRT1_2, 0.0};
+
+    // orientation averages of the chain structure factors, without and with
+    // the square of the magnetic projection factor
+    double Phase[CHAIN_N_SIZES] = {0.0, 0.0, 0.0, 0.0, 0.0};
+    double MPhase[CHAIN_N_SIZES] = {0.0, 0.0, 0.0, 0.0, 0.0};
+    for(int a=0; a<CHAIN_N_THETA; a++){
+        const double cos_theta = table[CHAIN_COS_THETA + a];
+        const double sin_theta = table[CHAIN_SIN_THETA + a];
+        double Sum[CHAIN_N_SIZES] = {CHAIN_N_PHI, 0.0, 0.0, 0.0, 0.0};
+        for(int b=0; b<CHAIN_N_PHI; b++){
+            double sin_step, cos_step;
+            SINCOS(Length*(Q_X*cos_theta + Q_Y*sin_theta*cos_phi[b]), sin_step, cos_step);
+            double real_k = 1.0, img_k = 0.0;
+            double real_phase = 1.0, img_phase = 0.0;
+            for(int k=1; k<CHAIN_N_SIZES; k++){
+                const double real_next = real_k*cos_step - img_k*sin_step;
+                img_k = real_k*sin_step + img_k*cos_step;
+                real_k = real_next;
+                real_phase += real_k;
+                img_phase += img_k;
+                Sum[k] += square(real_phase) + square(img_phase);
+            }
         }
-    }
 
-    double SingletIntensity = 0;
-    double MSingletIntensity = 0;
-    double DimerIntensity = 0;
-    double MDimerIntensity = 0;
-    double TrimerIntensity = 0;
-    double MTrimerIntensity = 0;
-    double QuadramerIntensity = 0;
-    double MQuadramerIntensity = 0;
-    double PentamerIntensity = 0;
-    double MPentamerIntensity = 0;
-
-    double anglewt;
-    for(int a=0; a<45; a++){
-        for(int b=0; b<3; b++){
-            angle = (a*2.0+1.0)*PiNum/180.0;
-            double phi = (b*45.0)*PiNum/180.0;
-            variable1 = (a*2.0+1.0 - 0.0)/sigma;
-            variable2 = sqrt(4.0*acos(0))*sigma;
-            anglewt = (exp( -0.5*pow( variable1,2) ) / variable2)/Norm;
-
-            double ChainProjX = cos(angle);
-            double ChainProjY = sin(angle)*cos(phi);
-            double ChainProjZ = sin(angle)*sin(phi);
-
-            SingletIntensity  += anglewt*pow(Amp,2)/Vol;
-            if(MVar <= 1){
-                MSingletIntensity  += (2.0/3.0)*anglewt*pow(MAmp,2)/Vol;}
-            if(MVar < 3 && MVar > 1){
-                MSingletIntensity  +=  pow(sin(angle - ViewingAngle*PiNum/180.0),2)*anglewt*pow(MAmp,2)/Vol;}
-            if(MVar >= 3){
-                MSingletIntensity  +=  pow(sin(ViewingAngle*PiNum/180.0),2)*anglewt*pow(MAmp,2)/Vol;}
-
-            double real_phase = 1.0;
-            double img_phase = 0.0;
-            double mreal_phase = 1.0;
-            double mimg_phase = 0.0;
-
-            if(MVar < 3 && MVar > 1){mreal_phase = sin(angle - ViewingAngle*PiNum/180.0);}
-            if(MVar >= 3){mreal_phase = sin(ViewingAngle*PiNum/180.0);}
-
-            for(int k=1; k<5; k++){
-                real_phase += cos(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                img_phase += sin(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                if(MVar < 3 && MVar > 1){
-                    mreal_phase += sin(angle - ViewingAngle*PiNum/180.0)*cos(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                    mimg_phase += sin(angle - ViewingAngle*PiNum/180.0)*sin(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                }
-                if(MVar >= 3){
-                    mreal_phase += sin(ViewingAngle*PiNum/180.0)*cos(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                    mimg_phase += sin(ViewingAngle*PiNum/180.0)*sin(k*Length*(Q_X*ChainProjX + Q_Y*ChainProjY));
-                }
-            if(k==1){
-            DimerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(2.0*Vol);
-            MDimerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(2.0*Vol);
-            }
-            if(k==2){
-            TrimerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(3.0*Vol);
-            MTrimerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(3.0*Vol);
-            }
-            if(k==3){
-            QuadramerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(4.0*Vol);
-            MQuadramerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(4.0*Vol);
-            }
-            if(k==4){
-            PentamerIntensity  += anglewt*(pow(Amp*real_phase,2) + pow(Amp*img_phase,2))/(5.0*Vol);
-            MPentamerIntensity  += anglewt*(pow(MAmp*mreal_phase,2) + pow(MAmp*mimg_phase,2))/(5.0*Vol);
-            }
-            }//end k loop for dimers
-       }
+        // 1 = random moments (2/3 on average), 2 = along the chain, 3 = along x
+        double projection = 2.0/3.0;
+        if(MVar < 3 && MVar > 1){projection = square(sin_theta*cos_view - cos_theta*sin_view);}
+        if(MVar >= 3){projection = square(sin_view);}
+        const double weight = table[CHAIN_WEIGHT + a];
+        for(int n=0; n<CHAIN_N_SIZES; n++){
+            Phase[n] += weight*Sum[n];
+            MPhase[n] += weight*projection*Sum[n];
+        }
     }
 
-    double FractionScale = SingletFraction + DimerFraction + TrimerFraction + QuadramerFraction + PentamerFraction;
-    if(FractionScale == 0){FractionScale = 1.0;}
-
-    double SIntensity = SingletFraction*SingletIntensity + DimerFraction*DimerIntensity + TrimerFraction*TrimerIntensity + QuadramerFraction*QuadramerIntensity + PentamerFraction*PentamerIntensity;
+    double FractionScale = 0.0;
+    double SIntensity = 0.0;
     double MIntensity = 0.0;
-    if(MVar <= 1){
-        MIntensity = MSingletIntensity*(SingletFraction + DimerFraction + TrimerFraction + QuadramerFraction + PentamerFraction);
+    for(int n=0; n<CHAIN_N_SIZES; n++){
+        FractionScale += Fraction[n];
+        SIntensity += Fraction[n]*Phase[n]/(n + 1);
+        MIntensity += Fraction[n]*MPhase[n]/(n + 1);
     }
-    else{
-        MIntensity = SingletFraction*MSingletIntensity + DimerFraction*MDimerIntensity + TrimerFraction*MTrimerIntensity + QuadramerFraction*MQuadramerIntensity + PentamerFraction*MPentamerIntensity;
+    if(MVar <= 1){
+        // random moments do not interfere between particles
+        MIntensity = MPhase[0]*FractionScale;
     }
+    if(FractionScale == 0){FractionScale = 1.0;}
 
-    double Intensity = (SIntensity+MIntensity)*(1E4)/FractionScale;
+    double Intensity = (square(Amp)*SIntensity + square(MAmp)*MIntensity)*(1E4)/(Vol*FractionScale);
 
     return Intensity;
 }
+
+static double Iq(double q, double NormalizationRadius, double sld_core, double sld_magcore, double sld_shell, double sld_magshell, double sld_solvent, double radius_core,
+double thickness_shell, int MVar, double Length, double ViewingAngle, double sigma, double Singlets, double Doubles, double Trimers, double Quadramers, double Pentamers)
+{
+    const double Fraction[CHAIN_N_SIZES] = {Singlets, Doubles, Trimers, Quadramers, Pentamers};
+    double sin_view, cos_view;
+    SINCOS(ViewingAngle*M_PI_180, sin_view, cos_view);
+
+    return oriented_chains(q, q*cos_view, q*sin_view, sin_view, cos_view, NormalizationRadius,
+        sld_core, sld_magcore, sld_shell, sld_magshell, sld_solvent,
+        radius_core, thickness_shell, MVar, Length, sigma, Fraction);
+}
+
+static double Iqxy(double x, double y, double NormalizationRadius, double sld_core, double sld_magcore, double sld_shell, double sld_magshell, double sld_solvent, double radius_core,
+double thickness_shell, int MVar, double Length, double ViewingAngle, double sigma, double Singlets, double Doubles, double Trimers, double Quadramers, double Pentamers)
+{
+    // the pixel direction takes the place of the viewing angle
+    const double Fraction[CHAIN_N_SIZES] = {Singlets, Doubles, Trimers, Quadramers, Pentamers};
+    const double q = sqrt(x*x + y*y);
+    double sin_view, cos_view;
+    SINCOS(atan(y/x), sin_view, cos_view);
+
+    return oriented_chains(q, x, y, sin_view, cos_view, NormalizationRadius,
+        sld_core, sld_magcore, sld_shell, sld_magshell, sld_solvent,
+        radius_core, thickness_shell, MVar, Length, sigma, Fraction);
+}
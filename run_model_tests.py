@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Run the embedded `tests` tables of every mirrored model through sasmodels.
+
+Usage:
+    python run_model_tests.py --root . --jobs 8 --report model_tests.json
+    python run_model_tests.py --models cylinder barbell --dtype single
+
+What it does:
+- Finds the model plugins under <root>/*/files/*.py (see model_catalog.py; files that
+  do not parse or define no parameters table are reported as skipped).
+- Loads each plugin with sasmodels from a scratch copy of its files/ folder, so
+  modules that write next to themselves at import time (e.g. generated gauss*.c
+  tables) never touch the mirror, builds the kernel and runs every test in its
+  `tests` list, with the same 5-significant-digit rule as sasmodels' own test suite.
+- Spreads the models across a process pool (--jobs, default: one per core), longest
+  first according to the previous report. Compiled kernels are kept in --cache, which
+  sasmodels keys by a hash of the generated source, so later runs only compile
+  models whose code changed.
+- Writes a JSON report with the status, number of tests passed, maximum relative
+  error and load/run time of each model, and exits with 1 if any model failed.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from model_catalog import read_model_metadata
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_CACHE = Path.home() / ".sasmodels" / "compiled_models"
+
+# --- Model discovery ------------------------------------------------------------
+
+def find_models(root: Path, only: list[str] | None = None) -> list[tuple[Path, str | None]]:
+    """
+    (path, reason-to-skip) for every plugin file, filtered by name or directory.
+    """
+    found = []
+    for path in sorted(root.glob("*/files/*.py")):
+        meta = read_model_metadata(path.read_text(encoding="utf-8", errors="replace"), str(path))
+        if only and not ({path.stem, path.parent.parent.name, meta.get("name")} & set(only)):
+            continue
+        if "error" in meta:
+            found.append((path, meta["error"]))
+        elif "parameters" not in meta and not any(k.startswith("model_info.") for k in meta["attributes"]):
+            # Modules may also hand sasmodels a ready-made model_info (long_cylinder does)
+            found.append((path, "not a model (no parameters table)"))
+        else:
+            found.append((path, None))
+    return found
+
+# --- Worker ---------------------------------------------------------------------
+
+def load_plugin(path: Path, scratch: Path):
+    """
+    Load the plugin at path from a copy of its files/ folder inside scratch.
+    """
+    from sasmodels.custom import load_custom_kernel_module
+    from sasmodels.modelinfo import make_model_info
+
+    files = scratch / "files"
+    shutil.copytree(path.parent, files)
+    return make_model_info(load_custom_kernel_module(str(files / path.name)))
+
+def init_worker(cache: str):
+    from sasmodels import kerneldll
+    kerneldll.SAS_DLL_PATH = cache
+
+def _alarm(signum, frame):
+    raise TimeoutError("model exceeded its time budget")
+
+def relative_error(target, actual) -> float:
+    if target == 0:
+        return 0.0 if actual == 0 else float("inf")
+    return abs(actual - target) / abs(target)
+
+def check_values(x, targets, actual, what: str, result: dict):
+    """
+    Compare a vector of results against the expected values, as sasmodels does.
+    """
+    import numpy as np
+    from sasmodels.model_test import is_near
+
+    if targets is None:
+        targets = [None] * len(x)
+    actual = np.atleast_1d(actual)
+    if len(actual) != len(targets):
+        result["failures"].append(f"{what}: expected {len(targets)} value(s), got {len(actual)}")
+        return
+    for xi, target, value in zip(x, targets, actual):
+        if target is None:
+            ok = not np.isnan(value)
+        else:
+            ok = is_near(target, value, 5)
+            if np.isfinite(target):
+                result["max_rel_err"] = max(result["max_rel_err"], relative_error(target, float(value)))
+        if not ok:
+            result["failures"].append(f"{what}({xi}): expected {target}, got {value}")
+
+def run_test(model, test, result: dict):
+    import numpy as np
+    from sasmodels.direct_model import call_Fq, call_kernel
+    from sasmodels.model_test import invalid_pars
+    from sasmodels.modelinfo import expand_pars
+
+    user_pars, x, y = test[:3]
+    pars = expand_pars(model.info.parameters, user_pars)
+    invalid = invalid_pars(model.info.parameters, pars)
+    if invalid:
+        raise ValueError("unknown parameters in test: " + ", ".join(invalid))
+    x = x if isinstance(x, list) else [x]
+    y = y if isinstance(y, list) else [y]
+    if isinstance(x[0], tuple):
+        qx, qy = zip(*x)
+        kernel = model.make_kernel([np.array(qx), np.array(qy)])
+    else:
+        kernel = model.make_kernel([np.array(x)])
+    try:
+        if len(test) == 7:
+            F, Fsq, R_eff, volume, volume_ratio = call_Fq(kernel, pars)
+            if F is not None:
+                check_values(x, y, F, "F", result)
+            check_values(x, test[3] if isinstance(test[3], list) else [test[3]], Fsq, "F^2", result)
+            for what, target, value in (("R_eff", test[4], R_eff), ("volume", test[5], volume),
+                                        ("volume_ratio", test[6], volume_ratio)):
+                check_values([None], [target], value, what, result)
+        else:
+            # 4-element tests also carry intermediate results; only I(q) is checked here
+            check_values(x, y, call_kernel(kernel, pars), "I", result)
+    finally:
+        kernel.release()
+
+def run_model(path: str, rel: str, dtype: str, timeout: float) -> dict:
+    """
+    Load one plugin, build its kernel and run its tests. Runs in a pool worker.
+    """
+    from sasmodels import product
+    from sasmodels.core import build_model, load_model_info
+
+    result = {
+        "path": rel, "name": None, "status": "error", "tests": 0, "passed": 0, "max_rel_err": 0.0,
+        "load_s": 0.0, "run_s": 0.0, "failures": [],
+    }
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _alarm)
+        signal.alarm(int(timeout))
+    try:
+        with tempfile.TemporaryDirectory(prefix="model-test-") as scratch:
+            start = time.perf_counter()
+            info = load_plugin(Path(path), Path(scratch))
+            result["name"] = info.name
+            model = build_model(info, dtype=dtype, platform="dll")
+            result["load_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            tests = info.tests or []
+            for test in tests:
+                n_failures = len(result["failures"])
+                try:
+                    if "@S" in test[0]:
+                        pars = dict(test[0])
+                        s_info = load_model_info(pars.pop("@S"))
+                        ps_model = build_model(product.make_product_info(info, s_info), dtype=dtype, platform="dll")
+                        run_test(ps_model, [pars] + list(test[1:]), result)
+                    else:
+                        run_test(model, test, result)
+                except TimeoutError:
+                    raise
+                except Exception as e:
+                    result["failures"].append(f"{test[0]}: {type(e).__name__}: {e}")
+                result["passed"] += len(result["failures"]) == n_failures
+            result["run_s"] = time.perf_counter() - start
+            result["tests"] = len(tests)
+            result["status"] = "fail" if result["failures"] else "pass" if tests else "no-tests"
+    except Exception as e:
+        result["failures"].append("".join(traceback.format_exception_only(type(e), e)).strip())
+    finally:
+        if timeout and hasattr(signal, "SIGALRM"):
+            signal.alarm(0)
+    return result
+
+# --- Driver ---------------------------------------------------------------------
+
+def load_previous(report: Path) -> dict[str, float]:
+    try:
+        rows = json.loads(report.read_text(encoding="utf-8"))["models"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    return {row["path"]: row["load_s"] + row["run_s"] for row in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the embedded tests of every mirrored model.")
+    parser.add_argument("--root", default=str(HERE), help="Mirror tree (default: this repository)")
+    parser.add_argument("--models", nargs="+", help="Only these models (file stem, directory or model name)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--dtype", default="double", choices=["double", "single"], help="Kernel precision")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-model time budget in seconds (0 = none)")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE), help=f"Compiled kernel cache (default: {DEFAULT_CACHE})")
+    parser.add_argument("--report", default="model_tests.json", help="JSON report to write")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    report = Path(args.report)
+    found = find_models(root, args.models)
+    if not found:
+        print("[!] No models found.", file=sys.stderr)
+        sys.exit(2)
+    previous = load_previous(report)
+    results = [
+        {"path": path.relative_to(root).as_posix(), "name": None, "status": "skip", "tests": 0, "passed": 0,
+         "max_rel_err": 0.0, "load_s": 0.0, "run_s": 0.0, "failures": [reason]}
+        for path, reason in found if reason
+    ]
+    todo = sorted((path for path, reason in found if not reason),
+                  key=lambda p: -previous.get(p.relative_to(root).as_posix(), 0.0))
+    print(f"[*] Testing {len(todo)} model(s) with {args.jobs} worker(s), {len(results)} skipped.")
+
+    start = time.perf_counter()
+    Path(args.cache).mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(args.jobs, initializer=init_worker, initargs=(args.cache,)) as pool:
+        futures = [pool.submit(run_model, str(path), path.relative_to(root).as_posix(), args.dtype, args.timeout) for path in todo]
+        for future in as_completed(futures):
+            row = future.result()
+            results.append(row)
+            tag = {"pass": "[OK]", "no-tests": "[i]"}.get(row["status"], "[!]")
+            print(f"{tag} {row['path']}: {row['status']} {row['passed']}/{row['tests']}"
+                  f"  max rel err {row['max_rel_err']:.2e}  {row['load_s'] + row['run_s']:.2f} s")
+    wall = time.perf_counter() - start
+
+    results.sort(key=lambda row: row["path"])
+    counts = {status: sum(row["status"] == status for row in results)
+              for status in ("pass", "fail", "error", "no-tests", "skip")}
+    report.write_text(json.dumps({
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "dtype": args.dtype, "jobs": args.jobs,
+        "wall_s": round(wall, 3), "summary": counts, "models": results,
+    }, indent=2, default=str), encoding="utf-8")
+    print(f"[i] {', '.join(f'{n} {k}' for k, n in counts.items())} in {wall:.1f} s; report: {report}")
+    sys.exit(1 if counts["fail"] or counts["error"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -52,39 +52,92 @@ static double reduced_field(double q, double Ms, double Hi,
 //the two transversal magnetisation components, reacting to a magnetic field.
 //The micromagnetic solution for the magnetisation are from Michels et al. PRB 94, 054424 (2016).
 
-static double fqMxreal( double x, double y, double z, double Mz, double Hkx, double Hky, double Hi, double Ms, double A, double D)
+// The reduced field rf = reduced_field(q, Ms, Hi, A) depends only on |q|, so the
+// callers compute it once per q and pass it in.
+static double fqMxreal(double *qvec, double rf, double Mz, double Hkx, double Hky, double Ms, double D)
 {
-  const double q=MAG_VEC(x, y, z);  
-  const double f = reduced_field(q, Ms, Hi, A)*(Hkx*(1.0+reduced_field(q, Ms, Hi, A)*y*y/q/q)-Ms*Mz*x*z/q/q*(1.0+reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,q)*DMI_length(Ms, D,q))-Hky*reduced_field(q, Ms, Hi, A)*x*y/q/q)/(1.0+reduced_field(q, Ms, Hi, A)*(x*x+y*y)/q/q-square(reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,z)));
+  const double x=qvec[0], y=qvec[1], z=qvec[2];
+  const double q=MAG_VEC(qvec);
+  const double dmi_q=DMI_length(Ms, D, q);
+  const double f = rf*(Hkx*(1.0+rf*y*y/q/q)-Ms*Mz*x*z/q/q*(1.0+rf*dmi_q*dmi_q)-Hky*rf*x*y/q/q)/(1.0+rf*(x*x+y*y)/q/q-square(rf*DMI_length(Ms, D,z)));
   return f;
 }
 
-static double fqMximag(double x, double y, double z, double Mz, double Hkx, double Hky, double Hi, double Ms, double A, double D)
+static double fqMximag(double *qvec, double rf, double Mz, double Hkx, double Hky, double Ms, double D)
 {
-  const double q=MAG_VEC(x, y, z);      
-  const double f = -reduced_field(q, Ms, Hi, A)*(Ms*Mz*(1.0+reduced_field(q, Ms, Hi, A))*DMI_length(Ms, D,y)+Hky*reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,z))/(1.0+reduced_field(q, Ms, Hi, A)*(x*x+y*y)/q/q -square(reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,z)));
+  const double x=qvec[0], y=qvec[1], z=qvec[2];
+  const double q=MAG_VEC(qvec);
+  const double f = -rf*(Ms*Mz*(1.0+rf)*DMI_length(Ms, D,y)+Hky*rf*DMI_length(Ms, D,z))/(1.0+rf*(x*x+y*y)/q/q -square(rf*DMI_length(Ms, D,z)));
   return f;
 }
 
-static double fqMyreal( double x, double y, double z, double Mz, double Hkx, double Hky, double Hi, double Ms, double A, double D)
+static double fqMyreal(double *qvec, double rf, double Mz, double Hkx, double Hky, double Ms, double D)
 {
-  const double q=MAG_VEC(x, y, z);  
-  const double f = reduced_field(q, Ms, Hi, A)*(Hky*(1.0+reduced_field(q, Ms, Hi, A)*x*x/q/q)-Ms*Mz*y*z/q/q*(1.0+reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,q)*DMI_length(Ms, D,q))-Hkx*reduced_field(q, Ms, Hi, A)*x*y/q/q)/(1.0+reduced_field(q, Ms, Hi, A)*(x*x+y*y)/q/q -square(reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,z)));
+  const double x=qvec[0], y=qvec[1], z=qvec[2];
+  const double q=MAG_VEC(qvec);
+  const double dmi_q=DMI_length(Ms, D, q);
+  const double f = rf*(Hky*(1.0+rf*x*x/q/q)-Ms*Mz*y*z/q/q*(1.0+rf*dmi_q*dmi_q)-Hkx*rf*x*y/q/q)/(1.0+rf*(x*x+y*y)/q/q -square(rf*DMI_length(Ms, D,z)));
   return f;
 }
 
-static double fqMyimag( double x, double y, double z, double Mz, double Hkx, double Hky, double Hi, double Ms, double A, double D)
+static double fqMyimag(double *qvec, double rf, double Mz, double Hkx, double Hky, double Ms, double D)
 {
-  const double q=MAG_VEC(x, y, z);  
-  const double f = reduced_field(q, Ms, Hi, A)*(Ms*Mz*(1.0+reduced_field(q, Ms, Hi, A))*DMI_length(Ms, D,x)-Hkx*reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,z))/(1.0+reduced_field(q, Ms, Hi, A)*(x*x+y*y)/q/q -square(reduced_field(q, Ms, Hi, A)*DMI_length(Ms, D,z)));
+  const double x=qvec[0], y=qvec[1], z=qvec[2];
+  const double q=MAG_VEC(qvec);
+  const double f = rf*(Ms*Mz*(1.0+rf)*DMI_length(Ms, D,x)-Hkx*rf*DMI_length(Ms, D,z))/(1.0+rf*(x*x+y*y)/q/q -square(rf*DMI_length(Ms, D,z)));
   return f;
 }
 
+// Spin-resolved slds for one orientation of q and one anisotropy field (Hkx, Hky)
+static void
+micromagnetic_sld(double qrot[3], double rf, double mz, double nuc, double Hkx, double Hky, double Ms, double D, double sld[8])
+{
+  const double mxreal=fqMxreal(qrot, rf, mz, Hkx, Hky, Ms, D);
+  const double mximag=fqMximag(qrot, rf, mz, Hkx, Hky, Ms, D);
+  const double myreal=fqMyreal(qrot, rf, mz, Hkx, Hky, Ms, D);
+  const double myimag=fqMyimag(qrot, rf, mz, Hkx, Hky, Ms, D);
+  mag_sld(qrot[0], qrot[1], qrot[2], mxreal, mximag, myreal, myimag, mz, 0, nuc, sld);
+}
+
+// Cross sections summed over the random anisotropy axis with isotropic orientation
+// gamma, (Hkx, Hky) = hk (sin gamma, cos gamma), with gamma over 0 .. 2 pi.
+// To be modified for textured material see also Weissmueller et al. PRB 63, 214414 (2001).
+// The magnetisation is affine in (Hkx, Hky) and mag_sld is linear in it, so each sld is
+// s0 + s1 sin(gamma) + s2 cos(gamma); the integral of its square over gamma in
+// Gauss units (the sum of GAUSS_W is 2) is 2 s0^2 + s1^2 + s2^2, which replaces the
+// GAUSS_N point loop over gamma by three evaluations.
+static double
+gamma_averaged_form(double qrot[3], const double weights[8], double rf, double mz, double nuc, double hk, double Ms, double D)
+{
+  double sld0[8], sldx[8], sldy[8];
+  //Only the core of the defect/particle in the matrix has an effective
+  //anisotropy (for simplicity), for the effect of different, more complex
+  //spatial profile of the anisotropy see Michels PRB 82, 024433 (2010).
+  micromagnetic_sld(qrot, rf, mz, nuc, 0.0, 0.0, Ms, D, sld0);
+  micromagnetic_sld(qrot, rf, mz, nuc, hk, 0.0, Ms, D, sldx);
+  micromagnetic_sld(qrot, rf, mz, nuc, 0.0, hk, Ms, D, sldy);
+
+  double form = 0.0;
+  for (unsigned int xs=0; xs<8; xs++) {
+    if (weights[xs] > 1.0e-8) {
+      // Since the cross section weight is significant, add the squared
+      // effective sld for this cross section according to weight.
+      // loop over uu, ud real, du real, dd, ud imag, du imag
+      const double s1 = sldx[xs] - sld0[xs];
+      const double s2 = sldy[xs] - sld0[xs];
+      form += weights[xs]*(2.0*sld0[xs]*sld0[xs] + s1*s1 + s2*s2);
+    }
+  }
+  return form;
+}
+
 //calculate 2D from _fq
 static double
 Iqxy(double qx, double qy, double radius, double thickness,double core_nuc, double shell_nuc, double solvent_nuc, double core_Ms, double shell_Ms, double solvent_Ms, double core_hk,  double Hi, double Ms, double A, double D,  double up_i, double up_f, double alpha, double beta)
 {
-  const double q=MAG_VEC(qx, qy, 0);    
+  double qvec[3];
+  SET_VEC(qvec, qx, qy, 0);
+  const double q=MAG_VEC(qvec);
   if (q > 1.0e-16 ) {
     const double cos_theta=qx/q;
     const double sin_theta=qy/q;
@@ -94,51 +147,33 @@ Iqxy(double qx, double qy, double radius, double thickness,double core_nuc, doub
     // 0=dd.real, 1=dd.imag, 2=uu.real, 3=uu.imag,  4=du.real, 6=du.imag,  7=ud.real, 5=ud.imag
     double weights[8];
     set_weights(up_i, up_f, weights);
-   
-    double mz=fq(q, radius, thickness, core_Ms, shell_Ms, solvent_Ms);
-    double nuc=fq(q, radius, thickness, core_nuc, shell_nuc, solvent_nuc);
-
-    double cos_gamma, sin_gamma;
-    double sld[8];
-    //loop over random anisotropy axis with isotropic orientation gamma for Hkx and Hky
-    //To be modified for textured material see also Weissmueller et al. PRB 63, 214414 (2001)
-    double total_F2 = 0.0;
-    for (int i=0; i<GAUSS_N ;i++) {
-      const double gamma = M_PI * (GAUSS_Z[i] + 1.0); // 0 .. 2 pi
-      SINCOS(gamma, sin_gamma, cos_gamma);	
-      //Only the core of the defect/particle in the matrix has an effective
-      //anisotropy (for simplicity), for the effect of different, more complex
-      // spatial profile of the anisotropy see Michels PRB 82, 024433 (2010)
-      double Hkx= fq(q, radius, thickness, core_hk, 0, 0)*sin_gamma;
-      double Hky= fq(q, radius, thickness, core_hk, 0, 0)*cos_gamma;
-
-      double mxreal=fqMxreal(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-      double mximag=fqMximag(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-      double myreal=fqMyreal(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-      double myimag=fqMyimag(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-
-      mag_sld(qrot[0], qrot[1], qrot[2], mxreal, mximag, myreal, myimag, mz, 0, nuc, sld);
-      double form = 0.0;
-      for (unsigned int xs=0; xs<8; xs++) {
-        if (weights[xs] > 1.0e-8) {
-          // Since the cross section weight is significant, set the slds
-          // to the effective slds for this cross section, call the
-          // kernel, and add according to weight.
-          // loop over uu, ud real, du real, dd, ud imag, du imag 
-          form += weights[xs]*sld[xs]*sld[xs];
-        }
-      }
-      total_F2 += GAUSS_W[i] * form ;
-    }
+
+    const double mz=fq(q, radius, thickness, core_Ms, shell_Ms, solvent_Ms);
+    const double nuc=fq(q, radius, thickness, core_nuc, shell_nuc, solvent_nuc);
+    const double hk=fq(q, radius, thickness, core_hk, 0, 0);
+    const double rf=reduced_field(q, Ms, Hi, A);
+
+    const double total_F2 = gamma_averaged_form(qrot, weights, rf, mz, nuc, hk, Ms, D);
     return 0.5*1.0e-4*total_F2;
-  }  
+  }
+  return 0.0;
 }
 
 static double
 Iq(double q, double radius, double thickness,double core_nuc, double shell_nuc, double solvent_nuc, double core_Ms, double shell_Ms, double solvent_Ms, double core_hk, double Hi, double Ms, double A, double D,  double up_i, double up_f, double alpha, double beta)
 {
+  // 0=dd.real, 1=dd.imag, 2=uu.real, 3=uu.imag,  4=du.real, 5=du.imag,  6=ud.real, 7=ud.imag
+  double weights[8];
+  set_weights(up_i, up_f, weights);
+
+  // Everything but the orientation of q on the detector depends only on |q|
+  const double mz=fq(q, radius, thickness, core_Ms, shell_Ms, solvent_Ms);
+  const double nuc=fq(q, radius, thickness, core_nuc, shell_nuc, solvent_nuc);
+  const double hk=fq(q, radius, thickness, core_hk, 0, 0);
+  const double rf=reduced_field(q, Ms, Hi, A);
+
   // slots to hold sincos function output of the orientation on the detector plane
-  double sin_theta, cos_theta; 
+  double sin_theta, cos_theta;
   double total_F1D = 0.0;
   for (int j=0; j<GAUSS_N ;j++) {
 
@@ -147,54 +182,10 @@ Iq(double q, double radius, double thickness,double core_nuc, double shell_nuc,
 
     double qrot[3];
     set_scatvec(qrot,q,cos_theta, sin_theta, alpha, beta);
-    // 0=dd.real, 1=dd.imag, 2=uu.real, 3=uu.imag,  4=du.real, 5=du.imag,  6=ud.real, 7=ud.imag
-    double weights[8];  
-    set_weights(up_i, up_f, weights);
-   
-    double mz=fq(q, radius, thickness, core_Ms, shell_Ms, solvent_Ms);
-    double nuc=fq(q, radius, thickness, core_nuc, shell_nuc, solvent_nuc);
-
-    double cos_gamma, sin_gamma;
-    double sld[8];
-
-    //loop over random anisotropy axis with isotropic orientation gamma for Hkx and Hky
-    //To be modified for textured material see also Weissmueller et al. PRB 63, 214414 (2001)
-    double total_F2 = 0.0;
-    for (int i=0; i<GAUSS_N ;i++) {
-      const double gamma = M_PI * (GAUSS_Z[i] + 1.0); // 0 .. 2 pi
-      SINCOS(gamma, sin_gamma, cos_gamma);	
-      //Only the core of the defect/particle in the matrix has an effective
-      //anisotropy (for simplicity), for the effect of different, more complex
-      //spatial profile of the anisotropy see Michels PRB 82, 024433 (2010).
-      double Hkx= fq(q, radius, thickness, core_hk, 0, 0)*sin_gamma;
-      double Hky= fq(q, radius, thickness, core_hk, 0, 0)*cos_gamma;
-
-      double mxreal=fqMxreal(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-      double mximag=fqMximag(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-      double myreal=fqMyreal(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-      double myimag=fqMyimag(qrot[0], qrot[1], qrot[2], mz, Hkx, Hky, Hi, Ms, A, D);
-
-      mag_sld(qrot[0], qrot[1], qrot[2], mxreal, mximag, myreal, myimag, mz, 0, nuc, sld);
-      double form = 0.0;
-      for (unsigned int xs=0; xs<8; xs++) {
-        if (weights[xs] > 1.0e-8 ) {
-          // Since the cross section weight is significant, set the slds
-          // to the effective slds for this cross section, call the
-          // kernel, and add according to weight.
-          // loop over uu, ud real, du real, dd, ud imag, du imag 
-          form += weights[xs]*sld[xs]*sld[xs];
-        }
-      }
-      total_F2 += GAUSS_W[i] * form ;
-    }
+
+    const double total_F2 = gamma_averaged_form(qrot, weights, rf, mz, nuc, hk, Ms, D);
     total_F1D += GAUSS_W[j] * total_F2 ;
   }
   //convert from [1e-12 A-1] to [cm-1]
   return 0.25*1.0e-4*total_F1D;
 }
-
-
-
-
-
-
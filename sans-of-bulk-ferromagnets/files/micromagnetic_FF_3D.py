@@ -68,7 +68,8 @@ simplicity, only the core has an effective anisotropy, that is varying randomly
 in direction from particle to particle. The effect of different, more complex 
 spatial profiles of the anisotropy can be seen in Michels PRB 82, 024433 (2010).
 The magnetic scattering length density (SLD) is defined as 
-$ho_{mathrm{mag}}=b_H M_S$, where $b_H= 2.91*10^{8}A^{-1}m^{-1}$ and $M_S$
+$
+ho_{mathrm{mag}}=b_H M_S$, where $b_H= 2.91*10^{8}A^{-1}m^{-1}$ and $M_S$
 is the saturation magnetisation (in $A/m$).
 
 The fraction of "upward" neutrons before ('up_frac_i') and after the sample 
@@ -161,7 +162,7 @@ parameters = [["radius", "Ang", 50., [0, inf], "volume", "Radius of the core"],
 
 
 
-source = ["lib/sas_3j1x_x.c", "lib/core_shell.c", "lib/gauss76.c", "magnetic_functions.c", "micromagnetic_FF_3D.c"]
+source = ["lib/sas_3j1x_x.c", "lib/core_shell.c", "lib/gauss76.c", "lib/magnetic_functions.c", "micromagnetic_FF_3D.c"]
 structure_factor = False
 have_Fq = False
 single=False
@@ -185,10 +186,7 @@ def random():
 
 
 
-# tests = [
-    # [{'radius': 20.0, 'thickness': 10.0}, 0.1, None, None, 30.0, 4.*pi/3*30**3, 1.0],
-
-    # # The SasView test result was 0.00169, with a background of 0.001
-    # [{'radius': 60.0, 'thickness': 10.0, 'sld_core': 1.0, 'sld_shell': 2.0,
-      # 'sld_solvent': 3.0, 'background': 0.0}, 0.4, 0.000698838],
-# ]
+tests = [
+    [{}, 1.002266990452620e-03, 7.461046163627724e+03],
+    [{}, (0.0688124, -0.0261013), 22.024],
+]
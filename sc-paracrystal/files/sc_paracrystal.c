@@ -44,36 +44,37 @@ Iq(double q, double dnn,
     double d_factor, double radius,
     double sld, double solvent_sld)
 {
-    // translate a point in [-1,1] to a point in [0, 2 pi]
-    const double phi_m = M_PI_4;
-    const double phi_b = M_PI_4;
-    // translate a point in [-1,1] to a point in [0, pi]
-    const double theta_m = M_PI_4;
-    const double theta_b = M_PI_4;
-
+    // sc_Zq is unchanged by permuting qa, qb, qc and by changing their signs,
+    // so the orientation average only needs the 1/48 of the sphere with
+    // qa >= qb >= qc >= 0: phi in [0, pi/4] and, with u = cos(theta) so the
+    // surface element is du dphi, u in [0, sin(phi)/sqrt(1 + sin(phi)^2)].
+    //
+    // The peaks of Z(q) get sharper as q dnn d_factor^2 gets smaller, so the
+    // number of points (at most 500 in phi, 76 in u) is chosen from that.
+    const double qr = 3.0/(q*dnn*square(d_factor));
+    constant double *w_phi, *z_phi, *w_u, *z_u;
+    const int n_u = gauss_weights(qr, ADAPTIVE_MAX_76, &w_u, &z_u);
+    const int n_phi = gauss_weights(qr, n_u, &w_phi, &z_phi);
 
     double outer_sum = 0.0;
-    for(int i=0; i<GAUSS_N; i++) {
+    for(int i=0; i<n_phi; i++) {
+        // translate a point in [-1,1] to a point in [0, pi/4]
+        const double phi = z_phi[i]*M_PI/8.0 + M_PI/8.0;
+        double sin_phi, cos_phi;
+        SINCOS(phi, sin_phi, cos_phi);
+        // translate a point in [-1,1] to a point in [0, u_max]
+        const double u_m = 0.5*sin_phi/sqrt(1.0 + sin_phi*sin_phi);
         double inner_sum = 0.0;
-        const double theta = GAUSS_Z[i]*theta_m + theta_b;
-        double sin_theta, cos_theta;
-        SINCOS(theta, sin_theta, cos_theta);
-        const double qc = q*cos_theta;
-        const double qab = q*sin_theta;
-        for(int j=0;j<GAUSS_N;j++) {
-            const double phi = GAUSS_Z[j]*phi_m + phi_b;
-            double sin_phi, cos_phi;
-            SINCOS(phi, sin_phi, cos_phi);
-            const double qa = qab*cos_phi;
-            const double qb = qab*sin_phi;
-            const double form = sc_Zq(qa, qb, qc, dnn, d_factor);
-            inner_sum += GAUSS_W[j] * form;
+        for(int j=0; j<n_u; j++) {
+            const double u = z_u[j]*u_m + u_m;
+            const double qab = q*sqrt(1.0 - u*u);
+            const double form = sc_Zq(qab*cos_phi, qab*sin_phi, q*u, dnn, d_factor);
+            inner_sum += w_u[j] * form;
         }
-        inner_sum *= phi_m;  // sum(f(x)dx) = sum(f(x)) dx
-        outer_sum += GAUSS_W[i] * inner_sum * sin_theta;
+        outer_sum += w_phi[i] * inner_sum * u_m;
     }
-    outer_sum *= theta_m;
-    const double Zq = outer_sum/M_PI_2;
+    // sum(w dphi du) = (pi/8) sum(w u_m w), divided by the wedge area pi/12
+    const double Zq = 1.5*outer_sum;
     const double Pq = sphere_form(q, radius, sld, solvent_sld);
 
     return sc_volume_fraction(radius, dnn) * Pq * Zq;
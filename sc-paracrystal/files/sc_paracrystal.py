@@ -116,9 +116,12 @@ positions correspond to (just the first 5)
 
   The calculation of $Z(q)$ is a double numerical integral that must be
   carried out with a high density of points to properly capture the sharp
-  peaks of the paracrystalline scattering. So be warned that the calculation
-  is slow. Fitting of any experimental data must be resolution smeared for
-  any meaningful fit. This makes a triple integral which may be very slow.
+  peaks of the paracrystalline scattering. Only the 1/48 of the orientations
+  that is unique under the lattice symmetry is integrated, with more points
+  where the peaks are sharpest (low $q$, small $d_{factor}$). Even so, be
+  warned that the calculation is slow. Fitting of any experimental data must
+  be resolution smeared for any meaningful fit. This makes a triple integral
+  which may be very slow.
   If a double-precision GPU with OpenCL support is available this may improve
   the speed of the calculation.
 
@@ -189,7 +192,7 @@ parameters = [["dnn",         "Ang",       220.0, [0.0, inf],  "",            "N
              ]
 # pylint: enable=bad-whitespace, line-too-long
 
-source = ["lib/sas_3j1x_x.c", "lib/sphere_form.c", "lib/gauss150.c", "sc_paracrystal.c"]
+source = ["lib/sas_3j1x_x.c", "lib/sphere_form.c", "lib/adaptive.c", "sc_paracrystal.c"]
 
 def random():
     """Return a random parameter set for the model."""
@@ -208,7 +211,10 @@ def random():
 
 tests = [
     # Accuracy tests based on content in test/utest_extra_models.py, 2d tests added April 10, 2017
-    [{}, 0.001, 10.3048],
+    # October 18, 2026 q=0.001 updated to an independent orientation average of Z(q)
+    # (Gauss-Legendre panels graded towards the peaks at the wedge edges, converged to
+    # 1e-9), which gives 10.34452; the old octant grid was 0.4% low here
+    [{}, 0.001, 10.34452],
     [{}, 0.215268, 0.00814889],
     [{}, 0.414467, 0.001313289],
     [{'theta': 10.0, 'phi': 20, 'psi': 30.0}, (0.045, -0.035), 18.0397138402],
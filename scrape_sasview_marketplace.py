@@ -5,29 +5,56 @@ and save outputs to subfolders named after each model.
 
 Usage:
     python scrape_sasview_marketplace.py --out ./sasview_marketplace_dump --delay 1.0
+    python scrape_sasview_marketplace.py --out ./sasview_marketplace_dump --delay 0.25 --workers 4
+    python scrape_sasview_marketplace.py --out ./sasview_marketplace_dump --verify
 
 What it does:
-- Crawls the All Models index (with pagination) to collect model URLs.
+- Crawls the All Models index (with pagination) to collect model URLs, fetching
+  each index page once; model pages are requested while later index pages load.
 - For each model:
   - Saves the full model page HTML to <out>/<model-slug>/model.html
   - Extracts a simple Markdown README from the description area to <out>/<model-slug>/README.md
   - Finds all file links in the "Files" section, opens each "View File" page,
     follows its "Download" link (raw file), and saves it to <out>/<model-slug>/files/<filename>
-- Polite scraping: identifies with a User-Agent, retries, and sleeps between requests.
+- Polite scraping: identifies with a User-Agent, retries, and rate-limits requests
+  to each host with a token bucket (one request per --delay seconds).
+- With --workers N, up to N requests are in flight at once: pages of different
+  models overlap and the files of one model are fetched in parallel. Results are
+  still written in discovery order, so the output tree is identical to --workers 1.
+- Incremental: <out>/manifest.json records the URL, ETag, Last-Modified, size and
+  SHA-256 of every artifact. Later runs send conditional GETs, keep unchanged files,
+  and skip models whose "All Models" listing entry is unchanged. --full refetches all.
+- Raw files stream into <file>.part and are renamed into place only when complete,
+  so an interrupted run never leaves a truncated file behind; the next run resumes
+  the .part with an HTTP Range request. --verify re-hashes the tree against the
+  manifest without touching the network.
+- With --blobs, file bodies are also kept once per SHA-256 in <out>/.blobs (or the
+  given directory) and the mirror's files become hardlinks to them; see blob_store.py.
 
 Tested against live structure as of 2025-09-30.
 """
 
 import argparse
+import hashlib
+import json
 import os
 import re
 import sys
+import threading
 import time
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+from blob_store import BLOB_DIR, BlobStore
 
 BASE_URL = "https://marketplace.sasview.org"
 ALL_MODELS_URL = f"{BASE_URL}/models/"
@@ -75,10 +102,322 @@ def make_session():
         pass
     return s
 
-def get_soup(session: requests.Session, url: str) -> BeautifulSoup:
-    r = session.get(url, timeout=30)
-    r.raise_for_status()
-    return BeautifulSoup(r.text, "html.parser")
+# --- Fetching -----------------------------------------------------------------
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second and banks at
+    most `burst` of them. A rate of 0 (or less) disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            # Reserve a token even if we have to wait for it; the balance may go
+            # negative so that concurrent callers queue up behind each other.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+class Fetcher:
+    """
+    Shared HTTP front end for all worker threads.
+
+    Every request goes through a per-host token bucket (the politeness limit)
+    and a semaphore that bounds the number of requests in flight. Sessions are
+    kept per thread since requests.Session is not documented as thread-safe.
+    """
+
+    def __init__(self, workers: int = 1, delay: float = 1.0, burst: int = 1, manifest: "Manifest | None" = None):
+        self.workers = max(1, workers)
+        self.manifest = manifest
+        self.rate = 1.0 / delay if delay > 0 else 0.0
+        self.burst = burst
+        self.requests = 0
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = make_session()
+        return s
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._lock:
+            self.requests += 1
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    @contextmanager
+    def request(self, url: str, **kwargs):
+        """GET `url`, holding a concurrency slot until the response is closed."""
+        bucket = self._bucket(url)
+        with self._slots:
+            bucket.acquire()
+            r = self.session.get(url, **kwargs)
+            try:
+                yield r
+            finally:
+                r.close()
+
+    def fetch(self, url: str, timeout: float = 30) -> "Fetched":
+        """
+        GET `url` in full. If the manifest holds an intact local copy, the request
+        is made conditional and a 304 answer returns the local bytes instead.
+        """
+        cached = self.manifest.local_copy(url) if self.manifest else None
+        headers = conditional_headers(cached[0]) if cached else {}
+        with self.request(url, timeout=timeout, headers=headers) as r:
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            if headers and r.status_code == 304:
+                entry, data = cached
+                self.manifest.count("validated", len(data))
+                return Fetched(url, data, "utf-8",
+                               etag or entry.get("etag"), last_modified or entry.get("last_modified"),
+                               validated=True)
+            r.raise_for_status()
+            content = r.content
+            encoding = r.encoding or r.apparent_encoding
+        if self.manifest:
+            self.manifest.count("fetched")
+        return Fetched(url, content, encoding, etag, last_modified)
+
+def conditional_headers(entry: dict) -> dict[str, str]:
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+@dataclass
+class Fetched:
+    url: str
+    content: bytes
+    encoding: str | None
+    etag: str | None = None
+    last_modified: str | None = None
+    validated: bool = False  # True when the server answered 304 Not Modified
+
+    @property
+    def text(self) -> str:
+        return str(self.content, self.encoding or "utf-8", errors="replace")
+
+# --- Manifest -----------------------------------------------------------------
+
+MANIFEST_NAME = "manifest.json"
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class Manifest:
+    """
+    Persistent record of the mirror, stored as <out>/manifest.json:
+
+    - "artifacts": URL -> {path, etag, last_modified, size, sha256} for every file
+      written (the README derived from a model page is keyed "<url>#readme").
+    - "models": model URL -> {slug, listing, artifacts}, where "listing" is a hash
+      of the model's row in the "All Models" index.
+    - "partials": URL -> {path, validator} for interrupted downloads, so that the
+      .part file can be resumed with a Range request guarded by If-Range.
+
+    With `full=True` the old record is still loaded (so it can be rewritten), but
+    is never used to validate or skip anything. With a `blobs` store, every recorded
+    file is also stored there by SHA-256 and replaced with a hardlink to its blob.
+    """
+
+    def __init__(self, out_root: Path, full: bool = False, blobs: BlobStore | None = None):
+        self.root = out_root
+        self.path = out_root / MANIFEST_NAME
+        self.full = full
+        self.blobs = blobs
+        self.artifacts = {}
+        self.models = {}
+        self.partials = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.artifacts = data.get("artifacts", {})
+            self.models = data.get("models", {})
+            self.partials = data.get("partials", {})
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, what: str, nbytes: int = 0):
+        with self._lock:
+            self.stats[what] += 1
+            if nbytes:
+                self.stats["bytes_saved"] += nbytes
+
+    def local_copy(self, key: str) -> tuple[dict, bytes] | None:
+        """Return (entry, bytes) if the file recorded for `key` is on disk unchanged."""
+        if self.full:
+            return None
+        entry = self.artifacts.get(key)
+        if not entry:
+            return None
+        try:
+            data = (self.root / entry["path"]).read_bytes()
+        except OSError:
+            return None
+        if len(data) != entry["size"] or sha256_hex(data) != entry["sha256"]:
+            return None
+        return entry, data
+
+    def record(self, key: str, dest: Path, size: int, sha256: str,
+               etag: str | None = None, last_modified: str | None = None):
+        entry = {
+            "path": dest.relative_to(self.root).as_posix(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": size,
+            "sha256": sha256,
+        }
+        with self._lock:
+            self.artifacts[key] = entry
+        if self.blobs and self.blobs.adopt(dest, sha256)[1]:
+            self.count("new_blob")
+
+    def partial_validator(self, url: str, part: Path) -> str | None:
+        """The If-Range validator of an interrupted download of `url` into `part`."""
+        with self._lock:
+            rec = self.partials.get(url)
+        if rec and rec["path"] == part.relative_to(self.root).as_posix():
+            return rec["validator"]
+        return None
+
+    def set_partial(self, url: str, part: Path, validator: str | None):
+        with self._lock:
+            if validator:
+                self.partials[url] = {"path": part.relative_to(self.root).as_posix(), "validator": validator}
+            else:
+                self.partials.pop(url, None)
+
+    def record_model(self, url: str, slug: str, listing: str | None, keys: list[str]):
+        with self._lock:
+            self.models[url] = {"slug": slug, "listing": listing, "artifacts": keys}
+
+    def unchanged_model(self, url: str, listing: str | None) -> bool:
+        """
+        True if `url` can be skipped outright: its listing entry is unchanged since
+        the last complete scrape and all of its files are still in place.
+        """
+        if self.full or listing is None:
+            return False
+        rec = self.models.get(url)
+        if not rec or rec.get("listing") != listing:
+            return False
+        # Models sharing a directory overwrite each other; always redo those so
+        # the last one in discovery order still wins.
+        if sum(1 for other in self.models.values() if other.get("slug") == rec["slug"]) > 1:
+            return False
+        for key in rec["artifacts"]:
+            entry = self.artifacts.get(key)
+            if not entry:
+                return False
+            try:
+                if (self.root / entry["path"]).stat().st_size != entry["size"]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def skip_model(self, url: str):
+        for key in self.models[url]["artifacts"]:
+            if key != readme_key(url):
+                self.count("skipped", self.artifacts[key]["size"])
+
+    def save(self):
+        data = {"version": 1, "artifacts": self.artifacts, "models": self.models, "partials": self.partials}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        s = self.stats
+        text = (f"{s['fetched']} artifact(s) fetched, {s['validated']} validated (not modified), "
+                f"{s['skipped']} skipped; {s['bytes_saved']} byte(s) not downloaded")
+        if self.blobs:
+            text += f"; {s['new_blob']} new blob(s) stored"
+        return text
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def verify_mirror(manifest: Manifest) -> int:
+    """
+    Re-hash every artifact in the manifest against the tree on disk, without any
+    network access. Print each problem and return how many there were.
+    """
+    problems = 0
+    paths = {}
+    for key, entry in manifest.artifacts.items():
+        paths.setdefault(entry["path"], []).append(entry)
+    for rel in sorted(paths):
+        p = manifest.root / rel
+        if not p.is_file():
+            print(f"[MISSING] {rel}")
+            problems += 1
+            continue
+        size, sha = p.stat().st_size, None
+        # Colliding models may have recorded the same path; any recorded copy is valid
+        for entry in paths[rel]:
+            if entry["size"] == size:
+                sha = sha or file_sha256(p)
+                if entry["sha256"] == sha:
+                    break
+        else:
+            print(f"[CORRUPT] {rel}")
+            problems += 1
+    print(f"[i] Verified {len(paths)} file(s): {len(paths) - problems} OK, {problems} problem(s).")
+    return problems
+
+def write_if_changed(dest: Path, data: bytes):
+    """
+    Write `data` to `dest` unless it already holds exactly those bytes. The file is
+    replaced rather than rewritten in place, since it may be a hardlink to a blob.
+    """
+    try:
+        if dest.stat().st_size == len(data) and dest.read_bytes() == data:
+            return
+    except OSError:
+        pass
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, dest)
+
+# --- Fetch helpers ------------------------------------------------------------
+
+def ordered_map(pool: ThreadPoolExecutor | None, fn, items):
+    """Like map(), but runs on `pool` when given. Results keep input order."""
+    return map(fn, items) if pool is None else pool.map(fn, items)
+
+def get_soup(fetcher: Fetcher, url: str, only: tuple[str, ...] | None = None) -> BeautifulSoup:
+    with fetcher.request(url, timeout=30) as r:
+        r.raise_for_status()
+        text = r.text
+    return parse_html(text, only)
 
 def text_content(el) -> str:
     # Simple text extraction that keeps headings and paragraphs separate-ish
@@ -94,144 +433,280 @@ def text_content(el) -> str:
     md = re.sub(r"\n{3,}", "\n\n", md)
     return md.strip()
 
-# --- Discovery ----------------------------------------------------------------
+# --- HTML parsing -------------------------------------------------------------
 
-def discover_all_model_links(session: requests.Session, delay: float) -> list[str]:
-    """
-    Walk the All Models index, following pagination, return list of model page URLs.
-    """
-    model_urls = set()
-    page = 1
-    while True:
-        url = ALL_MODELS_URL if page == 1 else f"{ALL_MODELS_URL}?page={page}"
-        soup = get_soup(session, url)
-        # On index/category pages, model links appear as anchors before the table columns
-        # We’ll heuristically accept links that look like /models/<slug-or-id>/
-        for a in soup.select("a[href]"):
-            href = a.get("href")
-            if not href:
-                continue
-            full = urljoin(BASE_URL, href)
-            # Match /models/slug/ or /models/<id>/
-            if re.search(r"/models/[^/]+/?$", urlparse(full).path) and not full.rstrip("/").endswith("/models"):
-                model_urls.add(full.rstrip("/") + "/")
-        # Try to detect "Page N of M" or presence of a "next" page
-        page_text = soup.get_text(" ", strip=True)
-        # The category page shows "Page 1 of 2" etc; stop when next page yields no new links
-        prev_count = len(model_urls)
-        # Heuristic: if the page has a "Page X of Y" and X >= Y, break; else try next page.
-        m = re.search(r"Page\s+(\d+)\s+of\s+(\d+)", page_text, flags=re.I)
-        if m:
-            cur, total = int(m.group(1)), int(m.group(2))
-            if cur >= total:
-                break
-        else:
-            # If no pager text, stop when requesting a higher page returns no new links.
-            # We will probe one extra page; if no new links, break.
-            pass
-        page += 1
-        time.sleep(delay)
-        # Safety: stop if too many pages
-        if page > 100:
-            break
-        # If the next page has no new links, break.
-        if page > 2:
-            # lightweight probe
-            probe_url = f"{ALL_MODELS_URL}?page={page}"
-            try:
-                soup_probe = get_soup(session, probe_url)
-                new_links = 0
-                for a in soup_probe.select("a[href]"):
-                    href = a.get("href")
-                    if not href:
-                        continue
-                    full = urljoin(BASE_URL, href)
-                    if re.search(r"/models/[^/]+/?$", urlparse(full).path) and not full.rstrip("/").endswith("/models"):
-                        if (full.rstrip("/") + "/") not in model_urls:
-                            new_links += 1
-                if new_links == 0:
-                    break
-            except requests.RequestException:
-                break
-            # consume this page properly
-            for a in soup_probe.select("a[href]"):
-                href = a.get("href")
-                if not href:
-                    continue
-                full = urljoin(BASE_URL, href)
-                if re.search(r"/models/[^/]+/?$", urlparse(full).path) and not full.rstrip("/").endswith("/models"):
-                    model_urls.add(full.rstrip("/") + "/")
-            page += 1
-            time.sleep(delay)
-            if page > 100:
-                break
+# Pages we only read (index pages, pages revalidated with a 304) are parsed with
+# the fastest installed tree builder, restricted to the tags we look at. Pages we
+# save are serialized from a full html.parser tree, as they always have been, so
+# the mirror stays byte-stable whichever backend is installed.
+SAVE_PARSER = "html.parser"
+PARSER = "lxml" if builder_registry.lookup("lxml") else SAVE_PARSER
 
-    return sorted(model_urls)
+INDEX_TAGS = ("a", "tr", "span")  # links, listing rows, the "Page X of Y" pager
+MODEL_TAGS = ("a", "h1")
+VIEWFILE_TAGS = ("a",)
 
-# --- Per-model scraping --------------------------------------------------------
+# Model links look like /models/<slug-or-id>/
+MODEL_PATH_RE = re.compile(r"/models/[^/]+/?$")
 
-def find_files_on_model_page(soup: BeautifulSoup) -> list[str]:
+def parse_html(text: str, only: tuple[str, ...] | None = None) -> BeautifulSoup:
+    """Parse with the PARSER backend, keeping only the `only` tags if given."""
+    return BeautifulSoup(text, PARSER, parse_only=SoupStrainer(list(only)) if only else None)
+
+def listing_fingerprint(a) -> str | None:
+    """
+    Hash of the index-table row holding anchor `a` (name, summary, category, date,
+    author...), or None for links outside a row, e.g. the category sidebar.
+    """
+    row = a.find_parent("tr")
+    if row is None:
+        return None
+    return sha256_hex(row.get_text(" ", strip=True).encode("utf-8"))
+
+@dataclass
+class PageLinks:
+    models: dict[str, str | None]  # model URL -> listing fingerprint, in page order
+    uploads: list[str]             # "View File" pages, deduped, in page order
+    download: str | None           # raw file link of a "View File" page
+
+def extract_links(soup: BeautifulSoup) -> PageLinks:
     """
-    Return URLs of the 'Files' anchors on a model page. These are "View File" pages
-    which usually contain a 'Download' link to the raw file.
+    Classify every anchor of a page in a single pass: model links (with their
+    listing fingerprint), /uploads/ links, and the raw download link (the anchor
+    reading "Download", else the first link under /uploads/uploaded_models/).
     """
-    file_urls = []
-    # The "Files" list often appears as anchors near text "Files"
-    # We’ll find anchors whose href path starts with /uploads/
-    for a in soup.select("a[href]"):
-        href = a.get("href")
+    models = {}
+    uploads = []
+    download = fallback = None
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
         if not href:
             continue
         full = urljoin(BASE_URL, href)
         path = urlparse(full).path
         if path.startswith("/uploads/"):
-            file_urls.append(full)
-    return list(dict.fromkeys(file_urls))  # dedupe, preserve order
+            uploads.append(full)
+        elif MODEL_PATH_RE.search(path) and not full.rstrip("/").endswith("/models"):
+            url = full.rstrip("/") + "/"
+            fingerprint = listing_fingerprint(a)
+            # A row entry beats a bare link (sidebar, breadcrumbs) to the same page
+            if fingerprint is not None or url not in models:
+                models[url] = fingerprint
+        if download is None and a.get_text(strip=True).lower() == "download":
+            download = full
+        if fallback is None and "/uploads/uploaded_models/" in href:
+            fallback = full
+    return PageLinks(models, list(dict.fromkeys(uploads)), download or fallback)
 
-def find_download_link_on_viewfile_page(soup: BeautifulSoup) -> str | None:
+# --- Discovery ----------------------------------------------------------------
+
+PAGER_RE = re.compile(r"Page\s+(\d+)\s+of\s+(\d+)", flags=re.I)
+
+def parse_listing_page(soup: BeautifulSoup) -> tuple[dict[str, str | None], int | None]:
+    """
+    Return the model URLs of an index page (in page order) mapped to their
+    listing fingerprint, and the total page count from the "Page X of Y" pager,
+    if there is one.
     """
-    Inside a /uploads/<id> "View File" page, there is usually a 'Download' link
-    pointing at /uploads/uploaded_models/<filename>.
+    links = extract_links(soup).models
+    pager = soup.find(string=PAGER_RE)
+    m = PAGER_RE.search(pager if pager else soup.get_text(" ", strip=True))
+    return links, int(m.group(2)) if m else None
+
+def discover_all_model_links(fetcher: Fetcher):
+    """
+    Walk the All Models index and yield (model URL, listing fingerprint) pairs as
+    soon as each index page is parsed, so scraping can start before discovery
+    ends. Every index page is fetched exactly once: the page count comes from
+    the "Page X of Y" pager on the first page, and the remaining pages are then
+    fetched concurrently (but yielded in page order). Without a pager, pages are
+    walked one by one until one adds no new links.
     """
-    for a in soup.select("a[href]"):
-        if a.get_text(strip=True).lower() == "download":
-            href = a.get("href")
-            if href:
-                return urljoin(BASE_URL, href)
-    # Fallback: look for links under /uploads/uploaded_models/
-    for a in soup.select("a[href]"):
-        href = a.get("href") or ""
-        if "/uploads/uploaded_models/" in href:
-            return urljoin(BASE_URL, href)
-    return None
+    seen = set()
+    requests_made = pages_parsed = 0
+
+    def load(page: int) -> tuple[dict[str, str | None], int | None] | None:
+        nonlocal requests_made, pages_parsed
+        url = ALL_MODELS_URL if page == 1 else f"{ALL_MODELS_URL}?page={page}"
+        requests_made += 1
+        try:
+            soup = get_soup(fetcher, url, INDEX_TAGS)
+        except requests.RequestException as e:
+            if page == 1:
+                raise
+            print(f"[WARN] Failed to fetch index page {page}: {e}", file=sys.stderr)
+            return None
+        pages_parsed += 1
+        return parse_listing_page(soup)
+
+    def fresh(links: dict[str, str | None]):
+        for url, fingerprint in links.items():
+            if url not in seen:
+                seen.add(url)
+                yield url, fingerprint
+
+    first, total = load(1)
+    if total is not None:
+        pool = ThreadPoolExecutor(fetcher.workers, thread_name_prefix="index") if fetcher.workers > 1 else None
+        try:
+            # Executor.map submits every page right away, before we yield anything
+            rest = ordered_map(pool, load, range(2, total + 1))
+            yield from fresh(first)
+            for result in rest:
+                if result is not None:
+                    yield from fresh(result[0])
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+    else:
+        page, links = 1, first
+        while True:
+            before = len(seen)
+            yield from fresh(links)
+            if len(seen) == before:
+                break
+            page += 1
+            result = load(page)
+            if result is None:
+                break
+            links = result[0]
+
+    print(f"[i] Discovery: {requests_made} index request(s), {pages_parsed} page(s) parsed, "
+          f"{len(seen)} model link(s).")
+
+# --- Per-model scraping --------------------------------------------------------
 
 def guess_filename_from_url(u: str) -> str:
     path = urlparse(u).path
     name = os.path.basename(path)
     return clean_filename(name) or "file.bin"
 
-def save_binary(session: requests.Session, url: str, dest: Path):
-    r = session.get(url, timeout=60, stream=True)
-    r.raise_for_status()
-    with open(dest, "wb") as f:
-        for chunk in r.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
-
-def scrape_model(session: requests.Session, model_url: str, out_root: Path, delay: float):
-    soup = get_soup(session, model_url)
-    # Title
-    h1 = soup.find("h1")
-    title = h1.get_text(strip=True) if h1 else urlparse(model_url).path.rstrip("/").split("/")[-1]
-    slug = slugify(title)
-    model_dir = out_root / slug
-    files_dir = model_dir / "files"
-    ensure_dir(files_dir)
-
-    # Save full page HTML
-    (model_dir / "model.url.txt").write_text(model_url, encoding="utf-8")
-    (model_dir / "model.html").write_text(str(soup), encoding="utf-8")
-
+@dataclass
+class Download:
+    url: str
+    dest: Path
+    size: int
+    sha256: str
+    etag: str | None = None
+    last_modified: str | None = None
+    part: Path | None = None     # complete download, waiting to be renamed onto dest
+    data: bytes | None = None    # the intact local copy, when the server answered 304
+
+    @property
+    def validated(self) -> bool:
+        return self.part is None
+
+def chunk_size_for(length: int) -> int:
+    """Stream in ~16 chunks, but never below 8 KiB or above 1 MiB per chunk."""
+    return min(1 << 20, max(8192, length // 16))
+
+def content_range_start(r: requests.Response) -> int | None:
+    m = re.match(r"bytes\s+(\d+)-", r.headers.get("Content-Range", ""))
+    return int(m.group(1)) if m else None
+
+def save_binary(fetcher: Fetcher, url: str, dest: Path, attempts: int = 3) -> Download:
+    """
+    Stream `url` into <dest>.part, hashing it on the way, and return the finished
+    Download; renaming the .part onto `dest` is left to the caller (write_model),
+    which commits models in order. A .part left by a failed transfer -- in this
+    run or an earlier one -- is resumed with a Range request, guarded by If-Range
+    so that a file changed on the server is fetched again from the start.
+    """
+    manifest = fetcher.manifest
+    part = dest.with_name(dest.name + ".part")
+    cached = manifest.local_copy(url) if manifest else None
+    for attempt in range(attempts):
+        have = part.stat().st_size if part.exists() else 0
+        validator = manifest.partial_validator(url, part) if manifest and have else None
+        headers = conditional_headers(cached[0]) if cached else {}
+        if validator:
+            headers["Range"] = f"bytes={have}-"
+            headers["If-Range"] = validator
+        try:
+            with fetcher.request(url, timeout=60, stream=True, headers=headers) as r:
+                etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+                if cached and r.status_code == 304:
+                    entry, data = cached
+                    part.unlink(missing_ok=True)
+                    manifest.set_partial(url, part, None)
+                    manifest.count("validated", len(data))
+                    return Download(url, dest, len(data), entry["sha256"],
+                                    etag or entry.get("etag"), last_modified or entry.get("last_modified"),
+                                    data=data)
+                if r.status_code == 416:
+                    # The .part is complete or stale; throw it away and start over
+                    part.unlink(missing_ok=True)
+                    if manifest:
+                        manifest.set_partial(url, part, None)
+                    continue
+                r.raise_for_status()
+
+                resume = bool(validator) and r.status_code == 206 and content_range_start(r) == have
+                h = hashlib.sha256()
+                if resume:
+                    with open(part, "rb") as f:
+                        for chunk in iter(lambda: f.read(1 << 20), b""):
+                            h.update(chunk)
+                else:
+                    have = 0
+                    # Only strong validators can guard a Range request
+                    strong = etag if etag and not etag.startswith("W/") else None
+                    if manifest:
+                        manifest.set_partial(url, part, strong or last_modified)
+                size = have
+                length = int(r.headers.get("Content-Length") or 0)
+                with open(part, "ab" if resume else "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size_for(length)):
+                        if chunk:
+                            f.write(chunk)
+                            h.update(chunk)
+                            size += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Covers a body cut off mid-stream; the .part is kept for the next attempt
+            if attempt + 1 == attempts:
+                raise
+            print(f"[WARN] Download of {url} interrupted ({e}); resuming", file=sys.stderr)
+            continue
+        if manifest:
+            manifest.count("fetched")
+        return Download(url, dest, size, h.hexdigest(), etag, last_modified, part=part)
+    raise requests.RequestException(f"Could not download {url} after {attempts} attempt(s)")
+
+def commit_download(dl: Download):
+    """Atomically move a finished download into place, unless dest already holds it."""
+    if dl.validated:
+        write_if_changed(dl.dest, dl.data)
+        return
+    if dl.dest.exists() and dl.dest.stat().st_size == dl.size and file_sha256(dl.dest) == dl.sha256:
+        dl.part.unlink()
+    else:
+        os.replace(dl.part, dl.dest)
+
+@dataclass
+class ViewFile:
+    url: str
+    page: Fetched | None = None
+    html: str | None = None
+    raw: Download | None = None
+    error: Exception | None = None
+
+@dataclass
+class ModelPage:
+    url: str
+    title: str
+    slug: str
+    page: Fetched
+    html: str
+    readme: str
+    viewfiles: list[ViewFile] = field(default_factory=list)
+
+def readme_from_soup(soup: BeautifulSoup, title: str, model_url: str) -> str:
+    """
+    Build README.md text from the page's Description block. Note that this
+    extracts the description nodes from `soup`.
+    """
     # Simple README from Description block if present
     # Heuristic: description often sits under an h2 with "Description"
     desc_block = None
@@ -251,72 +726,241 @@ def scrape_model(session: requests.Session, model_url: str, out_root: Path, dela
                 desc_block = wrapper.div
             break
     if not desc_block:
-        # Fallback to the main content area (page body minus nav)
-        main = soup
-        readme_md = f"# {title}\n\nSource: {model_url}\n"
+        return f"# {title}\n\nSource: {model_url}\n"
+    return f"# {title}\n\n" + text_content(desc_block) + f"\n\nSource: {model_url}\n"
+
+def readme_key(model_url: str) -> str:
+    return model_url + "#readme"
+
+def fetch_viewfile(fetcher: Fetcher, vf_url: str, files_dir: Path) -> ViewFile:
+    vf = ViewFile(vf_url)
+    try:
+        vf.page = fetcher.fetch(vf_url)
+        if vf.page.validated:
+            # A 304 hands back the bytes we saved last time: keep them verbatim
+            # and only skim them for the download link
+            vf.html = vf.page.text
+            vf_soup = parse_html(vf.html, VIEWFILE_TAGS)
+        else:
+            vf_soup = BeautifulSoup(vf.page.text, SAVE_PARSER)
+            vf.html = str(vf_soup)
+        # Find the raw download link
+        raw_url = extract_links(vf_soup).download
+        if raw_url:
+            ensure_dir(files_dir)
+            vf.raw = save_binary(fetcher, raw_url, files_dir / guess_filename_from_url(raw_url))
+    except requests.RequestException as e:
+        vf.error = e
+    return vf
+
+def fetch_model(fetcher: Fetcher, model_url: str, out_root: Path,
+                file_pool: ThreadPoolExecutor | None = None) -> ModelPage:
+    """
+    Download a model page and everything it links to. Nothing in the mirror is
+    changed yet: pages are kept in memory and raw files are left as .part files
+    for write_model() to commit. The "View File" pages (and their raw downloads)
+    run on `file_pool` if given.
+    """
+    page = fetcher.fetch(model_url)
+    readme_md = None
+    if page.validated:
+        # A 304 hands back the bytes we saved last time: keep them (and the README
+        # made from them) verbatim, and only skim the page for its title and links
+        html = page.text
+        soup = parse_html(html, MODEL_TAGS)
+        cached = fetcher.manifest.local_copy(readme_key(model_url))
+        if cached:
+            readme_md = cached[1].decode("utf-8")
     else:
-        readme_md = f"# {title}\n\n" + text_content(desc_block) + f"\n\nSource: {model_url}\n"
-    (model_dir / "README.md").write_text(readme_md, encoding="utf-8")
+        soup = BeautifulSoup(page.text, SAVE_PARSER)
+        # Full page HTML, captured before the README extraction takes the description out
+        html = str(soup)
+
+    # Title
+    h1 = soup.find("h1")
+    title = h1.get_text(strip=True) if h1 else urlparse(model_url).path.rstrip("/").split("/")[-1]
 
     # Collect file "View File" pages
-    viewfile_urls = find_files_on_model_page(soup)
+    viewfile_urls = extract_links(soup).uploads
+
+    if readme_md is None:
+        full = BeautifulSoup(page.text, SAVE_PARSER) if page.validated else soup
+        readme_md = readme_from_soup(full, title, model_url)
+
+    slug = slugify(title)
+    files_dir = out_root / slug / "files"
+    viewfiles = list(ordered_map(file_pool, lambda u: fetch_viewfile(fetcher, u, files_dir), viewfile_urls))
+
+    return ModelPage(model_url, title, slug, page, html, readme_md, viewfiles)
+
+def write_model(page: ModelPage, out_root: Path, manifest: Manifest | None = None, listing: str | None = None):
+    """
+    Write a fetched model to <out_root>/<slug>/. Models must be written in
+    discovery order: slugs can collide (e.g. the "Cylinder" model and the
+    cylinder category page), and the last one written wins.
+    """
+    model_dir = out_root / page.slug
+    files_dir = model_dir / "files"
+    ensure_dir(files_dir)
+
+    keys = []
+    def save(key: str, dest: Path, data: bytes, fetched: Fetched | None = None):
+        write_if_changed(dest, data)
+        if manifest:
+            manifest.record(key, dest, len(data), sha256_hex(data),
+                            fetched and fetched.etag, fetched and fetched.last_modified)
+            keys.append(key)
+
+    write_if_changed(model_dir / "model.url.txt", page.url.encode("utf-8"))
+    save(page.url, model_dir / "model.html", page.html.encode("utf-8"), page.page)
+    save(readme_key(page.url), model_dir / "README.md", page.readme.encode("utf-8"))
 
     downloaded = 0
-    for vf_url in viewfile_urls:
-        try:
-            vf_soup = get_soup(session, vf_url)
+    failed = False
+    for vf in page.viewfiles:
+        if vf.html is not None:
             # Save the View File HTML too (useful extra docs)
-            vf_id = urlparse(vf_url).path.rstrip("/").split("/")[-1]
-            (model_dir / f"viewfile_{vf_id}.html").write_text(str(vf_soup), encoding="utf-8")
-            # Find the raw download link
-            raw_url = find_download_link_on_viewfile_page(vf_soup)
-            if raw_url:
-                fname = guess_filename_from_url(raw_url)
-                dest = files_dir / fname
-                save_binary(session, raw_url, dest)
-                downloaded += 1
-            time.sleep(delay)
-        except requests.RequestException as e:
-            print(f"[WARN] Failed to fetch {vf_url}: {e}", file=sys.stderr)
+            vf_id = urlparse(vf.url).path.rstrip("/").split("/")[-1]
+            save(vf.url, model_dir / f"viewfile_{vf_id}.html", vf.html.encode("utf-8"), vf.page)
+        if vf.error is not None:
+            print(f"[WARN] Failed to fetch {vf.url}: {vf.error}", file=sys.stderr)
+            failed = True
+        elif vf.raw is not None:
+            commit_download(vf.raw)
+            if manifest:
+                manifest.record(vf.raw.url, vf.raw.dest, vf.raw.size, vf.raw.sha256,
+                                vf.raw.etag, vf.raw.last_modified)
+                manifest.set_partial(vf.raw.url, vf.raw.part or vf.raw.dest, None)
+                keys.append(vf.raw.url)
+            downloaded += 1
+
+    if manifest:
+        # Without the listing fingerprint, an incomplete model is never skipped next time
+        manifest.record_model(page.url, page.slug, None if failed else listing, keys)
+    print(f"[OK] {page.title}  -> {downloaded} file(s)")
+
+def scrape_model(fetcher: Fetcher, model_url: str, out_root: Path):
+    write_model(fetch_model(fetcher, model_url, out_root), out_root, fetcher.manifest)
+
+def scrape_models(fetcher: Fetcher, links: Iterable[tuple[str, str | None]], out_root: Path) -> int:
+    """
+    Scrape the models streamed by `links` (URL, listing fingerprint) with up to
+    `fetcher.workers` requests in flight, and return how many there were.
 
-    print(f"[OK] {title}  -> {downloaded} file(s)")
-    time.sleep(delay)
+    Each model is submitted as soon as it is discovered, but nothing is written
+    until discovery has finished; models are then written in sorted URL order,
+    so the output does not depend on timing. Models the manifest shows to be
+    unchanged are skipped without any request.
+    """
+    manifest = fetcher.manifest
+
+    def fetch(u):
+        try:
+            return fetch_model(fetcher, u, out_root, file_pool)
+        except requests.RequestException as e:
+            return e
+
+    model_pool = file_pool = None
+    if fetcher.workers > 1:
+        # Separate pools so that a model task waiting on its files can never
+        # starve the file tasks of threads.
+        model_pool = ThreadPoolExecutor(fetcher.workers, thread_name_prefix="model")
+        file_pool = ThreadPoolExecutor(fetcher.workers, thread_name_prefix="file")
+    try:
+        # Nothing has been written yet, so skip decisions see last run's manifest
+        listing, pending = {}, {}
+        for u, fingerprint in links:
+            listing[u] = fingerprint
+            if manifest and manifest.unchanged_model(u, fingerprint):
+                pending[u] = None
+            elif model_pool is not None:
+                pending[u] = model_pool.submit(fetch, u)
+            else:
+                pending[u] = u  # fetched in turn below
+
+        model_urls = sorted(listing)
+        if model_urls:
+            print(f"[*] Discovered {len(model_urls)} model page(s).")
+        for i, u in enumerate(model_urls, 1):
+            print(f"[*] ({i}/{len(model_urls)}) {u}")
+            result = pending.pop(u)
+            if isinstance(result, str):
+                result = fetch(result)
+            elif result is not None:
+                result = result.result()
+
+            if result is None:
+                manifest.skip_model(u)
+                print(f"[=] {manifest.models[u]['slug']}  unchanged, skipped")
+            elif isinstance(result, Exception):
+                print(f"[WARN] Failed to scrape model at {u}: {result}", file=sys.stderr)
+            else:
+                write_model(result, out_root, manifest, listing[u])
+        return len(model_urls)
+    finally:
+        for pool in (model_pool, file_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
 
 # --- Main ---------------------------------------------------------------------
 
 def main():
+    global BASE_URL, ALL_MODELS_URL, PARSER
+
     parser = argparse.ArgumentParser(description="Scrape SasView Model Marketplace models and docs.")
     parser.add_argument("--out", required=True, help="Output directory root")
-    parser.add_argument("--delay", type=float, default=1.0, help="Delay between HTTP requests (seconds)")
-    #parser.add_argument("--base", default=BASE_URL, help="Base URL (default: https://marketplace.sasview.org)")
+    parser.add_argument("--delay", type=float, default=1.0,
+                        help="Minimum interval between HTTP requests to one host (seconds); 0 disables the limit")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="Number of requests allowed back-to-back before --delay applies (default: 1)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Maximum number of concurrent HTTP requests (default: 1, sequential)")
+    parser.add_argument("--base", default=BASE_URL, help="Base URL (default: https://marketplace.sasview.org)")
+    parser.add_argument("--parser", default=None,
+                        help=f"Tree builder for pages that are only read, e.g. lxml or html.parser (default: {PARSER})")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and refetch everything (the manifest is still rewritten)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Re-hash the files under --out against its manifest and exit; no network access")
+    parser.add_argument("--blobs", nargs="?", const="", default=None, metavar="DIR",
+                        help=f"Store file bodies by SHA-256 in DIR (default: <out>/{BLOB_DIR}) and hardlink them into the mirror")
     args = parser.parse_args()
 
     out_root = Path(args.out)
+    if args.verify:
+        if not (out_root / MANIFEST_NAME).exists():
+            parser.error(f"no {MANIFEST_NAME} under {out_root}")
+        sys.exit(1 if verify_mirror(Manifest(out_root)) else 0)
     ensure_dir(out_root)
 
-    #global BASE_URL, ALL_MODELS_URL
-    #BASE_URL = args.base.rstrip("/")
-    BASE_URL = "https://marketplace.sasview.org"
+    if args.parser:
+        if not builder_registry.lookup(args.parser):
+            parser.error(f"HTML parser {args.parser!r} is not installed")
+        PARSER = args.parser
+
+    BASE_URL = args.base.rstrip("/")
     ALL_MODELS_URL = f"{BASE_URL}/models/"
 
-    session = make_session()
+    blobs = None
+    if args.blobs is not None:
+        blobs = BlobStore(Path(args.blobs) if args.blobs else out_root / BLOB_DIR)
+    manifest = Manifest(out_root, full=args.full, blobs=blobs)
+    fetcher = Fetcher(workers=args.workers, delay=args.delay, burst=args.burst, manifest=manifest)
 
     try:
         print("[*] Discovering model pages...")
-        model_urls = discover_all_model_links(session, delay=args.delay)
-        if not model_urls:
+        try:
+            found = scrape_models(fetcher, discover_all_model_links(fetcher), out_root)
+        finally:
+            # Whatever was written so far is accurately recorded; keep it for the next run
+            manifest.save()
+        if not found:
             print("[!] No model URLs discovered. Is the site reachable?", file=sys.stderr)
             sys.exit(2)
-        print(f"[*] Discovered {len(model_urls)} model page(s).")
-
-        for i, u in enumerate(model_urls, 1):
-            print(f"[*] ({i}/{len(model_urls)}) {u}")
-            try:
-                scrape_model(session, u, out_root, delay=args.delay)
-            except requests.RequestException as e:
-                print(f"[WARN] Failed to scrape model at {u}: {e}", file=sys.stderr)
 
         print("[✓] Done.")
+        print(f"[i] {fetcher.requests} HTTP request(s) issued.")
+        print(f"[i] {manifest.summary()}")
         print(f"[i] Output saved under: {out_root.resolve()}")
     except KeyboardInterrupt:
         print("\n[!] Interrupted by user.", file=sys.stderr)
@@ -324,4 +968,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
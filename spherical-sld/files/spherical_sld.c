@@ -1,3 +1,37 @@
+/*  The SLD profile is flat in each shell and piecewise linear across each
+    interface, so the amplitude is a sum over the knots r_k of the profile,
+
+        f(q) = sum_k V(r_k) [(rho_in - rho_out) 3j1(qr_k)/(qr_k)
+                             + (slope_in - slope_out) r_k H(qr_k)]
+
+        H(x) = 3 (x sin x + 2 cos x - 2)/x^4
+
+    with V(r) = 4/3 pi r^3 and the solvent outside the last knot. Only the
+    jumps and the changes of slope enter, so the large and nearly equal
+    contributions of the two sides of each sub-shell never have to cancel,
+    and H is evaluated from its Taylor series at low qr.
+
+    The knots depend only on the parameters. On the CPU they are found once
+    per parameter set and kept in a table, with the interface sub-shells
+    merged wherever the profile is straight to within SLD_MERGE_TOL of the
+    SLD step across the interface, so the q loop is a sum over the table.
+    GPU kernels have no writable static storage and, like profiles with
+    more knots than the table holds, find the knots again for each q.
+*/
+
+#define SLD_MERGE_TOL 1e-6
+#define SLD_TABLE_N 4096   // knots (and interface steps) the table can hold
+#define SLD_KEY_N 53       // n_shells, n_steps, sld_solvent and 5 values for 10 shells
+
+// Point where the Taylor series of H with terms to x^8 meets the direct
+// calculation: at qr=0.4 both are good to 2e-13 in double precision, and at
+// qr=1.5 to 5e-7 in single precision.
+#if FLOAT_SIZE>4
+#define SLD_SLOPE_CUTOFF 0.4
+#else
+#define SLD_SLOPE_CUTOFF 1.5
+#endif
+
 static double
 outer_radius(double fp_n_shells, double thickness[], double interface[])
 {
@@ -39,138 +73,283 @@ static double blend(int shape, double nu, double z)
     } else if (shape==4) {
         return expm1(nu*z)/expm1(nu);
     } else if (shape==5) {
-        return 1.0 - pow(1.0 - z*z, (0.5*nu-2.0));        
+        return 1.0 - pow(1.0 - z*z, (0.5*nu-2.0));
     } else {
         return NAN;
     }
 }
 
-static double f_linear(double q, double r, double contrast, double slope)
+// H(x) = 3 (x sin x + 2 cos x - 2)/x^4, the change in amplitude per unit
+// change of slope at a knot, relative to V(r) r
+static double slope_kernel(double x)
+{
+    if (fabs(x) < SLD_SLOPE_CUTOFF) {
+        const double x2 = x*x;
+        return -0.25 + x2*(1./60. + x2*(-1./2240. + x2*(1./151200. + x2*(-1./15966720.))));
+    } else {
+        double sinx, cosx;
+        SINCOS(x, sinx, cosx);
+        return 3.0*(x*sinx + 2.0*cosx - 2.0)/square(square(x));
+    }
+}
+
+static double jump_weight(double r, double jump)
 {
-    const double qr = q * r;
-    const double qrsq = qr * qr;
-    const double bes = sas_3j1x_x(qr);
-    double sinqr, cosqr;
-    SINCOS(qr, sinqr, cosqr);
-    const double fun = 3.0*r*(2.0*qr*sinqr - (qrsq-2.0)*cosqr)/(qrsq*qrsq);
-    const double vol = M_4PI_3 * cube(r);
-    return vol*(bes*contrast + fun*slope);
+    return M_4PI_3*cube(r)*jump;
 }
 
-static double Iq(
+static double kink_weight(double r, double kink)
+{
+    return M_4PI_3*square(square(r))*kink;
+}
+
+// Amplitude with the knots found as they are used, for every step.
+static double
+amplitude_direct(
     double q,
-    double fp_n_shells,
+    int n_shells,
+    int n_steps,
     double sld_solvent,
     double sld[],
     double thickness[],
     double interface[],
     double shape[],
-    double nu[],
-    double fp_n_steps)
+    double nu[])
 {
-    // iteration for # of shells + core + solvent
-    int n_shells = (int)(fp_n_shells + 0.5);
-    int n_steps = (int)(fp_n_steps + 0.5);
     double f=0.0;
     double r=0.0;
     for (int shell=0; shell<n_shells; shell++){
         const double sld_l = sld[shell];
-
-        // uniform shell; r=0 => r^3=0 => f=0, so works for core as well.
-        f -= M_4PI_3 * cube(r) * sld_l * sas_3j1x_x(q*r);
+        const double sld_r = (shell==n_shells-1 ? sld_solvent : sld[shell+1]);
         r += thickness[shell];
-        f += M_4PI_3 * cube(r) * sld_l * sas_3j1x_x(q*r);
 
-        // iterate over sub_shells in the interface
+        // if there is no interface the equations don't work
         const double dr = interface[shell]/n_steps;
-        const double delta = (shell==n_shells-1 ? sld_solvent : sld[shell+1]) - sld_l;
+        if (dr == 0.) {
+            f += jump_weight(r, sld_l - sld_r)*sas_3j1x_x(q*r);
+            continue;
+        }
+
+        const double delta = sld_r - sld_l;
         const double nu_shell = fmax(fabs(nu[shell]), 1.e-14);
         const int shape_shell = (int)(shape[shell]);
-
-        // if there is no interface the equations don't work
-        if (dr == 0.) continue;
-
         double sld_in = sld_l;
+        double slope_in = 0.0;
         for (int step=1; step <= n_steps; step++) {
-            // find sld_i at the outer boundary of sub-shell step
-            //const double z = (double)step/(double)n_steps;
+            // sld at the outer boundary of sub-shell step
             const double z = (double)step/(double)n_steps;
-            const double fraction = blend(shape_shell, nu_shell, z);
-            const double sld_out = fraction*delta + sld_l;
-            // calculate slope
+            const double sld_out = blend(shape_shell, nu_shell, z)*delta + sld_l;
             const double slope = (sld_out - sld_in)/dr;
-            const double contrast = sld_in - slope*r;
-
-            // iteration for the left and right boundary of the shells
-            f -= f_linear(q, r, contrast, slope);
-            r += dr;
-            f += f_linear(q, r, contrast, slope);
+            const double r_knot = r + (step-1)*dr;
+            f += kink_weight(r_knot, slope_in - slope)*slope_kernel(q*r_knot);
             sld_in = sld_out;
+            slope_in = slope;
         }
+        r += interface[shell];
+        f += kink_weight(r, slope_in)*slope_kernel(q*r);
+        f += jump_weight(r, sld_in - sld_r)*sas_3j1x_x(q*r);
     }
-    // add in solvent effect
-    f -= M_4PI_3 * cube(r) * sld_solvent * sas_3j1x_x(q*r);
+    return f;
+}
 
-    const double f2 = f * f * 1.0e-4;
-    return f2;
+#if !defined(USE_GPU)
+static double sld_key[SLD_KEY_N];
+static int sld_key_n = 0;   // entries of sld_key in use; 0 before the first call
+static int sld_table_ok = 0;   // 0 if the last profile did not fit the table
+static double jump_radius[SLD_TABLE_N], jump_w[SLD_TABLE_N];
+static double kink_radius[SLD_TABLE_N], kink_w[SLD_TABLE_N];
+static double step_sld[SLD_TABLE_N+1];
+static int n_jumps = 0, n_kinks = 0;
+#if defined(USE_OPENMP)
+#pragma omp threadprivate(sld_key, sld_key_n, sld_table_ok, jump_radius, jump_w, kink_radius, kink_w, step_sld, n_jumps, n_kinks)
+#endif
+
+// Returns 1 if the parameters are those of the last call, else stores them.
+static int
+same_profile(
+    int n_shells,
+    int n_steps,
+    double sld_solvent,
+    double sld[],
+    double thickness[],
+    double interface[],
+    double shape[],
+    double nu[])
+{
+    double key[SLD_KEY_N];
+    int n = 0;
+    key[n++] = n_shells;
+    key[n++] = n_steps;
+    key[n++] = sld_solvent;
+    for (int shell=0; shell<n_shells; shell++) {
+        key[n++] = sld[shell];
+        key[n++] = thickness[shell];
+        key[n++] = interface[shell];
+        key[n++] = shape[shell];
+        key[n++] = nu[shell];
+    }
+    int same = (n == sld_key_n);
+    for (int i=0; i<n; i++) {
+        same = same && (key[i] == sld_key[i]);
+        sld_key[i] = key[i];
+    }
+    sld_key_n = n;
+    return same;
 }
 
-static void Fq(
-    double q,
-    double *F1,
-    double *F2,
-    double fp_n_shells,
+static int add_jump(double r, double jump)
+{
+    if (jump == 0.) return 1;
+    if (n_jumps == SLD_TABLE_N) return 0;
+    jump_radius[n_jumps] = r;
+    jump_w[n_jumps++] = jump_weight(r, jump);
+    return 1;
+}
+
+static int add_kink(double r, double kink)
+{
+    if (kink == 0.) return 1;
+    if (n_kinks == SLD_TABLE_N) return 0;
+    kink_radius[n_kinks] = r;
+    kink_w[n_kinks++] = kink_weight(r, kink);
+    return 1;
+}
+
+// Fill the knot tables, returning 0 if they are too small for the profile.
+static int
+build_table(
+    int n_shells,
+    int n_steps,
     double sld_solvent,
     double sld[],
     double thickness[],
     double interface[],
     double shape[],
-    double nu[],
-    double fp_n_steps)
+    double nu[])
 {
-    // iteration for # of shells + core + solvent
-    int n_shells = (int)(fp_n_shells + 0.5);
-    int n_steps = (int)(fp_n_steps + 0.5);
-    double f=0.0;
-    double r=0.0;
+    n_jumps = n_kinks = 0;
+    if (n_steps > SLD_TABLE_N) return 0;
+
+    int ok = 1;
+    double r = 0.0;
     for (int shell=0; shell<n_shells; shell++){
         const double sld_l = sld[shell];
-
-        // uniform shell; r=0 => r^3=0 => f=0, so works for core as well.
-        f -= M_4PI_3 * cube(r) * sld_l * sas_3j1x_x(q*r);
+        const double sld_r = (shell==n_shells-1 ? sld_solvent : sld[shell+1]);
         r += thickness[shell];
-        f += M_4PI_3 * cube(r) * sld_l * sas_3j1x_x(q*r);
 
-        // iterate over sub_shells in the interface
+        // if there is no interface the equations don't work
         const double dr = interface[shell]/n_steps;
-        const double delta = (shell==n_shells-1 ? sld_solvent : sld[shell+1]) - sld_l;
+        if (dr == 0.) {
+            ok = ok && add_jump(r, sld_l - sld_r);
+            continue;
+        }
+
+        const double delta = sld_r - sld_l;
         const double nu_shell = fmax(fabs(nu[shell]), 1.e-14);
         const int shape_shell = (int)(shape[shell]);
-
-        // if there is no interface the equations don't work
-        if (dr == 0.) continue;
-
-        double sld_in = sld_l;
+        step_sld[0] = sld_l;
         for (int step=1; step <= n_steps; step++) {
-            // find sld_i at the outer boundary of sub-shell step
-            //const double z = (double)step/(double)n_steps;
             const double z = (double)step/(double)n_steps;
-            const double fraction = blend(shape_shell, nu_shell, z);
-            const double sld_out = fraction*delta + sld_l;
-            // calculate slope
-            const double slope = (sld_out - sld_in)/dr;
-            const double contrast = sld_in - slope*r;
+            step_sld[step] = blend(shape_shell, nu_shell, z)*delta + sld_l;
+        }
 
-            // iteration for the left and right boundary of the shells
-            f -= f_linear(q, r, contrast, slope);
-            r += dr;
-            f += f_linear(q, r, contrast, slope);
-            sld_in = sld_out;
+        // Join the sub-shells from each kept knot to the furthest step that
+        // the straight line passes within tol of every step in between,
+        // tracking the range of slopes [lo, hi] that does so.
+        const double tol = SLD_MERGE_TOL*fabs(delta);
+        double slope_in = 0.0;
+        int start = 0;
+        while (start < n_steps) {
+            double slope = (step_sld[start+1] - step_sld[start])/dr;
+            double lo = slope - tol/dr;
+            double hi = slope + tol/dr;
+            int end = start + 1;
+            while (end < n_steps) {
+                const double width = (end + 1 - start)*dr;
+                const double next = (step_sld[end+1] - step_sld[start])/width;
+                if (next < lo || next > hi) break;
+                slope = next;
+                lo = fmax(lo, next - tol/width);
+                hi = fmin(hi, next + tol/width);
+                end++;
+            }
+            ok = ok && add_kink(r + start*dr, slope_in - slope);
+            slope_in = slope;
+            start = end;
         }
+        r += interface[shell];
+        ok = ok && add_kink(r, slope_in);
+        ok = ok && add_jump(r, step_sld[n_steps] - sld_r);
     }
-    // add in solvent effect
-    f -= M_4PI_3 * cube(r) * sld_solvent * sas_3j1x_x(q*r);
+    return ok;
+}
+#endif
 
+static double
+amplitude(
+    double q,
+    double fp_n_shells,
+    double sld_solvent,
+    double sld[],
+    double thickness[],
+    double interface[],
+    double shape[],
+    double nu[],
+    double fp_n_steps)
+{
+    // iteration for # of shells + core + solvent
+    int n_shells = (int)(fp_n_shells + 0.5);
+    int n_steps = (int)(fp_n_steps + 0.5);
+#if !defined(USE_GPU)
+    if (!same_profile(n_shells, n_steps, sld_solvent, sld, thickness, interface, shape, nu)) {
+        sld_table_ok = build_table(n_shells, n_steps, sld_solvent, sld, thickness, interface, shape, nu);
+    }
+    if (sld_table_ok) {
+        double f = 0.0;
+        for (int k=0; k<n_jumps; k++) {
+            f += jump_w[k]*sas_3j1x_x(q*jump_radius[k]);
+        }
+        for (int k=0; k<n_kinks; k++) {
+            f += kink_w[k]*slope_kernel(q*kink_radius[k]);
+        }
+        return f;
+    }
+#endif
+    return amplitude_direct(q, n_shells, n_steps, sld_solvent, sld, thickness, interface, shape, nu);
+}
+
+static double Iq(
+    double q,
+    double fp_n_shells,
+    double sld_solvent,
+    double sld[],
+    double thickness[],
+    double interface[],
+    double shape[],
+    double nu[],
+    double fp_n_steps)
+{
+    const double f = amplitude(q, fp_n_shells, sld_solvent, sld, thickness,
+                               interface, shape, nu, fp_n_steps);
+    const double f2 = f * f * 1.0e-4;
+    return f2;
+}
+
+static void Fq(
+    double q,
+    double *F1,
+    double *F2,
+    double fp_n_shells,
+    double sld_solvent,
+    double sld[],
+    double thickness[],
+    double interface[],
+    double shape[],
+    double nu[],
+    double fp_n_steps)
+{
+    const double f = amplitude(q, fp_n_shells, sld_solvent, sld, thickness,
+                               interface, shape, nu, fp_n_steps);
     *F1 = 1e-2*f;
     *F2 = 1e-4*f*f;
 }
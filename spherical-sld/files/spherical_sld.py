@@ -203,6 +203,13 @@ where
 We assume $\rho_{\text{inter}_j} (r)$ is approximately linear
 within the sub-shell $j$.
 
+In the calculation the terms of neighbouring sub-shells are collected at
+their common radius, where only the jump in SLD and the change of slope
+contribute, so that the large terms from the two sides of each sub-shell do
+not have to cancel at low $q$. Sub-shells over which the profile is straight
+to within $10^{-6}$ of the SLD step across the interface are merged. The radii
+and weights are found once for each set of parameters rather than for each $q$.
+
 Finally the form factor can be calculated by
 
 .. math::
@@ -268,7 +275,6 @@ parameters = [["n_shells",             "",           1,      [1, 10],        "vo
              ]
 # pylint: enable=bad-whitespace, line-too-long
 source = ["lib/polevl.c", "lib/sas_erf.c", "lib/sas_3j1x_x.c", "spherical_sld.c"]
-single = False  # TODO: fix low q behaviour
 have_Fq = True
 radius_effective_modes = ["outer radius"]
 
@@ -71,6 +71,11 @@ with
     \sin (\varphi) \sin(\theta)\\
     \cos (\theta)\end{pmatrix}
 
+Both integrals use Gauss-Legendre quadrature. The $x$/$y$ nodes and $\zeta$ only
+depend on $p$ and are computed once per parameter set. The orientation average
+uses 8, 12 or 20 points in $\varphi$ and $\theta$ for $qa < 3$, $qa < 10$ and
+above; the smaller rules agree with the 20 point one to better than $10^{-8}$.
+
 The implemented orientationally averaged superball model is then fully given by
 [#DresenSuperball]_
 
@@ -151,7 +156,7 @@ parameters = [["sld", "1e-6/Ang^2", 4, [-inf, inf], "sld",
               ]
 # lib/gauss76.c
 # lib/gauss20.c
-source = ["lib/gauss20.c", "lib/sas_gamma.c", "superball.c"]
+source = ["lib/gauss20.c", "lib/sas_gamma.c", "superball1694201052148.c"]
 have_Fq = True
 radius_effective_modes = [
     "radius of gyration",
@@ -49,6 +49,7 @@ form_volume(double radius, double fp_n, double thickness[])
 }
 
 
+static double
 effective_radius(int mode, double core_radius, double fp_n, double thickness[])
 {
   switch (mode) {
@@ -61,93 +62,93 @@ effective_radius(int mode, double core_radius, double fp_n, double thickness[])
 }
 
 
-static double fqnucsq(double q, double sld_core, double radius,
-   double sld_solvent, double fp_n, double sld[], double thickness[])
+// The field-independent amplitudes of the particle, in the units of the
+// cross sections below: the nuclear and M_z amplitudes and the squared
+// nuclear, M_z and transversal form factors.
+#define AMP_NUC 0
+#define AMP_MZ 1
+#define AMP_NUCSQ 2
+#define AMP_MZSQ 3
+#define AMP_MTRANSSQ 4
+#define AMP_N 5
+
+// Shell table with a channel for each magnetisation average: the nuclear
+// profile (0), <M_z> (1), sqrt(<M_z^2>) (2) and the transversal component
+// coaligned with the core (3). Channel 4 holds the transversal component of
+// each shell and of the solvent that is uncorrelated with the core, which
+// adds incoherently (only as squared amplitude) at the inner radius of the
+// shell and the outer radius of the last shell.
+static void
+magnetic_table(double *table, double sld_core, double magnetic_sld_core, double eta_core, double radius,
+   double sld_solvent, double magnetic_sld_solvent, double eta_solvent, double delta_solvent,
+   int n, double sld[], double magnetic_sld[], double eta[], double delta[], double thickness[])
 {
-      const int n = (int)(fp_n+0.5);
-  double f, r, last_sld;
-  r = radius;
-  last_sld = sld_core;
-  f = 0.;
+  double mz[SHELL_N], mzsq[SHELL_N], mtrans[SHELL_N];
+  shell_set_radii(table, radius, n, thickness);
   for (int i=0; i<n; i++) {
-    f += M_4PI_3 * cube(r) * (sld[i] - last_sld) * sas_3j1x_x(q*r);
-    last_sld = sld[i];
-    r += thickness[i];
+    const double l = langevinoverx(eta[i]);
+    mz[i] = magnetic_sld[i]*langevin(eta[i]);
+    mzsq[i] = magnetic_sld[i]*sqrt(1-2*l);// sqrt() needed for correct scale to intensity later
+    mtrans[i] = magnetic_sld[i]*sqrt(l*delta[i]);
+    table[SHELL_VALUE(4) + i] = magnetic_sld[i]*sqrt(l*(1-delta[i]));
   }
-  f += M_4PI_3 * cube(r) * (sld_solvent - last_sld) * sas_3j1x_x(q*r);
-    return 1e-4 *f*f;
+  const double l_core = langevinoverx(eta_core);
+  const double l_solvent = langevinoverx(eta_solvent);
+  table[SHELL_VALUE(4) + n] = magnetic_sld_solvent*sqrt(l_solvent*(1-delta_solvent));
+  shell_set_steps(table, 0, sld_core, n, sld, sld_solvent);
+  shell_set_steps(table, 1, magnetic_sld_core*langevin(eta_core), n, mz,
+    magnetic_sld_solvent*langevin(eta_solvent));
+  shell_set_steps(table, 2, magnetic_sld_core*sqrt(1-2*l_core), n, mzsq,
+    magnetic_sld_solvent*sqrt(1-2*l_solvent));
+  shell_set_steps(table, 3, magnetic_sld_core*sqrt(l_core), n, mtrans,
+    magnetic_sld_solvent*sqrt(l_solvent*delta_solvent));
 }
 
-static double fqMtranssq(double q, double sld_core, double radius,
-   double sld_solvent, double fp_n, double sld[], double thickness[],double eta_core,double eta_solvent,double eta[], double delta_solvent,double delta[])
-{
-      const int n = (int)(fp_n+0.5);
-  double f,fsq_perp, r, last_sld;
-  r = radius;
-  
-  last_sld = sld_core*sqrt(langevinoverx(eta_core));
-  f = 0.;
-  fsq_perp=0;
-  for (int i=0; i<n; i++) {
-    f += M_4PI_3 * cube(r) *(sld[i]*sqrt(langevinoverx(eta[i])*delta[i]) - last_sld) * sas_3j1x_x(q*r);//transversal magnetisation component coaligned with core transversal magnetisation
-    fsq_perp += square(M_4PI_3 * cube(r) *sld[i]*sqrt(langevinoverx(eta[i])*(1-delta[i])) * sas_3j1x_x(q*r));//transversal magnetisation component perpendicular with core transversal magnetisation, adding incoherently (only of squared amplitude)
-    last_sld = sld[i]*sqrt(langevinoverx(eta[i])*delta[i]);   
-    r += thickness[i];
-  }
-  f += M_4PI_3 * cube(r) * (sld_solvent*sqrt(langevinoverx(eta_solvent)*delta_solvent) - last_sld) * sas_3j1x_x(q*r);//transversal magnetisation component coaligned with core magnetisation
-  fsq_perp += square(M_4PI_3 * cube(r) * sld_solvent*sqrt(langevinoverx(eta_solvent)*(1-delta_solvent))  * sas_3j1x_x(q*r));
-    return 1e-4 *(f*f +fsq_perp);
-}
-
-static double fqMzsq(double q, double sld_core, double radius,
-   double sld_solvent, double fp_n, double sld[], double thickness[],double eta_core,double eta_solvent,double eta[])
+// All amplitudes at q from one sweep over the shells; the table is only
+// rebuilt when the shell parameters change.
+static void
+magnetic_amplitudes(double q, double sld_core,double magnetic_sld_core,double eta_core,double radius,
+   double sld_solvent,double magnetic_sld_solvent,double eta_solvent,double delta_solvent,
+   double fp_n, double sld[],double magnetic_sld[],double eta[], double delta[], double thickness[], double amp[])
 {
-      const int n = (int)(fp_n+0.5);
-  double f, r, last_sld;
-  r = radius;
-  last_sld = sld_core*sqrt(1-2*langevinoverx(eta_core));// sqrt() needed for correct scale to intensity later
-  f = 0.;
+  const int n = (int)(fp_n+0.5);
+  double key[SHELL_KEY_SIZE];
+  int n_key = 0;
+  key[n_key++] = n;
+  key[n_key++] = sld_core;
+  key[n_key++] = magnetic_sld_core;
+  key[n_key++] = eta_core;
+  key[n_key++] = radius;
+  key[n_key++] = sld_solvent;
+  key[n_key++] = magnetic_sld_solvent;
+  key[n_key++] = eta_solvent;
+  key[n_key++] = delta_solvent;
   for (int i=0; i<n; i++) {
-    f += M_4PI_3 * cube(r) * (sld[i]*sqrt(1-2*langevinoverx(eta[i])) - last_sld) * sas_3j1x_x(q*r);
-    last_sld = sld[i]*sqrt(1-2*langevinoverx(eta[i]));
-    r += thickness[i];
+    key[n_key++] = sld[i];
+    key[n_key++] = magnetic_sld[i];
+    key[n_key++] = eta[i];
+    key[n_key++] = delta[i];
+    key[n_key++] = thickness[i];
   }
-  f += M_4PI_3 * cube(r) * (sld_solvent*sqrt(1-2*langevinoverx(eta_solvent)) - last_sld) * sas_3j1x_x(q*r);
-    return 1e-4 *f*f;
-}
 
-static double fqnuc(double q, double sld_core, double radius,
-   double sld_solvent, double fp_n, double sld[], double thickness[])
-{
-      const int n = (int)(fp_n+0.5);
-  double f, r, last_sld;
-  r = radius;
-  last_sld = sld_core;
-  f = 0.;
-  for (int i=0; i<n; i++) {
-    f += M_4PI_3 * cube(r) * (sld[i] - last_sld) * sas_3j1x_x(q*r);
-    last_sld = sld[i];
-    r += thickness[i];
+  double buffer[SHELL_TABLE_SIZE];
+  int fill;
+  double *table = shell_table(key, n_key, buffer, &fill);
+  if (fill) {
+    magnetic_table(table, sld_core, magnetic_sld_core, eta_core, radius,
+      sld_solvent, magnetic_sld_solvent, eta_solvent, delta_solvent,
+      n, sld, magnetic_sld, eta, delta, thickness);
   }
-  f += M_4PI_3 * cube(r) * (sld_solvent - last_sld) * sas_3j1x_x(q*r);
-    return 1e-2 *f;
-}
 
-static double fqMz(double q, double sld_core, double radius,
-   double sld_solvent, double fp_n, double sld[], double thickness[],double eta_core,double eta_solvent,double eta[])
-{
-      const int n = (int)(fp_n+0.5);
-  double f, r, last_sld;
-  r = radius;
-  last_sld = sld_core*langevin(eta_core);
-  f = 0.;
-  for (int i=0; i<n; i++) {
-    f += M_4PI_3 * cube(r) * (sld[i]*langevin(eta[i]) - last_sld) * sas_3j1x_x(q*r);
-    last_sld = sld[i]*langevin(eta[i]);
-    r += thickness[i];
-  }
-  f += M_4PI_3 * cube(r) * (sld_solvent*langevin(eta_solvent) - last_sld) * sas_3j1x_x(q*r);
-    return 1e-2 *f;
+  double bes[SHELL_N];
+  shell_bessel(q, table, bes);
+  const double f_nuc = shell_sum(table, 0, bes);
+  const double f_mz = shell_sum(table, 1, bes);
+  amp[AMP_NUC] = 1e-2*f_nuc;
+  amp[AMP_MZ] = 1e-2*f_mz;
+  amp[AMP_NUCSQ] = 1e-4*f_nuc*f_nuc;
+  amp[AMP_MZSQ] = 1e-4*square(shell_sum(table, 2, bes));
+  amp[AMP_MTRANSSQ] = 1e-4*(square(shell_sum(table, 3, bes)) + shell_sum_squares(table, 4, bes));
 }
 
 
@@ -163,25 +164,7 @@ static double fqMz(double q, double sld_core, double radius,
 
 
   
-//some basic vector algebra
-
-void SET_VEC(double *vector, double v0, double v1, double v2) {
-    vector[0] = v0;
-    vector[1] = v1;
-    vector[2] = v2;
-}
-
-void SCALE_VEC(double *vector, double a) {
-    vector[0] = a*vector[0];
-    vector[1] = a*vector[1];
-    vector[2] = a*vector[2];
-}
-
-void ADD_VEC(double *result_vec, double *vec1, double *vec2) {
-    result_vec[0] = vec1[0] + vec2[0];
-    result_vec[1] = vec1[1] + vec2[1];
-    result_vec[2] = vec1[2] + vec2[2];
-}
+//vector algebra (SET_VEC) from the sasmodels kernel header
 
 
 
@@ -224,32 +207,22 @@ cos_theta* sin_alpha*sin_beta +
 
 //spin-resolved (POLARIS) cross sections
 //NSF++ (F_N-Mz*(1-rotated_scat_vector[3]^2))^2+ Mx^2*(1-rotated_scat_vector[3]^2)*rotated_scat_vector[3]^2 
-static double Idd(double q, double sld_core,double magnetic_sld_core,double eta_core,double radius,
-   double sld_solvent,double magnetic_sld_solvent,double eta_solvent,double delta_solvent,
-   double fp_n, double sld[],double magnetic_sld[],double eta[], double delta[], double thickness[], double cos_theta, double sin_theta, double alpha, double beta) { 
-        
-return fqnucsq(q, sld_core, radius, sld_solvent, fp_n, sld, thickness)-2*fqnuc(q, sld_core, radius, sld_solvent, fp_n, sld, thickness)*fqMz(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld, thickness,eta_core,eta_solvent,eta)*(1-square_mag_scat(cos_theta, sin_theta,alpha, beta))+fqMzsq(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld, thickness,eta_core,eta_solvent,eta)*square(1-square_mag_scat(cos_theta, sin_theta,alpha, beta))+fqMtranssq(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld, thickness,eta_core,eta_solvent,eta, delta_solvent,delta)*(1-square_mag_scat(cos_theta, sin_theta,alpha, beta))*square_mag_scat(cos_theta, sin_theta,alpha, beta);
+static double Idd(double amp[], double hz2) {
+    return amp[AMP_NUCSQ] - 2*amp[AMP_NUC]*amp[AMP_MZ]*(1-hz2) + amp[AMP_MZSQ]*square(1-hz2) + amp[AMP_MTRANSSQ]*(1-hz2)*hz2;
 	}   
 	
 //NSF-- (F_N+Mz*(1-rotated_scat_vector[3]^2))^2+ Mx^2*(1-rotated_scat_vector[3]^2)*rotated_scat_vector[3]^2 
-static double Iuu(double q, double sld_core,double magnetic_sld_core,double eta_core,double radius,
-   double sld_solvent,double magnetic_sld_solvent,double eta_solvent,double delta_solvent,
-   double fp_n, double sld[],double magnetic_sld[],double eta[], double delta[], double thickness[], double cos_theta, double sin_theta, double alpha, double beta) {
-return fqnucsq(q, sld_core, radius, sld_solvent, fp_n, sld, thickness)+2*fqnuc(q, sld_core, radius, sld_solvent, fp_n, sld, thickness)*fqMz(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld, thickness,eta_core,eta_solvent,eta)*(1-square_mag_scat(cos_theta, sin_theta,alpha, beta))+fqMzsq(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld, thickness,eta_core,eta_solvent,eta)*square(1-square_mag_scat(cos_theta, sin_theta,alpha, beta))+fqMtranssq(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld, thickness,eta_core,eta_solvent,eta, delta_solvent,delta)*(1-square_mag_scat(cos_theta, sin_theta,alpha, beta))*square_mag_scat(cos_theta, sin_theta,alpha, beta);
+static double Iuu(double amp[], double hz2) {
+    return amp[AMP_NUCSQ] + 2*amp[AMP_NUC]*amp[AMP_MZ]*(1-hz2) + amp[AMP_MZSQ]*square(1-hz2) + amp[AMP_MTRANSSQ]*(1-hz2)*hz2;
 	}   
 
 //SF Mz^2*(1-rotated_scat_vector[3]^2)*rotated_scat_vector[3]^2 +Mx^2*(1+rotated_scat_vector[3]^4)
-static double Idu(double q, double sld_core,double magnetic_sld_core,double eta_core,double radius,
-   double sld_solvent,double magnetic_sld_solvent,double eta_solvent,double delta_solvent,
-   double fp_n, double sld[],double magnetic_sld[],double eta[], double delta[], double thickness[], double cos_theta, double sin_theta, double alpha, double beta) {
-    return fqMtranssq(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n, magnetic_sld,thickness,eta_core,eta_solvent,eta, delta_solvent,delta)*(1+square(square_mag_scat(cos_theta, sin_theta,alpha, beta)))+fqMzsq(q, magnetic_sld_core, radius, magnetic_sld_solvent, fp_n,magnetic_sld, thickness,eta_core,eta_solvent,eta)* (1-square_mag_scat(cos_theta, sin_theta,alpha, beta))*square_mag_scat(cos_theta, sin_theta,alpha, beta);
+static double Idu(double amp[], double hz2) {
+    return amp[AMP_MTRANSSQ]*(1+square(hz2)) + amp[AMP_MZSQ]*(1-hz2)*hz2;
 	}   	
 
-static double Iud(double q, double sld_core,double magnetic_sld_core,double eta_core,double radius,
-   double sld_solvent,double magnetic_sld_solvent,double eta_solvent,double delta_solvent,
-   double fp_n, double sld[],double magnetic_sld[],double eta[], double delta[], double thickness[], double cos_theta, double sin_theta, double alpha, double beta) {
-    return Idu(q, sld_core,magnetic_sld_core, eta_core, radius, sld_solvent,magnetic_sld_solvent, eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,  thickness, cos_theta, sin_theta, alpha, beta);
+static double Iud(double amp[], double hz2) {
+    return Idu(amp, hz2);
 	}  
 
 
@@ -293,13 +266,12 @@ Iqxy(double qx, double qy, double sld_core,double magnetic_sld_core,double eta_c
 
     double weights[8];  // uu, ud, du, dd, fill,fill, fill, fill (make memory alloc happy)
     set_weights(up_i, up_f, weights);
+    double amp[AMP_N];
+    magnetic_amplitudes(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
+   fp_n, sld,magnetic_sld,eta,delta,thickness, amp);
+    const double hz2 = square_mag_scat(cos_theta, sin_theta, alpha, beta);
 
-    
-    const double form=weights[0]*Iuu(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta) + weights[1]*Idu(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta) + weights[2]*Iud(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta) + weights[3]*Idd(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta);
+    const double form=weights[0]*Iuu(amp, hz2) + weights[1]*Idu(amp, hz2) + weights[2]*Iud(amp, hz2) + weights[3]*Idd(amp, hz2);
  
 
    return form;
@@ -317,17 +289,17 @@ Iq(double q, double sld_core,double magnetic_sld_core,double eta_core,double rad
 {
      double weights[8];  // uu, ud, du, dd, fill,fill, fill, fill (make memory alloc happy) 
     set_weights(up_i, up_f, weights);
+    double amp[AMP_N];
+    magnetic_amplitudes(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
+   fp_n, sld,magnetic_sld,eta,delta,thickness, amp);
    double sin_theta, cos_theta; // slots to hold sincos function output of the orientation on the detector plane
   double total_F2 = 0.0;
     for (int i=0; i<GAUSS_N ;i++) {
 
         const double theta = M_PI * (GAUSS_Z[i] + 1.0); // 0 .. 2 pi
         SINCOS(theta, sin_theta, cos_theta);
-        const double form = weights[0]*Iuu(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta) + weights[1]*Idu(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta) + weights[2]*Iud(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta) + weights[3]*Idd(q, sld_core,magnetic_sld_core,eta_core,radius,sld_solvent,magnetic_sld_solvent,eta_solvent,delta_solvent,
-   fp_n, sld,magnetic_sld,eta,delta,thickness,cos_theta ,sin_theta, alpha, beta);
+        const double hz2 = square_mag_scat(cos_theta, sin_theta, alpha, beta);
+        const double form = weights[0]*Iuu(amp, hz2) + weights[1]*Idu(amp, hz2) + weights[2]*Iud(amp, hz2) + weights[3]*Idd(amp, hz2);
        
 
         total_F2 += GAUSS_W[i] * form ;
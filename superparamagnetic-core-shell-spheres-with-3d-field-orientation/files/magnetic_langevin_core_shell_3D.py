@@ -105,7 +105,7 @@ parameters = [["nuc_sld_core", "1e-6/Ang^2", 1.0, [-inf, inf], "", "Core scatter
 
 
 
-source = ["lib/sas_3j1x_x.c","lib/gauss76.c", "magnetic_langevin_core_shell_3D.c"]
+source = ["lib/sas_3j1x_x.c","lib/gauss76.c", "multi_shell.c", "magnetic_langevin_core_shell_3D.c"]
 structure_factor = False
 have_Fq = False
 single=False
@@ -0,0 +1,1024 @@
+#!/usr/bin/env python3
+"""
+Translate the pure-Python plugin models into C kernels for sasmodels' compiled engine.
+
+Usage:
+    python translate_models.py
+    python translate_models.py --models star_excl_vol polymer_excl_volume --out translated
+
+What it does:
+- Finds the plugins whose Iq is written in Python (no C source) and translates Iq,
+  Iqxy, form_volume and ER/radius_effective, and the module-level functions they
+  call, from the Python syntax tree into C. Names are resolved against the loaded
+  module, so aliases and star imports work as they do in Python: numpy/math calls
+  map onto the C math library and scipy.special onto sasmodels' lib/ sources
+  (gammainc -> sas_gammainc with lib/sas_gammainc.c, erf -> sas_erf, j0/j1 -> sas_J0/
+  sas_J1, power and ** -> pow/square/cube...), and `with errstate(...)` guards are
+  dropped, as C arithmetic does not raise.
+- The vectorized idioms of these models become scalar code: `0.0*q`, `zeros(q.shape)`
+  and `empty(...)` are plain values, masked updates such as `result[q == 0] = 1.0`
+  become `if (q == 0.0) result = 1.0;`, `np.where` a conditional expression,
+  `np.polyval` on a list a Horner sum and `np.vectorize(f)(x)` just `f(x)`.
+- Anything outside that subset (numpy reductions, quadrature on numpy grids, nested
+  functions, linear algebra...) stops the translation of that model; the report
+  gives the function, line and construct.
+- Writes each kernel to <out>/<dir>/<stem>.c, and builds a compiled sasmodels model
+  from it with translated_model_info(), without touching the plugin.
+- Checks every translated kernel against its Python original at the points of each
+  embedded test and on 100 q points at the default parameters (--rtol), and against
+  the expected values of the tests with the same 5-digit rule as run_model_tests.py.
+  Models whose Python original fails are checked against the expected values only.
+- Times the Python and C kernels on 1,000 q points with 35-point polydispersity on
+  the first volume parameter (monodisperse for models without one) and writes the
+  results and speedups to a JSON report.
+"""
+
+import argparse
+import ast
+import builtins
+import json
+import math
+import shutil
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+from run_model_tests import DEFAULT_CACHE, HERE, check_values, find_models, init_worker
+
+RTOL = 1e-8
+BENCH_POINTS = 1000
+
+class TranslationError(Exception):
+    """A construct outside the subset that translates to C."""
+
+# --- C library ------------------------------------------------------------------
+
+# name in numpy/math -> (C function, number of arguments)
+C_MATH = {
+    "exp": ("exp", 1), "exp2": ("exp2", 1), "expm1": ("expm1", 1), "log": ("log", 1),
+    "log2": ("log2", 1), "log10": ("log10", 1), "log1p": ("log1p", 1),
+    "sqrt": ("sqrt", 1), "cbrt": ("cbrt", 1), "square": ("square", 1),
+    "sin": ("sin", 1), "cos": ("cos", 1), "tan": ("tan", 1),
+    "arcsin": ("asin", 1), "arccos": ("acos", 1), "arctan": ("atan", 1), "arctan2": ("atan2", 2),
+    "asin": ("asin", 1), "acos": ("acos", 1), "atan": ("atan", 1), "atan2": ("atan2", 2),
+    "sinh": ("sinh", 1), "cosh": ("cosh", 1), "tanh": ("tanh", 1),
+    "arcsinh": ("asinh", 1), "arccosh": ("acosh", 1), "arctanh": ("atanh", 1),
+    "asinh": ("asinh", 1), "acosh": ("acosh", 1), "atanh": ("atanh", 1),
+    "floor": ("floor", 1), "ceil": ("ceil", 1), "trunc": ("trunc", 1), "rint": ("rint", 1),
+    "fabs": ("fabs", 1), "abs": ("fabs", 1), "absolute": ("fabs", 1),
+    "hypot": ("hypot", 2), "fmod": ("fmod", 2), "copysign": ("copysign", 2),
+    "fmin": ("fmin", 2), "fmax": ("fmax", 2), "minimum": ("fmin", 2), "maximum": ("fmax", 2),
+    "isnan": ("isnan", 1), "isinf": ("isinf", 1), "isfinite": ("isfinite", 1),
+    "lgamma": ("lgamma", 1),
+}
+
+ERF = ("lib/polevl.c", "lib/sas_erf.c")
+J0 = ("lib/polevl.c", "lib/sas_J0.c")
+J1 = ("lib/polevl.c", "lib/sas_J1.c")
+JN = ("lib/polevl.c", "lib/sas_J0.c", "lib/sas_J1.c", "lib/sas_JN.c")
+
+# name in scipy.special/math -> (C function, number of arguments, lib sources)
+C_SPECIAL = {
+    "erf": ("sas_erf", 1, ERF), "erfc": ("sas_erfc", 1, ERF),
+    "gamma": ("sas_gamma", 1, ("lib/sas_gamma.c",)), "gammaln": ("lgamma", 1, ()),
+    "gammainc": ("sas_gammainc", 2, ("lib/sas_gammainc.c",)),
+    "gammaincc": ("sas_gammaincc", 2, ("lib/sas_gammainc.c",)),
+    "j0": ("sas_J0", 1, J0), "j1": ("sas_J1", 1, J1), "jn": ("sas_JN", 2, JN), "jv": ("sas_JN", 2, JN),
+}
+
+# name in sasmodels.special -> (C function, number of arguments, lib sources)
+C_SASMODELS = {
+    "square": ("square", 1, ()), "cube": ("cube", 1, ()), "sas_sinx_x": ("sas_sinx_x", 1, ()),
+    "sas_3j1x_x": ("sas_3j1x_x", 1, ("lib/sas_3j1x_x.c",)), "sas_2J1x_x": ("sas_2J1x_x", 1, J1),
+    "sas_J1": ("sas_J1", 1, J1), "sas_Si": ("sas_Si", 1, ("lib/sas_Si.c",)),
+}
+
+# C library functions that only approximate their Python counterparts, and the
+# relative difference from the Python kernel allowed in models that use them
+APPROXIMATE = {"sas_Si": 1e-2}  # lib/sas_Si.c: series and asymptotic terms, good to ~0.1%
+
+# Calls that do not map onto one C function; handled in _Function.special()
+SPECIAL_NUMPY = {
+    "where": "where", "logical_and": "and", "logical_or": "or", "logical_not": "not",
+    "polyval": "polyval", "vectorize": "vectorize", "sum": "sum", "errstate": "errstate",
+    "zeros": "zeros", "zeros_like": "zeros", "empty": "zeros", "empty_like": "zeros",
+    "ones": "ones", "ones_like": "ones", "full": "full", "full_like": "full",
+    "asarray": "value", "array": "value", "asanyarray": "value", "float64": "value",
+    "clip": "clip", "power": "power",
+}
+SPECIAL_BUILTINS = {"int": "int", "float": "value", "round": "round", "min": "min", "max": "max"}
+
+C_RESERVED = set("""
+    auto break case char const continue default do double else enum extern float for goto if
+    inline int long register restrict return short signed sizeof static struct switch typedef
+    union unsigned void volatile while
+    constant global local kernel pglobal pconstant
+    NAN INFINITY M_PI M_PI_2 M_PI_4 M_E M_SQRT1_2 M_PI_180 M_4PI_3 SINCOS powr pown clip
+    pow tgamma gammaln gammainc gammaincc y0 y1 yn j0 j1 jn
+    Iq Iqxy Iqac Iqabc Fq form_volume shell_volume radius_effective sum_values
+""".split())
+
+ENTRY_POINTS = ("Iq", "Iqxy", "form_volume", "radius_effective")
+C_NAMES = (C_RESERVED | {c_name for c_name, _ in C_MATH.values()}
+           | {entry[0] for entry in (*C_SPECIAL.values(), *C_SASMODELS.values())}
+           | {"fmin", "fmax", "rint", "floor", "sqrt", "square", "cube", "pow"})
+
+_LIBRARY = None
+
+def c_library() -> tuple[dict, dict]:
+    """
+    ({python object: (C name, arity, sources)}, {python object: special call}),
+    keyed by the objects themselves so that any import spelling resolves.
+    """
+    global _LIBRARY
+    if _LIBRARY is None:
+        import numpy as np
+        import scipy.special
+        import sasmodels.special
+
+        functions, special = {}, {}
+        for name, (c_name, arity) in C_MATH.items():
+            for module in (np, math):
+                if hasattr(module, name):
+                    functions[getattr(module, name)] = (c_name, arity, ())
+        for name, entry in C_SPECIAL.items():
+            for module in (scipy.special, math):
+                if hasattr(module, name):
+                    functions[getattr(module, name)] = entry
+        for name, entry in C_SASMODELS.items():
+            if hasattr(sasmodels.special, name):
+                functions[getattr(sasmodels.special, name)] = entry
+        for name, kind in SPECIAL_NUMPY.items():
+            special[getattr(np, name)] = kind
+        for name, kind in SPECIAL_BUILTINS.items():
+            special[getattr(builtins, name)] = kind
+        functions[builtins.abs] = ("fabs", 1, ())
+        special[math.pow] = special[sasmodels.special.powr] = special[sasmodels.special.pown] = "power"
+        _LIBRARY = functions, special
+    return _LIBRARY
+
+def c_literal(value) -> tuple[str, int]:
+    """
+    (C text, precedence) of a number, always as a double.
+    """
+    value = float(value)
+    if math.isnan(value):
+        return "NAN", 100
+    if math.isinf(value):
+        return ("INFINITY", 100) if value > 0 else ("-INFINITY", 90)
+    if value == math.pi:
+        return "M_PI", 100
+    text = repr(value)
+    return text, 90 if text.startswith("-") else 100
+
+# --- Translation ----------------------------------------------------------------
+
+# C precedence of the operators that are emitted; atoms and calls are 100
+PRECEDENCE = {"||": 35, "&&": 40, "==": 55, "!=": 55, "<": 60, "<=": 60, ">": 60, ">=": 60,
+              "+": 70, "-": 70, "*": 80, "/": 80}
+BINARY = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.BitAnd: "&&", ast.BitOr: "||"}
+COMPARE = {ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">="}
+
+def _number(node):
+    """
+    The value of a numeric literal, possibly negated, else None.
+    """
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _number(node.operand)
+        return None if value is None else (-value if isinstance(node.op, ast.USub) else value)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    return None
+
+def _ends_with_return(body: list) -> bool:
+    last = body[-1] if body else None
+    if isinstance(last, ast.Return):
+        return True
+    if isinstance(last, ast.With):
+        return _ends_with_return(last.body)
+    if isinstance(last, ast.If):
+        return bool(last.orelse) and _ends_with_return(last.body) and _ends_with_return(last.orelse)
+    return False
+
+class _Function:
+    """
+    The C translation of one Python function.
+    """
+    def __init__(self, unit: "Translator", node: ast.FunctionDef, c_name: str, arg_types: list[str]):
+        self.unit = unit
+        self.node = node
+        self.c_name = c_name
+        self.namespace = dict(unit.namespace)
+        self.names = {}  # python name -> C name, for arguments and locals
+        self.vectors = set()  # vector parameters (double *)
+        self.arrays = {}  # local lists -> length
+        self.counters = set()  # range() loop variables (int)
+        self.lines = []
+
+        args = node.args
+        if args.vararg or args.kwarg or args.kwonlyargs or args.posonlyargs:
+            self.fail(node, "*args, **kwargs and keyword-only arguments")
+        if len(args.args) != len(arg_types):
+            self.fail(node, f"takes {len(args.args)} arguments, the parameter table gives {len(arg_types)}")
+        self.signature = []
+        for arg, c_type in zip(args.args, arg_types):
+            c_arg = self.declare(arg.arg)
+            if c_type == "double *":
+                self.vectors.add(arg.arg)
+                self.signature.append(f"double *{c_arg}")
+            else:
+                self.signature.append(f"{c_type} {c_arg}")
+        self.scalars = self.collect_locals(node.body)
+
+    def fail(self, node, what: str):
+        raise TranslationError(f"{self.node.name}() line {getattr(node, 'lineno', self.node.lineno)}: {what}")
+
+    def declare(self, name: str) -> str:
+        c_name = name
+        taken = C_NAMES | set(self.unit.defs) | set(self.unit.c_names.values()) | set(self.names.values())
+        while c_name in taken:
+            c_name += "_"
+        self.names[name] = c_name
+        return c_name
+
+    # --- Locals ---
+
+    def collect_locals(self, body: list) -> list[str]:
+        """
+        Declare every name the body assigns, as Python does; returns the scalars.
+        """
+        scalars = []
+        for node in (n for stmt in body for n in ast.walk(stmt)):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+                self.fail(node, f"nested function or class {getattr(node, 'name', 'lambda')}")
+            elif isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+                self.fail(node, "comprehension")
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.local_import(node)
+            elif isinstance(node, ast.For):
+                if not isinstance(node.target, ast.Name):
+                    self.fail(node, "loop over several variables")
+                if node.target.id in self.names and node.target.id not in self.counters:
+                    self.fail(node, f"loop variable {node.target.id} is also assigned elsewhere")
+                self.counters.add(node.target.id)
+                self.declare(node.target.id)
+            elif isinstance(node, (ast.Assign, ast.AugAssign)):
+                for target in node.targets if isinstance(node, ast.Assign) else [node.target]:
+                    if isinstance(target, (ast.Tuple, ast.List)):
+                        self.fail(node, "tuple assignment")
+                    if not isinstance(target, ast.Name):
+                        continue
+                    name = target.id
+                    if name in self.counters or name in self.vectors:
+                        self.fail(node, f"assignment to {name}")
+                    if isinstance(node, ast.Assign) and isinstance(node.value, (ast.List, ast.Tuple)):
+                        if self.arrays.get(name, len(node.value.elts)) != len(node.value.elts):
+                            self.fail(node, f"list {name} changes length")
+                        self.arrays[name] = len(node.value.elts)
+                    elif name in self.arrays:
+                        self.fail(node, f"list {name} is also assigned a value")
+                    if name not in self.names:
+                        scalars.append(self.declare(name))
+        return [name for name in scalars if name not in (self.names[n] for n in self.arrays)]
+
+    def local_import(self, node):
+        import importlib
+
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                module = importlib.import_module(alias.name)
+                if alias.asname:
+                    self.namespace[alias.asname] = module
+                else:
+                    self.namespace[alias.name.split(".")[0]] = importlib.import_module(alias.name.split(".")[0])
+        else:
+            module = importlib.import_module(node.module)
+            for alias in node.names:
+                if alias.name == "*":
+                    self.namespace.update({k: v for k, v in vars(module).items() if not k.startswith("_")})
+                else:
+                    self.namespace[alias.asname or alias.name] = getattr(module, alias.name)
+
+    # --- Statements ---
+
+    def translate(self) -> str:
+        body = self.node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant):
+            body = body[1:]
+        if not _ends_with_return(body):
+            self.fail(self.node, "may end without returning a value")
+        self.block(body, 1)
+        declarations = []
+        if self.scalars:
+            declarations.append(f"    double {', '.join(self.scalars)};")
+        declarations += [f"    double {self.names[name]}[{n}];" for name, n in self.arrays.items()]
+        head = f"static double {self.c_name}({', '.join(self.signature) or 'void'})"
+        return "\n".join([head, "{"] + declarations + ([""] if declarations else []) + self.lines + ["}"])
+
+    def emit(self, level: int, text: str):
+        self.lines.append("    " * level + text)
+
+    def block(self, body: list, level: int):
+        for stmt in body:
+            self.statement(stmt, level)
+
+    def statement(self, node, level: int):
+        if isinstance(node, ast.Expr):
+            if not (isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+                self.fail(node, "expression statement")
+        elif isinstance(node, (ast.Pass, ast.Import, ast.ImportFrom)):
+            pass
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                self.assign(target, node.value, level)
+        elif isinstance(node, ast.AugAssign):
+            op = BINARY.get(type(node.op))
+            if op in ("+", "-", "*", "/") and isinstance(node.target, ast.Name):
+                self.emit(level, f"{self.names[node.target.id]} {op}= {self.expr(node.value)};")
+            else:
+                load = ast.copy_location(type(node.target)(**{
+                    **{field: getattr(node.target, field) for field in node.target._fields}, "ctx": ast.Load()}),
+                    node.target)
+                value = ast.copy_location(ast.BinOp(load, node.op, node.value), node)
+                self.assign(node.target, value, level, compound=op if op in ("+", "-", "*", "/") else None)
+        elif isinstance(node, ast.Return):
+            if node.value is None:
+                self.fail(node, "return without a value")
+            self.emit(level, f"return {self.expr(node.value)};")
+        elif isinstance(node, ast.If):
+            self.emit(level, f"if ({self.expr(node.test)}) {{")
+            self.block(node.body, level + 1)
+            orelse = node.orelse
+            while len(orelse) == 1 and isinstance(orelse[0], ast.If):
+                self.emit(level, f"}} else if ({self.expr(orelse[0].test)}) {{")
+                self.block(orelse[0].body, level + 1)
+                orelse = orelse[0].orelse
+            if orelse:
+                self.emit(level, "} else {")
+                self.block(orelse, level + 1)
+            self.emit(level, "}")
+        elif isinstance(node, ast.For):
+            self.loop(node, level)
+        elif isinstance(node, ast.While):
+            if node.orelse:
+                self.fail(node, "while ... else")
+            self.emit(level, f"while ({self.expr(node.test)}) {{")
+            self.block(node.body, level + 1)
+            self.emit(level, "}")
+        elif isinstance(node, (ast.Break, ast.Continue)):
+            self.emit(level, "break;" if isinstance(node, ast.Break) else "continue;")
+        elif isinstance(node, ast.With):
+            for item in node.items:
+                if not (isinstance(item.context_expr, ast.Call) and self.special_kind(item.context_expr.func) == "errstate"):
+                    self.fail(node, f"with {ast.unparse(item.context_expr)}")
+            # numpy floating point error states have no C counterpart
+            self.block(node.body, level)
+        else:
+            self.fail(node, f"{type(node).__name__} statement")
+
+    def assign(self, target, value, level: int, compound: str | None = None):
+        if isinstance(target, ast.Name):
+            name = self.names[target.id]
+            if target.id in self.arrays:
+                for k, element in enumerate(value.elts):
+                    self.emit(level, f"{name}[{k}] = {self.expr(element)};")
+            else:
+                self.emit(level, f"{name} = {self.expr(value)};")
+            return
+        if not (isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name)
+                and target.value.id in self.names):
+            self.fail(target, f"assignment to {ast.unparse(target)}")
+        base = target.value.id
+        if base in self.arrays:
+            text = f"{self.names[base]}[{self.index(target.slice)}]"
+            rhs = self.expr(value.right) if compound else self.expr(value)
+            self.emit(level, f"{text} {compound + '=' if compound else '='} {rhs};")
+            return
+        if base in self.vectors or base in self.counters:
+            self.fail(target, f"assignment to {ast.unparse(target)}")
+        # q-shaped array: a masked update applies to the points where the mask holds
+        rhs = self.expr(value.right) if compound else self.expr(value)
+        statement = f"{self.names[base]} {compound + '=' if compound else '='} {rhs};"
+        mask = target.slice
+        if isinstance(mask, ast.Slice) and mask.lower is None and mask.upper is None and mask.step is None:
+            self.emit(level, statement)
+        else:
+            self.emit(level, f"if ({self.mask(mask)}) {statement}")
+
+    def loop(self, node: ast.For, level: int):
+        call = node.iter
+        if node.orelse or not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name)
+                               and self.namespace.get(call.func.id, getattr(builtins, call.func.id, None)) is range
+                               and call.func.id not in self.names and 1 <= len(call.args) <= 3):
+            self.fail(node, f"loop over {ast.unparse(call)}")
+        args = [self.index(arg) for arg in call.args]
+        start, stop = (args[0], args[1]) if len(args) > 1 else ("0", args[0])
+        step = _number(call.args[2]) if len(args) == 3 else 1
+        if not isinstance(step, int) or step == 0:
+            self.fail(node, "range() with a step that is not a constant integer")
+        i = self.names[node.target.id]
+        update = f"{i}++" if step == 1 else f"{i} += {step}"
+        self.emit(level, f"for (int {i}={start}; {i} {'<' if step > 0 else '>'} {stop}; {update}) {{")
+        self.block(node.body, level + 1)
+        self.emit(level, "}")
+
+    # --- Expressions ---
+
+    def expr(self, node) -> str:
+        return self.operand(node)[0]
+
+    def wrap(self, node, minimum: int) -> str:
+        text, precedence = self.operand(node)
+        return f"({text})" if precedence < minimum else text
+
+    def mask(self, node) -> str:
+        if _number(node) is not None or isinstance(node, (ast.Slice, ast.Tuple)):
+            self.fail(node, f"positional indexing of a q array ({ast.unparse(node)})")
+        return self.expr(node)
+
+    def index(self, node) -> str:
+        """
+        An integer C expression for a list index or loop bound.
+        """
+        value = _number(node)
+        if isinstance(value, int):
+            return str(value)
+        if isinstance(node, ast.Name) and node.id in self.counters:
+            return self.names[node.id]
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult)):
+            op = BINARY[type(node.op)]
+            return f"{self.index(node.left)} {op} {self.index(node.right)}"
+        return f"(int)({self.expr(node)})"
+
+    def operand(self, node) -> tuple[str, int]:
+        """
+        (C text, precedence) of an expression.
+        """
+        if isinstance(node, ast.Constant):
+            if type(node.value) in (bool, int, float):
+                return c_literal(node.value)
+            self.fail(node, f"constant {node.value!r}")
+        if isinstance(node, ast.Name):
+            if node.id in self.names:
+                if node.id in self.vectors or node.id in self.arrays:
+                    self.fail(node, f"{node.id} used as a whole list")
+                return self.names[node.id], 100
+            return self.global_value(node)
+        if isinstance(node, ast.Attribute):
+            return self.global_value(node)
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Pow):
+                return self.power(node.left, node.right), 100
+            if isinstance(node.op, ast.FloorDiv):
+                return f"floor({self.wrap(node.left, 80)}/{self.wrap(node.right, 81)})", 100
+            if isinstance(node.op, ast.Mod):
+                # Python's modulo takes the sign of the divisor
+                a, b = self.wrap(node.left, 71), self.wrap(node.right, 81)
+                return f"{a} - {b}*floor({a}/{b})", 70
+            op = BINARY.get(type(node.op))
+            if op is None:
+                self.fail(node, f"operator {type(node.op).__name__}")
+            level = PRECEDENCE[op]
+            return f"{self.wrap(node.left, level)} {op} {self.wrap(node.right, level + 1)}", level
+        if isinstance(node, ast.UnaryOp):
+            op = {ast.USub: "-", ast.UAdd: "+", ast.Not: "!", ast.Invert: "!"}[type(node.op)]
+            return f"{op}{self.wrap(node.operand, 90)}", 90
+        if isinstance(node, ast.BoolOp):
+            op = "&&" if isinstance(node.op, ast.And) else "||"
+            return f" {op} ".join(self.wrap(value, PRECEDENCE[op] + 1) for value in node.values), PRECEDENCE[op]
+        if isinstance(node, ast.Compare):
+            terms, left = [], node.left
+            for op, right in zip(node.ops, node.comparators):
+                if type(op) not in COMPARE:
+                    self.fail(node, f"comparison {type(op).__name__}")
+                level = PRECEDENCE[COMPARE[type(op)]]
+                terms.append(f"{self.wrap(left, level)} {COMPARE[type(op)]} {self.wrap(right, level + 1)}")
+                left = right
+            return (terms[0], PRECEDENCE[COMPARE[type(node.ops[0])]]) if len(terms) == 1 else (" && ".join(terms), 40)
+        if isinstance(node, ast.IfExp):
+            return f"{self.wrap(node.test, 31)} ? {self.wrap(node.body, 31)} : {self.wrap(node.orelse, 30)}", 30
+        if isinstance(node, ast.Subscript):
+            return self.subscript(node)
+        if isinstance(node, ast.Call):
+            return self.call(node)
+        self.fail(node, f"{type(node).__name__} expression")
+
+    def subscript(self, node: ast.Subscript) -> tuple[str, int]:
+        base = node.value
+        if not (isinstance(base, ast.Name) and base.id in self.names):
+            self.fail(node, f"indexing {ast.unparse(base)}")
+        if base.id in self.vectors or base.id in self.arrays:
+            if isinstance(node.slice, ast.Slice):
+                self.fail(node, f"slice of {base.id}")
+            return f"{self.names[base.id]}[{self.index(node.slice)}]", 100
+        if base.id in self.counters:
+            self.fail(node, f"indexing {base.id}")
+        # q-shaped array: the selection is implicit in the scalar kernel
+        if not (isinstance(node.slice, ast.Slice) and node.slice.lower is None
+                and node.slice.upper is None and node.slice.step is None):
+            self.mask(node.slice)
+        return self.names[base.id], 100
+
+    def resolve(self, node):
+        """
+        The Python object a global name or dotted attribute refers to.
+        """
+        if isinstance(node, ast.Name):
+            if node.id in self.namespace:
+                return self.namespace[node.id]
+            if hasattr(builtins, node.id):
+                return getattr(builtins, node.id)
+            self.fail(node, f"name {node.id} is not defined")
+        if isinstance(node, ast.Attribute):
+            if isinstance(node.value, ast.Name) and node.value.id in self.names:
+                self.fail(node, f"attribute {ast.unparse(node)}")
+            owner = self.resolve(node.value)
+            if not hasattr(owner, node.attr):
+                self.fail(node, f"{ast.unparse(node)} is not defined")
+            return getattr(owner, node.attr)
+        self.fail(node, f"call through {ast.unparse(node)}")
+
+    def global_value(self, node) -> tuple[str, int]:
+        value = self.resolve(node)
+        if isinstance(value, (bool, int, float)) or type(value).__module__ == "numpy" and hasattr(value, "dtype") and value.shape == ():
+            return c_literal(value)
+        self.fail(node, f"{ast.unparse(node)} ({type(value).__name__}) used as a value")
+
+    def special_kind(self, func):
+        if isinstance(func, ast.Name) and func.id in self.names:
+            return None
+        try:
+            return c_library()[1].get(self.resolve(func))
+        except (TranslationError, TypeError):
+            return None
+
+    def call(self, node: ast.Call) -> tuple[str, int]:
+        if node.keywords and self.special_kind(node.func) not in ("errstate", "zeros", "ones", "full"):
+            self.fail(node, f"keyword arguments in {ast.unparse(node.func)}()")
+        if isinstance(node.func, ast.Call):
+            # np.vectorize(f)(x) is f(x) in a scalar kernel
+            if self.special_kind(node.func.func) != "vectorize" or len(node.func.args) != 1:
+                self.fail(node, f"call of {ast.unparse(node.func)}")
+            return self.call(ast.copy_location(ast.Call(node.func.args[0], node.args, []), node))
+        if isinstance(node.func, ast.Name) and node.func.id in self.names:
+            self.fail(node, f"call of the local {node.func.id}")
+        target = self.resolve(node.func)
+        args = node.args
+        if any(isinstance(arg, ast.Starred) for arg in args):
+            self.fail(node, "*args in a call")
+
+        if isinstance(target, types.FunctionType) and self.unit.defines(target):
+            for arg in args:
+                if isinstance(arg, ast.Name) and (arg.id in self.vectors or arg.id in self.arrays):
+                    self.fail(node, f"list {arg.id} passed to {target.__name__}()")
+            c_name = self.unit.helper(target.__name__, len(args))
+            return f"{c_name}({', '.join(self.expr(arg) for arg in args)})", 100
+
+        functions, special = c_library()
+        try:
+            kind = special.get(target)
+            entry = functions.get(target)
+        except TypeError:
+            kind = entry = None
+        if kind is not None:
+            return self.special(kind, node)
+        if entry is None:
+            name = getattr(target, "__name__", type(target).__name__)
+            module = getattr(target, "__module__", None) or type(target).__module__
+            self.fail(node, f"{module}.{name} has no C translation")
+        c_name, arity, sources = entry
+        if len(args) != arity:
+            self.fail(node, f"{ast.unparse(node.func)}() with {len(args)} arguments")
+        self.unit.require(sources)
+        if c_name in APPROXIMATE:
+            self.unit.approximate.add(c_name)
+        if c_name == "sas_JN":
+            return f"sas_JN((int)({self.expr(args[0])}), {self.expr(args[1])})", 100
+        return f"{c_name}({', '.join(self.expr(arg) for arg in args)})", 100
+
+    def special(self, kind: str, node: ast.Call) -> tuple[str, int]:
+        args = node.args
+
+        def need(*counts):
+            if len(args) not in counts:
+                self.fail(node, f"{ast.unparse(node.func)}() with {len(args)} arguments")
+
+        if kind in ("zeros", "ones"):
+            # the shape is implicit: one value per q point
+            return c_literal(0.0 if kind == "zeros" else 1.0)
+        if kind == "full":
+            need(2, 3)
+            return self.operand(args[1])
+        if kind == "value":
+            need(1)
+            return self.operand(args[0])
+        if kind == "power":
+            need(2)
+            return self.power(args[0], args[1]), 100
+        if kind == "int":
+            need(1)
+            return f"(int)({self.expr(args[0])})", 90
+        if kind == "round":
+            need(1, 2)
+            if len(args) == 1:
+                return f"rint({self.expr(args[0])})", 100
+            digits = _number(args[1])
+            if not isinstance(digits, int):
+                self.fail(node, "round() to a variable number of digits")
+            scale = c_literal(10.0 ** digits)[0]
+            return f"rint({self.wrap(args[0], 80)}*{scale})/{scale}", 80
+        if kind in ("min", "max"):
+            if len(args) < 2:
+                self.fail(node, f"{kind}() of a sequence")
+            text = self.expr(args[0])
+            for arg in args[1:]:
+                text = f"f{kind}({text}, {self.expr(arg)})"
+            return text, 100
+        if kind == "clip":
+            need(3)
+            return f"clip({', '.join(self.expr(arg) for arg in args)})", 100
+        if kind == "where":
+            need(3)
+            return f"{self.wrap(args[0], 31)} ? {self.wrap(args[1], 31)} : {self.wrap(args[2], 30)}", 30
+        if kind in ("and", "or"):
+            need(2)
+            op = "&&" if kind == "and" else "||"
+            return f"{self.wrap(args[0], PRECEDENCE[op])} {op} {self.wrap(args[1], PRECEDENCE[op] + 1)}", PRECEDENCE[op]
+        if kind == "not":
+            need(1)
+            return f"!{self.wrap(args[0], 90)}", 90
+        if kind == "polyval":
+            need(2)
+            p, x = args
+            if isinstance(p, (ast.List, ast.Tuple)):
+                coefficients = [self.wrap(c, 71) for c in p.elts]
+            elif isinstance(p, ast.Name) and p.id in self.arrays:
+                coefficients = [f"{self.names[p.id]}[{k}]" for k in range(self.arrays[p.id])]
+            else:
+                self.fail(node, "polyval() of coefficients that are not a list")
+            # Horner's scheme, highest power first as in numpy
+            x_text, text = self.wrap(x, 81), coefficients[0]
+            for c in coefficients[1:]:
+                text = f"({text})*{x_text} + {c}"
+            return (text, 70) if len(coefficients) > 1 else (text, 71)
+        if kind == "sum":
+            need(1)
+            part = args[0]
+            if not (isinstance(part, ast.Subscript) and isinstance(part.value, ast.Name)
+                    and part.value.id in self.vectors and isinstance(part.slice, ast.Slice)
+                    and part.slice.lower is None and part.slice.step is None and part.slice.upper is not None):
+                self.fail(node, f"sum() of {ast.unparse(part)}; only vector[:n] sums are supported")
+            self.unit.uses_sum = True
+            return f"sum_values({self.names[part.value.id]}, {self.index(part.slice.upper)})", 100
+        self.fail(node, f"{ast.unparse(node.func)}() outside its supported use")
+
+    def power(self, base, exponent) -> str:
+        value = _number(exponent)
+        if value == 2:
+            return f"square({self.expr(base)})"
+        if value == 3:
+            return f"cube({self.expr(base)})"
+        if value == 0.5:
+            return f"sqrt({self.expr(base)})"
+        if value == 1:
+            return f"({self.expr(base)})"
+        return f"pow({self.expr(base)}, {self.expr(exponent)})"
+
+class Translator:
+    """
+    Translates the Python kernel functions of one loaded plugin module into C.
+    """
+    def __init__(self, module, info):
+        self.module = module
+        self.info = info
+        self.namespace = vars(module)
+        source = Path(module.__file__).read_text(encoding="utf-8", errors="replace")
+        self.defs = {node.name: node for node in ast.parse(source).body if isinstance(node, ast.FunctionDef)}
+        self.c_names = {}  # python function name -> C name
+        self.functions = []  # C source of each function, callees first
+        self.sources = []
+        self.uses_sum = False
+        self.approximate = set()
+        self._active = set()
+
+    def defines(self, function) -> bool:
+        return function.__name__ in self.defs and self.namespace.get(function.__name__) is function
+
+    def require(self, sources):
+        self.sources += [source for source in sources if source not in self.sources]
+
+    def helper(self, name: str, n_args: int) -> str:
+        """
+        C name of a module function called with n_args scalars, translating it once.
+        """
+        if name in self._active:
+            raise TranslationError(f"{name}() is recursive")
+        if name not in self.c_names:
+            self.function(name, name, ["double"] * n_args)
+        return self.c_names[name]
+
+    def function(self, name: str, c_name: str, arg_types: list[str]):
+        if c_name not in ENTRY_POINTS:
+            while c_name in C_NAMES or c_name in self.c_names.values():
+                c_name += "_"
+        self.c_names[name] = c_name
+        self._active.add(name)
+        self.functions.append(_Function(self, self.defs[name], c_name, arg_types).translate())
+        self._active.discard(name)
+
+    def translate(self) -> tuple[str, list[str]]:
+        """
+        (C source, lib sources) for the Python kernel functions of the module.
+        """
+        table = self.info.parameters
+        if table.orientation_parameters:
+            raise TranslationError("orientation parameters")
+        if getattr(self.module, "Fq", None) is not None:
+            raise TranslationError("Fq() is not translated")
+
+        def types_of(parameters):
+            return ["double *" if p.length > 1 else "double" for p in parameters]
+
+        iq_types, volume_types = types_of(table.iq_parameters), types_of(table.form_volume_parameters)
+        entry_points = [("Iq", ["double"] + iq_types), ("Iqxy", ["double", "double"] + iq_types),
+                        ("form_volume", volume_types), ("radius_effective", ["int"] + volume_types)]
+        for name, arg_types in entry_points:
+            if callable(getattr(self.module, name, None)):
+                if name not in self.defs:
+                    raise TranslationError(f"{name} is not defined in the module")
+                self.function(name, name, arg_types)
+        if callable(getattr(self.module, "ER", None)) and "radius_effective" not in self.c_names:
+            if "ER" not in self.defs:
+                raise TranslationError("ER is not defined in the module")
+            node = self.defs["ER"]
+            # radius_effective(mode, ...) with the single mode 'ER'
+            self.defs["radius_effective"] = ast.FunctionDef(
+                name="ER", args=ast.arguments(posonlyargs=[], args=[ast.arg("mode")] + node.args.args,
+                                              kwonlyargs=[], kw_defaults=[], defaults=[]),
+                body=node.body, decorator_list=[], lineno=node.lineno)
+            self.function("radius_effective", "radius_effective", ["int"] + volume_types)
+        if volume_types and "form_volume" not in self.c_names:
+            # the Python engine's default form volume
+            self.functions.append(f"static double form_volume({', '.join(f'double v{k}' for k in range(len(volume_types)))})"
+                                  "\n{\n    return 1.0;\n}")
+        if self.uses_sum:
+            self.functions.insert(0, SUM_VALUES)
+        return "\n\n".join(self.functions) + "\n", list(self.sources)
+
+SUM_VALUES = """\
+static double sum_values(const double *values, int n)
+{
+    double total = 0.0;
+    for (int k=0; k < n; k++) {
+        total += values[k];
+    }
+    return total;
+}"""
+
+# --- Models ---------------------------------------------------------------------
+
+def load_module(path: Path, scratch: Path):
+    """
+    (module, model info) for the plugin at path, loaded from a copy of its files/ folder.
+    """
+    from sasmodels.custom import load_custom_kernel_module
+    from sasmodels.modelinfo import make_model_info
+
+    files = scratch / "files"
+    shutil.copytree(path.parent, files)
+    module = load_custom_kernel_module(str(files / path.name))
+    return module, make_model_info(module)
+
+def has_python_kernel(path: Path) -> bool:
+    """
+    True if the plugin defines Iq in Python and has no C source.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8", errors="replace"))
+    defined = {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}
+    assigned = {target.id for node in tree.body if isinstance(node, ast.Assign)
+                for target in node.targets if isinstance(target, ast.Name)}
+    return "Iq" in defined and not assigned & {"c_code", "source"}
+
+def translate_module(module, info) -> tuple[str, list[str], float]:
+    """
+    (C source, lib sources, tolerance) for a pure-Python model; raises TranslationError.
+
+    The tolerance is the relative difference from Python that the C library
+    functions used allow for (0 when they match to rounding).
+    """
+    translator = Translator(module, info)
+    code, sources = translator.translate()
+    header = (f"// Translated from {Path(module.__file__).name} by translate_models.py;"
+              f" regenerate rather than edit.\n\n")
+    return header + code, sources, max((APPROXIMATE[name] for name in translator.approximate), default=0.0)
+
+def translated_model_info(module, c_file: Path, sources: list[str]):
+    """
+    Model info for the plugin module with its Python kernel replaced by c_file.
+
+    c_file must sit in the folder of the module, where sasmodels looks for sources.
+    """
+    from sasmodels.modelinfo import make_model_info
+
+    compiled = types.ModuleType(module.__name__)
+    compiled.__dict__.update(vars(module))
+    for name in ("Iq", "Iqxy", "Iqac", "Iqabc", "Fq", "form_volume", "shell_volume", "ER", "VR"):
+        setattr(compiled, name, None)
+    compiled.radius_effective = None
+    if callable(getattr(module, "ER", None)) and not callable(getattr(module, "radius_effective", None)):
+        compiled.radius_effective_modes = ["ER"]
+    compiled.source = list(sources) + [c_file.name]
+    compiled.c_code = None
+    compiled.single = False  # checked in double precision only
+    compiled.opencl = False
+    return make_model_info(compiled)
+
+# --- Checks and timing ----------------------------------------------------------
+
+def evaluate(model, pars: dict, x):
+    import numpy as np
+    from sasmodels.direct_model import call_kernel
+    from sasmodels.modelinfo import expand_pars
+
+    x = x if isinstance(x, list) else [x]
+    if isinstance(x[0], tuple):
+        qx, qy = zip(*x)
+        kernel = model.make_kernel([np.array(qx), np.array(qy)])
+    else:
+        kernel = model.make_kernel([np.array(x, dtype=float)])
+    try:
+        return np.atleast_1d(call_kernel(kernel, expand_pars(model.info.parameters, pars)))
+    finally:
+        kernel.release()
+
+def relative_difference(python, compiled) -> float:
+    import numpy as np
+
+    python, compiled = np.asarray(python, dtype=float), np.asarray(compiled, dtype=float)
+    same = (python == compiled) | (np.isnan(python) & np.isnan(compiled))
+    scale = np.maximum(np.abs(python), np.finfo(float).tiny)
+    with np.errstate(invalid="ignore"):
+        diff = np.where(same, 0.0, np.abs(compiled - python)/scale)
+    return float(np.max(np.nan_to_num(diff, nan=np.inf), initial=0.0))
+
+def check_model(py_model, c_model, rtol: float, result: dict):
+    """
+    Compare the two kernels at each test and at default parameters; fills result.
+    """
+    import numpy as np
+
+    cases = [({}, list(np.logspace(-3, 0, 100)), None)]
+    for test in py_model.info.tests or []:
+        if not isinstance(test[0], dict):
+            result["skipped_tests"] += 1  # not in the [pars, x, y] layout sasmodels expects
+            continue
+        if "@S" in test[0] or len(test) == 7:
+            continue  # structure factor products and F/R_eff tests stay with run_model_tests
+        y = test[2] if isinstance(test[2], list) else [test[2]]
+        cases.append((test[0], test[1], y))
+    for pars, x, y in cases:
+        compiled = evaluate(c_model, pars, x)
+        if y is not None:
+            check_values(x if isinstance(x, list) else [x], y, compiled, "I", result)
+            result["tests"] += 1
+        try:
+            python = evaluate(py_model, pars, x)
+        except Exception as e:
+            result["python_error"] = f"{type(e).__name__}: {e}".splitlines()[0]
+            continue
+        difference = relative_difference(python, compiled)
+        result["max_rel_diff"] = max(result["max_rel_diff"], difference)
+        if difference > rtol:
+            result["failures"].append(f"C differs from Python by {difference:.2e} at {pars or 'defaults'}")
+
+def bench(py_model, c_model, repeat: int, budget: float) -> dict:
+    """
+    Best times of the Python kernel (None if it fails) and of the C kernel.
+    """
+    import numpy as np
+    from bench_models import pd_pars, time_kernel
+
+    pars = pd_pars(c_model.info) or {}
+    q = [np.logspace(-3, 0, BENCH_POINTS)]
+    row = {"case": "pd" if pars else "mono", "points": BENCH_POINTS, "python_s": None, "speedup": None}
+    for label, model in (("python", py_model), ("c", c_model)):
+        kernel = model.make_kernel(q)
+        try:
+            row[f"{label}_s"] = time_kernel(kernel, pars, repeat, budget)[1]
+        except Exception:
+            if model is c_model:
+                raise
+        finally:
+            kernel.release()
+    if row["python_s"] is not None:
+        row["speedup"] = row["python_s"] / row["c_s"]
+    return row
+
+def process(path: Path, rel: str, out: Path, args) -> dict:
+    from sasmodels.core import build_model
+
+    result = {"path": rel, "name": None, "status": "error", "reason": None, "c_file": None, "sources": [],
+              "tests": 0, "skipped_tests": 0, "tolerance": args.rtol, "max_rel_err": 0.0, "max_rel_diff": 0.0, "python_error": None, "failures": [],
+              "bench": None}
+    with tempfile.TemporaryDirectory(prefix="model-translate-") as scratch:
+        module, info = load_module(path, Path(scratch))
+        result["name"] = info.name
+        try:
+            code, sources, tolerance = translate_module(module, info)
+        except TranslationError as e:
+            result.update(status="untranslated", reason=str(e))
+            return result
+        result["tolerance"] = max(args.rtol, tolerance)
+        target = out / path.parent.parent.name / f"{path.stem}.c"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(code, encoding="utf-8")
+        result.update(c_file=target.as_posix(), sources=sources)
+
+        c_file = Path(module.__file__).with_name(f"{path.stem}_translated.c")
+        c_file.write_text(code, encoding="utf-8")
+        try:
+            c_model = build_model(translated_model_info(module, c_file, sources), dtype="double", platform="dll")
+            py_model = build_model(info, dtype="double")
+            check_model(py_model, c_model, result["tolerance"], result)
+            if not args.no_bench:
+                result["bench"] = bench(py_model, c_model, args.repeat, args.budget)
+        except Exception as e:
+            result["failures"].append(f"{type(e).__name__}: {e}".strip())
+            return result
+    if result["failures"]:
+        result["status"] = "fail"
+    elif result["python_error"] and not result["tests"]:
+        result["status"] = "unchecked"  # nothing to compare the C kernel with
+    else:
+        result["status"] = "pass"
+    return result
+
+# --- Driver ---------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate the pure-Python models to C and check the kernels.")
+    parser.add_argument("--root", default=str(HERE), help="Mirror tree (default: this repository)")
+    parser.add_argument("--models", nargs="+", help="Only these models (file stem, directory or model name)")
+    parser.add_argument("--out", default="translated", help="Folder for the generated C kernels")
+    parser.add_argument("--rtol", type=float, default=RTOL, help=f"Allowed relative difference from Python (default {RTOL:g})")
+    parser.add_argument("--no-bench", action="store_true", help="Only translate and check, without timing")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per kernel (best is kept)")
+    parser.add_argument("--budget", type=float, default=5.0, help="Do not repeat calls slower than this (seconds)")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE), help=f"Compiled kernel cache (default: {DEFAULT_CACHE})")
+    parser.add_argument("--report", default="translate_models.json", help="JSON report to write")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    out = Path(args.out)
+    models = [path for path, reason in find_models(root, args.models) if not reason and has_python_kernel(path)]
+    if not models:
+        print("[!] No pure-Python models found.", file=sys.stderr)
+        sys.exit(2)
+    Path(args.cache).mkdir(parents=True, exist_ok=True)
+    init_worker(args.cache)
+    print(f"[*] Translating {len(models)} pure-Python model(s)")
+
+    results = []
+    for path in models:
+        rel = path.relative_to(root).as_posix()
+        try:
+            row = process(path, rel, out, args)
+        except Exception as e:
+            row = {"path": rel, "status": "error", "failures": [f"{type(e).__name__}: {e}".splitlines()[0]]}
+        results.append(row)
+        if row["status"] == "untranslated":
+            print(f"[--] {rel}: {row['reason']}")
+            continue
+        if row["status"] == "error" and not row.get("c_file"):
+            print(f"[!] {rel}: {row['failures'][0]}")
+            continue
+        tag = {"pass": "[OK]", "unchecked": "[WARN]"}.get(row["status"], "[!]")
+        timing = row["bench"]
+        speed = ""
+        if timing and timing["speedup"]:
+            speed = (f"  {timing['case']} {timing['python_s'] * 1000:.2f} -> {timing['c_s'] * 1000:.2f} ms"
+                     f" ({timing['speedup']:.1f}x)")
+        elif timing:
+            speed = f"  {timing['case']} C {timing['c_s'] * 1000:.2f} ms"
+        note = "  (Python original fails)" if row["python_error"] else ""
+        if row["tolerance"] > args.rtol:
+            note += f"  (rtol {row['tolerance']:g}: approximate C library function)"
+        if row["skipped_tests"]:
+            note += f"  ({row['skipped_tests']} malformed test(s) skipped)"
+        print(f"{tag} {rel}: {row['status']}, {row['tests']} test(s), max diff {row['max_rel_diff']:.1e}{speed}{note}")
+        for failure in row["failures"][:3]:
+            print(f"     {failure}".splitlines()[0])
+
+    counts = {status: sum(row["status"] == status for row in results)
+              for status in ("pass", "fail", "error", "unchecked", "untranslated")}
+    Path(args.report).write_text(json.dumps({
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "rtol": args.rtol,
+        "summary": counts, "models": results,
+    }, indent=2, default=str), encoding="utf-8")
+    print(f"[i] {', '.join(f'{n} {k}' for k, n in counts.items())}; kernels in {out}, report: {args.report}")
+    sys.exit(1 if counts["fail"] or counts["error"] else 0)
+
+if __name__ == "__main__":
+    main()
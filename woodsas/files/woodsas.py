@@ -59,10 +59,9 @@ Authorship and Verification
 * **Author:** Paavo Penttila **Date:** March 15, 2019
 
 """
-from numpy import cos, sin, exp, square, divide, multiply, linspace, power, pi, zeros, inf
+from numpy import (cos, sin, exp, square, divide, multiply, linspace, power, pi, zeros, inf,
+                   asarray, diff, empty, full, maximum, newaxis, unique)
 from scipy.special import j1
-from scipy.integrate import trapz
-from scipy.stats import norm
 
 name = "woodsas"
 title = "Model tailored for wood samples, based on hexagonally packed cylinders"
@@ -119,26 +118,48 @@ def calc_Zq( q, a, da_ratio, phi):
     qa2 = a*q*sin( phi )
     # Eq. 10 in Penttila et al. (2019):
     F_abs = exp( -0.5 * (da_ratio)**2 * ( square( qa1 ) + square( qa2 ) ))
-    # Eq. 9 in Penttila et al. (2019):
-    Z1 = divide( 1 - square(F_abs) ,  1 - 2*F_abs*cos(qa1) + square(F_abs) )
-    Z2 = divide( 1 - square(F_abs) ,  1 - 2*F_abs*cos(qa2) + square(F_abs) )    
-    return multiply(Z1,Z2)
+    # Eq. 9 in Penttila et al. (2019), Z1*Z2 over a single denominator:
+    F_sq = square(F_abs)
+    den1 = 1 + F_sq - 2*F_abs*cos(qa1)
+    den2 = 1 + F_sq - 2*F_abs*cos(qa2)
+    return divide( square(1 - F_sq), multiply(den1, den2) )
 
 def calc_f( q, radius ):
     qR = q*radius
     return pi*square(radius) * divide( j1(qR), qR )
 
+def trapz_weights(x):
+    """Weights w with dot(w, y) equal to the trapezoid rule integral of y over x."""
+    w = zeros(len(x))
+    w[:-1] += 0.5*diff(x)
+    w[1:] += 0.5*diff(x)
+    return w
+
+# Rotation angle around the cylinder axis. Z1*Z2 has period pi in phi, so the
+# trapezoid rule over 1001 points on [0, 2*pi] is twice the plain sum over [0, pi)
+PHI = linspace(0, pi, 501)[:-1]
+PHI_WEIGHTS = full(len(PHI), 2*pi/len(PHI))
+# Rows of the (q x phi) lattice factor evaluated at once, to bound memory
+Q_BLOCK = 500
+
+def calc_Zq_avg(q, a, da_ratio):
+    # Integral of Z1*Z2 over phi for every distinct q (all q below q_min share one)
+    q_unique, index = unique(q, return_inverse=True)
+    Zq_avg = empty(len(q_unique))
+    for start in range(0, len(q_unique), Q_BLOCK):
+        block = q_unique[start:start+Q_BLOCK, newaxis]
+        Zq_avg[start:start+Q_BLOCK] = calc_Zq(block, a, da_ratio, PHI).dot(PHI_WEIGHTS)
+    return Zq_avg[index]
+
 def Iq(q, A_scale, radius, dR_ratio, a, da_ratio, B_scale, sigma, C_scale, alpha):
-# q is a single value, dR_ratio=dR/R, da_ratio=da/a
+# q is a vector, dR_ratio=dR/R, da_ratio=da/a
 # Based on Hashimoto et al. (1994) and Penttila et al. (2019)
 
+    q = asarray(q, dtype=float)
     dR = dR_ratio*radius
-    phi = linspace(0,2*pi,1001)
-    # Eq. 13 in Penttila et al. (2019):
-    if q > 7.061e-05*a**2 - 0.007413*a + 0.2465:# force ZZ to a finite value at low q
-        ZZ = calc_Zq( q, a, da_ratio, phi)
-    else:
-        ZZ = calc_Zq( 7.061e-05*a**2 - 0.007413*a + 0.2465, a, da_ratio, phi)
+    # Eq. 13 in Penttila et al. (2019): force ZZ to a finite value at low q
+    q_min = 7.061e-05*a**2 - 0.007413*a + 0.2465
+    ZZ_int = calc_Zq_avg( maximum(q, q_min), a, da_ratio )
     if dR == 0: # special case for monodisperse cylinder radius
         f_abs_sq_av = square( calc_f( q, radius ) )
         f_av_abs_sq = f_abs_sq_av
@@ -146,34 +167,33 @@ def Iq(q, A_scale, radius, dR_ratio, a, da_ratio, B_scale, sigma, C_scale, alpha
         # Gaussian distribution with 11 points between mean+-3*sigma, cut away negative values
         R_all = linspace(radius-3*dR, radius+3*dR, num = 11)
         R_all = R_all[R_all > 0]
-        # Eq. 8 in Penttila et al. (2019):
-        PR = norm.pdf(R_all, loc=radius, scale=dR)
-        fqR_all = calc_f(q, R_all)        
+        # Eq. 8 in Penttila et al. (2019), normalized by its trapezoid integral:
+        PR = exp( -0.5*square( (R_all - radius)/dR ) )
+        weights = trapz_weights(R_all) * PR
+        weights /= weights.sum()
+        fqR_all = calc_f(q[:, newaxis], R_all)
         # Eqs. 6, 7 in Penttila et al. (2019)
-        trapzPR = trapz( PR, R_all )
-        f_abs_sq_av = trapz( PR * square( fqR_all ), R_all ) / trapzPR
-        f_av_abs_sq  = square( trapz( PR * fqR_all, R_all ) / trapzPR )
-    
-    # Eq. 4 in Penttila et al. (2019):
-    Iperp_q_phi =  f_abs_sq_av - f_av_abs_sq + f_av_abs_sq * ZZ
+        f_abs_sq_av = square( fqR_all ).dot(weights)
+        f_av_abs_sq = square( fqR_all.dot(weights) )
 
-    # Intensity perpendicular to the cylinder axis (Eq. 3 in Penttila et al. (2019)):
-    Iperp = A_scale/(2*pi)*trapz( Iperp_q_phi, phi )
+    # Eqs. 3, 4 in Penttila et al. (2019), with the phi integral of the terms
+    # that do not depend on phi taken exactly (2 pi)
+    Iperp = A_scale/(2*pi) * ( (f_abs_sq_av - f_av_abs_sq)*2*pi + f_av_abs_sq*ZZ_int )
 
     Iperp /= (pi*power(radius,4))# to scale approximately I(0)=1 (arbitrary units)
-    Iperp += B_scale*norm.pdf(q, loc=0, scale=sigma)/norm.pdf(0, loc=0, scale=sigma)
+    Iperp += B_scale*exp( -0.5*square(q/sigma) )
     Iperp += C_scale * power(q, -alpha)
     return Iperp
 
-Iq.vectorized = False
+Iq.vectorized = True
 
 demo = dict(scale=1., background=0.05, A_scale=1., radius=13, 
-      dR_ratio=0.2, a=40, a_ratio=0.35, B_scale=0.1, sigma=0.04,
+      dR_ratio=0.2, a=40, da_ratio=0.35, B_scale=0.1, sigma=0.04,
       C_scale=1e-8, alpha=4.)
 
 tests = [
     [{"scale": 1., "background": 0.05, "A_scale": 1., "radius": 13, 
-      "dR_ratio": 0.2, "a": 40, "a_ratio": 0.35,
+      "dR_ratio": 0.2, "a": 40, "da_ratio": 0.35,
       "B_scale": 0.1, "sigma": 0.04,
       "C_scale": 1e-8, "alpha": 4.},0.08,0.341487],
 ]
\ No newline at end of file